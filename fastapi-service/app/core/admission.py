@@ -0,0 +1,328 @@
+import asyncio
+import logging
+import math
+import sqlite3
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager, closing
+from pathlib import Path
+from typing import AsyncIterator
+from fastapi import HTTPException
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.metrics import ADMISSION_REJECTIONS, ADMISSION_WAITING, observe_stage
+
+logger = logging.getLogger(__name__)
+
+def refill(tokens: float, updated_at: float, now: float, burst: float, rate: float) -> float:
+    """Tokens in a bucket after refilling at rate per second since updated_at"""
+    return min(burst, tokens + max(0.0, now - updated_at) * rate)
+
+class AdmissionBackend(ABC):
+    """Storage for token buckets and concurrency slots"""
+
+    name = "base"
+    # Seconds between slot checks while waiting; None when releases are only local
+    poll_interval: float | None = None
+
+    @abstractmethod
+    async def take(self, key: str, cost: float, burst: float, rate: float) -> float:
+        """Take cost tokens, returning 0 when admitted or the seconds until they are available"""
+
+    @abstractmethod
+    async def try_acquire(self, cost_class: str, limit: int, lease: str, ttl: float) -> bool:
+        """Take a slot of cost_class if fewer than limit are held"""
+
+    @abstractmethod
+    async def release(self, cost_class: str, lease: str) -> None:
+        """Give back a slot; releasing a lease that is not held does nothing"""
+
+    def stats(self) -> dict[str, any]:
+        return {}
+
+class MemoryAdmissionBackend(AdmissionBackend):
+    """Buckets and slots in this process"""
+
+    name = "memory"
+
+    def __init__(self, max_users: int = 100000):
+        # Idle buckets expire once they would be full again anyway
+        self._buckets = TTLCache(max_entries=max_users)
+        self._leases: dict[str, set[str]] = {}
+
+    async def take(self, key: str, cost: float, burst: float, rate: float) -> float:
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.get(key, (burst, now))
+        tokens = refill(tokens, updated_at, now, burst, rate)
+        # Costs above the burst are admitted from a full bucket and leave a debt
+        needed = min(cost, burst)
+        if tokens < needed:
+            self._buckets.set(key, (tokens, now), ttl=(burst - tokens) / rate)
+            return (needed - tokens) / rate
+        tokens -= cost
+        self._buckets.set(key, (tokens, now), ttl=(burst - tokens) / rate)
+        return 0.0
+
+    async def try_acquire(self, cost_class: str, limit: int, lease: str, ttl: float) -> bool:
+        leases = self._leases.setdefault(cost_class, set())
+        if len(leases) >= limit:
+            return False
+        leases.add(lease)
+        return True
+
+    async def release(self, cost_class: str, lease: str) -> None:
+        self._leases.get(cost_class, set()).discard(lease)
+
+    def stats(self) -> dict[str, any]:
+        return {"held": {cost_class: len(leases) for cost_class, leases in self._leases.items()}}
+
+class SqliteAdmissionBackend(AdmissionBackend):
+    """Buckets and slots in a SQLite file, shared by every process on the host.
+
+    Slots are leases that expire after ttl, so a crashed worker cannot hold
+    them forever.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str, poll_interval: float):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.poll_interval = poll_interval
+        self._takes = 0
+        with closing(self._connect()) as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS slots (lease TEXT PRIMARY KEY, cost_class TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS slots_class ON slots (cost_class, expires_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit mode so BEGIN IMMEDIATE controls the write lock explicitly
+        connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        return connection
+
+    def _take(self, key: str, cost: float, burst: float, rate: float) -> float:
+        now = time.time()
+        connection = self._connect()
+        try:
+            # Read-modify-write under the write lock so workers cannot both spend the same tokens
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute("SELECT tokens, updated_at FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens = refill(*row, now, burst, rate) if row else burst
+            needed = min(cost, burst)
+            wait = (needed - tokens) / rate if tokens < needed else 0.0
+            if not wait:
+                tokens -= cost
+            connection.execute(
+                "INSERT OR REPLACE INTO buckets (key, tokens, updated_at) VALUES (?, ?, ?)", (key, tokens, now)
+            )
+            self._takes += 1
+            if self._takes % 1000 == 0:
+                # Buckets idle long enough to be full again carry no state
+                connection.execute("DELETE FROM buckets WHERE updated_at < ?", (now - burst / rate,))
+            connection.execute("COMMIT")
+            return wait
+        except BaseException:
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            raise
+        finally:
+            connection.close()
+
+    def _try_acquire(self, cost_class: str, limit: int, lease: str, ttl: float) -> bool:
+        now = time.time()
+        connection = self._connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute("DELETE FROM slots WHERE cost_class = ? AND expires_at < ?", (cost_class, now))
+            held = connection.execute("SELECT COUNT(*) FROM slots WHERE cost_class = ?", (cost_class,)).fetchone()[0]
+            acquired = held < limit
+            if acquired:
+                connection.execute(
+                    "INSERT INTO slots (lease, cost_class, expires_at) VALUES (?, ?, ?)", (lease, cost_class, now + ttl)
+                )
+            connection.execute("COMMIT")
+            return acquired
+        except BaseException:
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            raise
+        finally:
+            connection.close()
+
+    def _release(self, lease: str) -> None:
+        connection = self._connect()
+        try:
+            connection.execute("DELETE FROM slots WHERE lease = ?", (lease,))
+        finally:
+            connection.close()
+
+    async def take(self, key: str, cost: float, burst: float, rate: float) -> float:
+        return await asyncio.to_thread(self._take, key, cost, burst, rate)
+
+    async def try_acquire(self, cost_class: str, limit: int, lease: str, ttl: float) -> bool:
+        return await asyncio.to_thread(self._try_acquire, cost_class, limit, lease, ttl)
+
+    async def release(self, cost_class: str, lease: str) -> None:
+        await asyncio.to_thread(self._release, lease)
+
+def create_admission_backend() -> AdmissionBackend:
+    """Build the admission backend from settings"""
+    if settings.ADMISSION_BACKEND == "sqlite":
+        return SqliteAdmissionBackend(
+            settings.ADMISSION_SQLITE_PATH or str(Path(settings.UPLOAD_DIR) / "admission.sqlite3"),
+            poll_interval=settings.ADMISSION_POLL_INTERVAL
+        )
+    if settings.ADMISSION_BACKEND != "memory":
+        raise ValueError(f"Unknown admission backend: {settings.ADMISSION_BACKEND}")
+    return MemoryAdmissionBackend()
+
+class AdmissionController:
+    """Per-user token buckets and per-cost-class concurrency limits in front of expensive work.
+
+    charge() spends a user's tokens for a request and answers 429 with
+    Retry-After when the bucket is empty. slot() holds one of the limited
+    slots of a cost class while the work runs; callers wait in a bounded queue
+    and get 503 with Retry-After when it is full or the wait times out.
+    """
+
+    def __init__(
+        self,
+        backend: AdmissionBackend,
+        burst: float,
+        refill_per_second: float,
+        costs: dict[str, float],
+        concurrency: dict[str, int],
+        max_waiting: int,
+        max_wait: float,
+        lease_ttl: float,
+        enabled: bool = True
+    ):
+        self.backend = backend
+        self.burst = burst
+        self.refill_per_second = refill_per_second
+        self.costs = costs
+        self.concurrency = concurrency
+        self.max_waiting = max_waiting
+        self.max_wait = max_wait
+        self.lease_ttl = lease_ttl
+        self.enabled = enabled
+
+        self._waiting: dict[str, int] = {}
+        self._released: dict[str, asyncio.Condition] = {}
+        # Moving average of how long slots are held, for Retry-After estimates
+        self._hold_seconds: dict[str, float] = {}
+
+    async def charge(self, user_id: str, cost_classes: list[str]) -> None:
+        """Spend the user's tokens for work of the given cost classes, or raise 429"""
+        if not self.enabled or not cost_classes:
+            return
+        cost = sum(self.costs.get(cost_class, 1.0) for cost_class in cost_classes)
+        wait = await self.backend.take(user_id, cost, self.burst, self.refill_per_second)
+        if wait > 0:
+            ADMISSION_REJECTIONS.labels("rate_limited", ','.join(sorted(set(cost_classes)))).inc()
+            raise HTTPException(
+                status_code=429,
+                detail="Too many uploads. Please wait before trying again.",
+                headers={"Retry-After": str(math.ceil(wait))}
+            )
+
+    def _retry_after(self, cost_class: str, limit: int) -> str:
+        """Seconds until the queue ahead is likely to have drained"""
+        hold = self._hold_seconds.get(cost_class, 1.0)
+        estimate = hold * (self._waiting.get(cost_class, 0) + 1) / limit
+        return str(min(60, max(1, math.ceil(estimate))))
+
+    def _reject(self, reason: str, cost_class: str, limit: int) -> HTTPException:
+        ADMISSION_REJECTIONS.labels(reason, cost_class).inc()
+        return HTTPException(
+            status_code=503,
+            detail="Server is busy processing other files. Please try again shortly.",
+            headers={"Retry-After": self._retry_after(cost_class, limit)}
+        )
+
+    async def _wait_for_slot(self, cost_class: str, limit: int, lease: str, deadline: float) -> None:
+        """Queue for a slot of cost_class, or raise 503 when the queue is full or the deadline passes"""
+        if self._waiting.get(cost_class, 0) >= self.max_waiting:
+            raise self._reject("queue_full", cost_class, limit)
+
+        loop = asyncio.get_running_loop()
+        released = self._released.setdefault(cost_class, asyncio.Condition())
+        self._waiting[cost_class] = self._waiting.get(cost_class, 0) + 1
+        try:
+            # The condition's lock queues waiters in arrival order
+            async with released:
+                while not await self.backend.try_acquire(cost_class, limit, lease, self.lease_ttl):
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        raise self._reject("wait_timeout", cost_class, limit)
+                    # Woken by a release here; shared backends also poll for releases elsewhere
+                    timeout = min(remaining, self.backend.poll_interval or remaining)
+                    try:
+                        await asyncio.wait_for(released.wait(), timeout=timeout)
+                    except asyncio.TimeoutError:
+                        pass
+        finally:
+            self._waiting[cost_class] -= 1
+
+    @asynccontextmanager
+    async def slot(self, cost_class: str) -> AsyncIterator[None]:
+        """Hold a concurrency slot of cost_class for the duration of the block"""
+        limit = self.concurrency.get(cost_class)
+        if not self.enabled or limit is None:
+            yield
+            return
+
+        lease = uuid.uuid4().hex
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        try:
+            # Free slots go straight to new work only when nobody is queued ahead of it
+            if self._waiting.get(cost_class, 0) or not await self.backend.try_acquire(cost_class, limit, lease, self.lease_ttl):
+                await self._wait_for_slot(cost_class, limit, lease, started + self.max_wait)
+        except BaseException:
+            # A shared backend may have granted the lease just as the wait was cancelled
+            await self.backend.release(cost_class, lease)
+            raise
+        acquired = loop.time()
+        observe_stage("admission_wait", acquired - started)
+
+        try:
+            yield
+        finally:
+            held = loop.time() - acquired
+            previous = self._hold_seconds.get(cost_class)
+            self._hold_seconds[cost_class] = held if previous is None else 0.8 * previous + 0.2 * held
+            await self.backend.release(cost_class, lease)
+            released = self._released.setdefault(cost_class, asyncio.Condition())
+            async with released:
+                released.notify()
+
+    def stats(self) -> dict[str, any]:
+        """Get waiting counts and backend statistics"""
+        return {
+            "enabled": self.enabled,
+            "backend": self.backend.name,
+            "waiting": dict(self._waiting),
+            "concurrency": self.concurrency,
+            **self.backend.stats()
+        }
+
+# Create admission controller instance
+admission_controller = AdmissionController(
+    backend=create_admission_backend(),
+    burst=settings.RATE_LIMIT_BURST,
+    refill_per_second=settings.RATE_LIMIT_PER_MINUTE / 60,
+    costs=settings.RATE_LIMIT_COSTS,
+    concurrency=settings.ADMISSION_CONCURRENCY,
+    max_waiting=settings.ADMISSION_MAX_WAITING,
+    max_wait=settings.ADMISSION_MAX_WAIT,
+    lease_ttl=settings.ADMISSION_LEASE_TTL,
+    enabled=settings.ADMISSION_ENABLED
+)
+ADMISSION_WAITING.set_function(lambda: sum(admission_controller.stats()["waiting"].values()))
@@ -1,41 +1,169 @@
 from fastapi import HTTPException, Depends, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from supabase import create_client, Client
+from app.core.cache import TTLCache
+from app.core.clients import get_http_client, get_supabase
 from app.core.config import settings
+from app.core.metrics import record_cache, span
+import asyncio
+import hashlib
+import hmac
+import time
 import jwt
 import logging
 
 logger = logging.getLogger(__name__)
 
-# Initialize Supabase client
-supabase: Client = create_client(settings.SUPABASE_URL, settings.SUPABASE_ANON_KEY)
-
 # Security scheme
 security = HTTPBearer()
 
+# Verified user data keyed by token hash, each entry expiring with its token
+verified_tokens = TTLCache(max_entries=settings.JWT_CLAIMS_CACHE_SIZE)
+
+# Asymmetric signing keys published by Supabase Auth, created on first use
+_jwks_client: jwt.PyJWKClient | None = None
+
+# Placeholder secret from the settings defaults, never valid for verification
+PLACEHOLDER_SECRET = "your-secret-key"
+
 class AuthenticationError(Exception):
     """Custom authentication error"""
     pass
 
-async def verify_jwt_token(token: str) -> dict[str, any]:
+class VerificationKeyUnavailable(AuthenticationError):
+    """The token cannot be verified locally because its key is not available"""
+    pass
+
+def get_jwks_client() -> jwt.PyJWKClient:
+    """Get the cached JWKS client for the Supabase signing keys"""
+    global _jwks_client
+    if _jwks_client is None:
+        try:
+            _jwks_client = jwt.PyJWKClient(
+                settings.JWT_JWKS_URL or f"{settings.SUPABASE_URL}/auth/v1/.well-known/jwks.json",
+                cache_keys=True
+            )
+        except jwt.PyJWKClientError as e:
+            raise VerificationKeyUnavailable(f"JWKS endpoint is not configured: {str(e)}")
+    return _jwks_client
+
+def _token_cache_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def _user_from_claims(claims: dict[str, any]) -> dict[str, any]:
+    return {
+        "user_id": claims["sub"],
+        "email": claims.get("email"),
+        "user_metadata": claims.get("user_metadata") or {},
+        "app_metadata": claims.get("app_metadata") or {}
+    }
+
+async def _get_verification_key(token: str) -> tuple[any, str]:
+    """Resolve the key and algorithm a token must be verified with"""
+    try:
+        algorithm = jwt.get_unverified_header(token).get("alg", "")
+    except jwt.InvalidTokenError as e:
+        raise AuthenticationError(f"Token verification failed: {str(e)}")
+    
+    if algorithm.startswith("HS"):
+        # With an explicit JWKS endpoint only its asymmetric keys sign tokens
+        if settings.JWT_JWKS_URL or algorithm != settings.JWT_ALGORITHM:
+            raise AuthenticationError(f"Token verification failed: unexpected algorithm {algorithm}")
+        if not settings.JWT_SECRET_KEY or settings.JWT_SECRET_KEY == PLACEHOLDER_SECRET:
+            raise VerificationKeyUnavailable("JWT secret is not configured")
+        return settings.JWT_SECRET_KEY, algorithm
+    
+    if algorithm in ("RS256", "ES256", "EdDSA"):
+        try:
+            # Key lookups may hit the network on a cache miss
+            signing_key = await asyncio.to_thread(get_jwks_client().get_signing_key_from_jwt, token)
+        except jwt.PyJWKClientError as e:
+            raise VerificationKeyUnavailable(f"Signing key unavailable: {str(e)}")
+        return signing_key.key, algorithm
+    
+    # Includes "none"; no key makes such a token valid, so Supabase is not asked either
+    raise AuthenticationError(f"Token verification failed: unsupported algorithm {algorithm}")
+
+def expected_issuer() -> str | None:
+    """Issuer local verification requires, if known"""
+    if settings.JWT_ISSUER:
+        return settings.JWT_ISSUER
+    return f"{settings.SUPABASE_URL.rstrip('/')}/auth/v1" if settings.SUPABASE_URL else None
+
+async def verify_jwt_token_locally(token: str) -> dict[str, any]:
+    """Verify signature, expiry, audience and issuer of a JWT in-process"""
+    key, algorithm = await _get_verification_key(token)
+    try:
+        claims = jwt.decode(
+            token,
+            key,
+            algorithms=[algorithm],
+            audience=settings.JWT_AUDIENCE,
+            issuer=expected_issuer(),
+            leeway=settings.JWT_LEEWAY,
+            options={"require": ["exp", "sub"]}
+        )
+    except jwt.InvalidTokenError as e:
+        raise AuthenticationError(f"Token verification failed: {str(e)}")
+    
+    return {**_user_from_claims(claims), "exp": claims["exp"]}
+
+async def verify_jwt_token_remotely(token: str) -> dict[str, any]:
     """Verify JWT token with Supabase"""
     try:
         # Verify token with Supabase
-        response = supabase.auth.get_user(token)
+        supabase = await get_supabase()
+        with span("supabase_auth"):
+            response = await supabase.auth.get_user(token)
         
-        if not response.user:
+        if not response or not response.user:
             raise AuthenticationError("Invalid token")
         
-        return {
+        user_data = {
             "user_id": response.user.id,
             "email": response.user.email,
             "user_metadata": response.user.user_metadata or {},
             "app_metadata": response.user.app_metadata or {}
         }
     
+    except AuthenticationError:
+        raise
     except Exception as e:
         logger.error(f"JWT verification failed: {str(e)}")
         raise AuthenticationError(f"Token verification failed: {str(e)}")
+    
+    # Remote results are only trusted briefly so revocations take effect
+    try:
+        exp = jwt.decode(token, options={"verify_signature": False}).get("exp")
+    except jwt.InvalidTokenError:
+        exp = None
+    remote_expiry = time.time() + settings.JWT_REMOTE_CACHE_TTL
+    return {**user_data, "exp": min(exp, remote_expiry) if exp else remote_expiry}
+
+async def verify_jwt_token(token: str) -> dict[str, any]:
+    """Verify JWT token, locally when possible, caching the result until it expires"""
+    cache_key = _token_cache_key(token)
+    cached = verified_tokens.get(cache_key)
+    record_cache("auth_tokens", cached is not None)
+    if cached is not None:
+        return cached
+    
+    with span("auth", mode=settings.JWT_VERIFICATION_MODE):
+        if settings.JWT_VERIFICATION_MODE == "remote":
+            verified = await verify_jwt_token_remotely(token)
+        else:
+            try:
+                verified = await verify_jwt_token_locally(token)
+            except VerificationKeyUnavailable as e:
+                if not settings.JWT_REMOTE_FALLBACK:
+                    logger.error(f"JWT verification failed: {str(e)}")
+                    raise AuthenticationError(f"Token verification failed: {str(e)}")
+                verified = await verify_jwt_token_remotely(token)
+    
+    exp = verified.pop("exp")
+    ttl = exp - time.time()
+    if ttl > 0:
+        verified_tokens.set(cache_key, verified, ttl=ttl)
+    return verified
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security)
@@ -74,6 +202,20 @@ async def get_optional_user(
     except Exception:
         return None
 
+async def metrics_auth(
+    credentials: HTTPAuthorizationCredentials | None = Depends(HTTPBearer(auto_error=False))
+) -> None:
+    """Require the metrics token, when one is configured, from scrapers"""
+    if not settings.METRICS_TOKEN:
+        return
+    # As bytes, since compare_digest raises on non-ASCII strings
+    if credentials is None or not hmac.compare_digest(credentials.credentials.encode(), settings.METRICS_TOKEN.encode()):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid metrics token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
 def require_user_access(user_id: str, current_user: dict[str, any]) -> bool:
     """Check if current user has access to resources for the specified user_id"""
     if current_user["user_id"] != user_id:
@@ -86,9 +228,13 @@ def require_user_access(user_id: str, current_user: dict[str, any]) -> bool:
 async def validate_supabase_connection() -> bool:
     """Validate connection to Supabase"""
     try:
-        # Try to get the current session to test connection
-        response = supabase.auth.get_session()
-        return True
+        # Cheap readiness probe over the pooled client
+        response = await get_http_client().get(
+            f"{settings.SUPABASE_URL}/auth/v1/health",
+            headers={"apikey": settings.SUPABASE_ANON_KEY},
+            timeout=settings.SUPABASE_PROBE_TIMEOUT
+        )
+        return response.status_code == 200
     except Exception as e:
         logger.error(f"Supabase connection failed: {str(e)}")
         return False
@@ -0,0 +1,75 @@
+import asyncio
+import logging
+from typing import TYPE_CHECKING
+import httpx
+from app.core.config import settings
+
+# The Supabase SDK is slow to import, so it is loaded when the first client is built
+if TYPE_CHECKING:
+    from supabase import AsyncClient
+
+logger = logging.getLogger(__name__)
+
+# Shared clients, created on first use and closed in the app lifespan
+_http_client: httpx.AsyncClient | None = None
+_supabase_client: "AsyncClient | None" = None
+_supabase_lock = asyncio.Lock()
+
+def get_http_client() -> httpx.AsyncClient:
+    """Get the pooled HTTP client shared by all upstream calls"""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY
+            ),
+            timeout=httpx.Timeout(settings.DATABASE_TIMEOUT)
+        )
+    return _http_client
+
+async def get_supabase() -> "AsyncClient":
+    """Get the async Supabase client, building it on first use"""
+    global _supabase_client
+    if _supabase_client is not None:
+        return _supabase_client
+
+    async with _supabase_lock:
+        if _supabase_client is None:
+            from supabase import AsyncClientOptions, acreate_client
+            _supabase_client = await acreate_client(
+                settings.SUPABASE_URL,
+                settings.SUPABASE_ANON_KEY,
+                options=AsyncClientOptions(
+                    httpx_client=get_http_client(),
+                    # The service only verifies tokens, it never holds a session
+                    auto_refresh_token=False,
+                    persist_session=False
+                )
+            )
+    return _supabase_client
+
+async def warm_up_clients() -> None:
+    """Build the shared clients and open a pooled Supabase connection before the first request"""
+    client = get_http_client()
+    if settings.JWT_VERIFICATION_MODE == "remote":
+        await get_supabase()
+    if not settings.SUPABASE_URL:
+        return
+    try:
+        await client.get(
+            f"{settings.SUPABASE_URL}/auth/v1/health",
+            headers={"apikey": settings.SUPABASE_ANON_KEY},
+            timeout=settings.SUPABASE_PROBE_TIMEOUT
+        )
+    except httpx.HTTPError as e:
+        logger.warning(f"Could not open a connection to Supabase at startup: {str(e)}")
+
+async def close_clients() -> None:
+    """Close the shared clients on shutdown"""
+    global _http_client, _supabase_client
+    _supabase_client = None
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
@@ -22,33 +22,165 @@ class Settings(BaseSettings):
     # Google Gemini Configuration
     GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY", "")
     GEMINI_MODEL: str = "gemini-1.5-flash"
+    GEMINI_BASE_URL: str = "https://generativelanguage.googleapis.com"
     
     # File Upload Configuration
     MAX_FILE_SIZE: int = 10 * 1024 * 1024  # 10MB
     ALLOWED_FILE_TYPES: list[str] = ["pdf", "docx", "txt", "jpg", "jpeg", "png"]
     UPLOAD_DIR: str = "uploads"
+    INGEST_CHUNK_SIZE: int = 256 * 1024  # Read uploads in 256KB chunks
+    INGEST_SPOOL_MAX_MEMORY: int = 1024 * 1024  # Larger uploads spool to a temp file
+    INGEST_SPOOL_DIR: str | None = None  # Defaults to the system temp dir
     
     # Text Extraction Configuration
     MAX_TEXT_LENGTH: int = 50000  # Maximum characters to extract
+    GENERATION_MAX_TEXT_LENGTH: int = 1200000  # Characters extracted from uploads meant for question generation, about MAX_SOURCE_WORDS words of prose
+    TXT_DECODE_CHUNK_SIZE: int = 64 * 1024  # TXT uploads are decoded incrementally in chunks
+    TXT_DETECTION_SAMPLE_SIZE: int = 64 * 1024  # Bytes given to encoding detection when UTF-8 fails
     
     # Question Generation Configuration
     DEFAULT_MCQ_COUNT: int = 3
     DEFAULT_SHORT_ANSWER_COUNT: int = 2
     MAX_QUESTIONS_PER_REQUEST: int = 10
+    QUESTION_CACHE_MAX_ENTRIES: int = 1000  # Generated question sets kept in memory
+    QUESTION_CACHE_TTL: int = 24 * 60 * 60  # seconds
+    MAX_SOURCE_WORDS: int = 200000  # Longest text accepted for generation
     
+    # Chunked Generation Configuration (long texts are split into sections)
+    CHUNK_TOKEN_BUDGET: int = 6000  # Estimated tokens of source text per upstream call
+    CHUNK_OVERLAP_TOKENS: int = 300  # Context repeated between neighbouring sections
+    CHUNK_MAX_SECTIONS: int = 8  # Highest-coverage sections sent for generation
+    CHUNK_CONCURRENCY: int = 4  # Sections generated at once per request
+    QUESTION_DEDUP_THRESHOLD: float = 0.8  # Word overlap at which questions count as duplicates
+
+    # Answer Grading Configuration
+    GRADING_MAX_QUESTIONS: int = 100  # Questions per grading request
+    GRADING_MAX_SUBMISSIONS: int = 200  # Student submissions per grading request
+    GRADING_MAX_ANSWER_CHARS: int = 2000  # Longer answers are truncated before grading
+    GRADING_FUZZY_THRESHOLD: float = 0.85  # Spelling similarity at which a fill-in-the-blank answer counts
+    GRADING_ACCEPT_THRESHOLD: float = 0.8  # Key point coverage at which short answers pass without the model
+    GRADING_REJECT_THRESHOLD: float = 0.2  # Key point coverage at or below which short answers fail without the model
+    GRADING_MODEL_ENABLED: bool = True  # Send the short answers in between to Gemini
+    GRADING_BATCH_SIZE: int = 100  # Short answers per upstream grading call
+    GRADING_BATCH_CONCURRENCY: int = 4  # Upstream grading calls at once per request
+    GRADING_REFERENCE_CACHE_MAX_ENTRIES: int = 5000  # Precomputed question references kept in memory
+    GRADING_VERDICT_CACHE_MAX_ENTRIES: int = 20000  # Model verdicts per question and answer kept in memory
+
     # Performance Configuration
     REQUEST_TIMEOUT: int = 30  # seconds
     GEMINI_TIMEOUT: int = 25   # seconds
-    
+
+    # Extraction Executor Configuration
+    EXTRACTION_PROCESS_WORKERS: int = max(1, (os.cpu_count() or 2) - 1)  # PDF and OCR
+    EXTRACTION_THREAD_WORKERS: int = 4  # TXT and DOCX
+    EXTRACTION_MAX_PENDING: int = 32  # Jobs queued or running before uploads are shed
+    EXTRACTION_QUEUE_TIMEOUT: int = 5  # seconds to wait for a free slot
+
+    EXTRACTION_STREAM_CHUNK_CHARS: int = 2000  # Text per streamed chunk for formats without pages (DOCX)
+    EXTRACTION_WARM_UP: bool = True  # Start process workers at startup instead of on the first upload
+
+    # OCR Configuration
+    OCR_LANG: str = "eng"  # Tesseract languages, e.g. "eng+fra"
+    OCR_PSM: int = 3  # Tesseract page segmentation mode
+    OCR_TARGET_DPI: int = 300  # Images declaring a higher DPI are scaled down to this
+    OCR_MAX_DIMENSION: int = 3000  # Longest side in pixels after downscaling
+    OCR_BINARIZE: bool = True  # Otsu thresholding before OCR
+    OCR_TILE_HEIGHT: int = 1000  # Taller images are OCR'd as bands in parallel
+    OCR_MAX_TILES: int = 8
+
+    # Batch Upload Configuration
+    BATCH_MAX_FILES: int = 20  # Files per batch request
+    BATCH_CONCURRENCY: int = 4  # Files extracted at once per batch
+
+    # PDF Extraction Configuration
+    PDF_PAGE_BATCH_SIZE: int = 4  # Pages per worker job
+    PDF_MAX_PARALLEL_BATCHES: int = max(1, (os.cpu_count() or 2) - 1)
+    PDF_OCR_FALLBACK: bool = True  # OCR the images of pages without a text layer
+    PDF_OCR_MIN_CHARS: int = 20  # Pages with less text than this count as scanned
+
+    # Background Job Configuration
+    JOB_STORE: str = "memory"  # "memory" or "sqlite" (shared by processes on one host)
+    JOB_SQLITE_PATH: str | None = None  # Defaults to UPLOAD_DIR/jobs.sqlite3
+    JOB_WORKERS: int = 2  # Jobs extracted at once per process
+    JOB_MAX_QUEUED: int = 100  # Queued jobs before submissions are shed
+    JOB_TIMEOUT: int = 300  # seconds per extraction step, instead of REQUEST_TIMEOUT
+    JOB_MAX_RETRIES: int = 3  # Retries while the extraction workers are busy
+    JOB_RESULT_TTL: int = 60 * 60  # seconds finished jobs are kept
+    JOB_POLL_INTERVAL: float = 1.0  # seconds between store reads for event streams
+    JOB_WEBHOOK_HOSTS: list[str] = []  # Hosts allowed as completion callbacks
+    JOB_WEBHOOK_TIMEOUT: float = 5.0  # seconds
+
+    # Admission Control Configuration
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_BACKEND: str = "memory"  # "memory" or "sqlite" (shared by processes on one host)
+    ADMISSION_SQLITE_PATH: str | None = None  # Defaults to UPLOAD_DIR/admission.sqlite3
+    ADMISSION_CONCURRENCY: dict[str, int] = {"io": 16, "cpu": 4, "ocr": 2}  # Extractions at once per cost class
+    ADMISSION_MAX_WAITING: int = 32  # Extractions queued per cost class before shedding with 503
+    ADMISSION_MAX_WAIT: float = 10.0  # seconds to wait for a slot before shedding with 503
+    ADMISSION_POLL_INTERVAL: float = 0.05  # seconds between slot checks with a shared backend
+    ADMISSION_LEASE_TTL: float = 600.0  # seconds before slots held by a crashed worker are reclaimed
+    RATE_LIMIT_BURST: float = 30  # Tokens a user can spend at once
+    RATE_LIMIT_PER_MINUTE: float = 30  # Tokens refilled per user per minute
+    RATE_LIMIT_COSTS: dict[str, float] = {"io": 1, "cpu": 2, "ocr": 5, "generation": 3, "grading": 1}  # Tokens per file or request
+
+    # Extraction Cache Configuration
+    EXTRACTION_CACHE_ENABLED: bool = True
+    EXTRACTION_CACHE_MAX_BYTES: int = 64 * 1024 * 1024  # 64MB in memory
+    EXTRACTION_CACHE_TTL: int = 24 * 60 * 60  # seconds
+    EXTRACTION_CACHE_SHARED: bool = False  # Compressed in a SQLite file under UPLOAD_DIR, shared by worker processes
+    EXTRACTION_CACHE_DISK_ENABLED: bool = False  # Stored under UPLOAD_DIR
+    EXTRACTION_CACHE_DISK_MAX_BYTES: int = 512 * 1024 * 1024  # 512MB on disk, for the shared and disk tiers
+
+    # Document Store Configuration
+    DOCUMENT_STORE_ENABLED: bool = False  # Keep every upload, stored once per content hash
+    DOCUMENT_STORE_DIR: str | None = None  # Defaults to UPLOAD_DIR/documents
+    DOCUMENT_STORE_COMPRESSION_LEVEL: int = 6  # zlib level for stored text
+
+    # Near-Duplicate Detection Configuration
+    SIMILARITY_ENABLED: bool = True  # Reuse questions generated from near-identical text
+    SIMILARITY_INDEX_PATH: str | None = None  # SQLite file; defaults to UPLOAD_DIR/similarity.sqlite3, "" keeps it in memory only
+    SIMILARITY_THRESHOLD: float = 0.7  # Estimated Jaccard similarity of word shingles counted as a near-duplicate
+    SIMILARITY_SHINGLE_SIZE: int = 3  # Words per shingle
+    SIMILARITY_PERMUTATIONS: int = 128  # MinHash signature length
+    SIMILARITY_BANDS: int = 32  # LSH bands; more bands find less similar candidates
+    SIMILARITY_MIN_WORDS: int = 50  # Shorter texts are not indexed, their matches are mostly noise
+    SIMILARITY_MAX_ENTRIES: int = 20_000  # Signatures kept per worker (about 2.5KB each), oldest dropped first
+    SIMILARITY_SYNC_INTERVAL: float = 1.0  # seconds between reads of signatures added by other workers
+
     # Security Configuration
     JWT_SECRET_KEY: str = os.getenv("JWT_SECRET_KEY", "your-secret-key")
     JWT_ALGORITHM: str = "HS256"
+    JWT_AUDIENCE: str = "authenticated"  # Supabase access tokens
+    JWT_LEEWAY: int = 10  # seconds of clock skew tolerated
+    JWT_VERIFICATION_MODE: str = "local"  # "local" or "remote" (Supabase round-trip)
+    JWT_REMOTE_FALLBACK: bool = True  # Ask Supabase when no local key is available
+    JWT_REMOTE_CACHE_TTL: int = 60  # seconds to trust a remote verification
+    JWT_JWKS_URL: str = os.getenv("JWT_JWKS_URL", "")  # Defaults to the Supabase JWKS endpoint; when set, HS tokens are refused
+    JWT_ISSUER: str = os.getenv("JWT_ISSUER", "")  # Defaults to the Supabase Auth URL; unchecked when neither is set
+    JWT_CLAIMS_CACHE_SIZE: int = 10000  # Verified tokens kept in memory
     
     # Database Configuration
     DATABASE_TIMEOUT: int = 10  # seconds
+    SUPABASE_PROBE_TIMEOUT: float = 2.0  # seconds for readiness checks
+
+    # HTTP Client Pool Configuration (shared by Supabase and Gemini calls)
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY: float = 30.0  # seconds
+    HTTP_WARM_UP: bool = True  # Build clients and open a Supabase connection at startup
+
+    # Server Configuration (used by the skillscore-api command)
+    SERVER_HOST: str = "0.0.0.0"
+    SERVER_PORT: int = 8000
+    SERVER_WORKERS: int = os.cpu_count() or 1  # Worker processes
+    SERVER_SHARED_STATE: bool = True  # With several workers, keep jobs, rate limits and the extraction cache in SQLite
+    SERVER_DRAIN_TIMEOUT: int = 30  # seconds in-flight requests, then running jobs, get to finish on SIGTERM
     
     # Logging Configuration
     LOG_LEVEL: str = "INFO"
+    METRICS_ENABLED: bool = False  # Serve Prometheus metrics on /metrics
+    METRICS_TOKEN: str = ""  # Bearer token scrapers must send to /metrics; empty leaves it open
+    TRACE_SPANS: bool = False  # Log every stage as a structured span, not only failed ones
     
     class Config:
         env_file = ".env"
@@ -0,0 +1,219 @@
+import asyncio
+import logging
+import multiprocessing
+import threading
+from contextvars import ContextVar
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import AsyncIterator, Callable, Iterator
+from fastapi import HTTPException
+from app.core.config import settings
+from app.core.metrics import EXECUTOR_IN_FLIGHT
+
+logger = logging.getLogger(__name__)
+
+# Pool kinds: "process" for CPU-heavy parsing (PDF, OCR), "thread" for light formats
+PROCESS = "process"
+THREAD = "thread"
+
+# Overrides the job timeout for the current task and its children, e.g. background jobs
+job_timeout_override: ContextVar[float | None] = ContextVar("job_timeout_override", default=None)
+
+class ExtractionExecutor:
+    """Runs blocking extraction work off the event loop with backpressure and timeouts"""
+
+    def __init__(
+        self,
+        process_workers: int,
+        thread_workers: int,
+        max_pending: int,
+        queue_timeout: float,
+        job_timeout: float
+    ):
+        self.process_workers = process_workers
+        self.thread_workers = thread_workers
+        self.max_pending = max_pending
+        self.queue_timeout = queue_timeout
+        self.job_timeout = job_timeout
+
+        self._process_pool: ProcessPoolExecutor | None = None
+        self._thread_pool: ThreadPoolExecutor | None = None
+        self._slots = asyncio.Semaphore(max_pending)
+        self._in_flight = 0
+
+    def _get_pool(self, kind: str) -> Executor:
+        """Get (lazily creating) the pool for the given kind"""
+        if kind == PROCESS:
+            if self._process_pool is None:
+                # spawn avoids forking a process that already runs threads
+                self._process_pool = ProcessPoolExecutor(
+                    max_workers=self.process_workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._process_pool
+
+        if kind == THREAD:
+            if self._thread_pool is None:
+                self._thread_pool = ThreadPoolExecutor(
+                    max_workers=self.thread_workers,
+                    thread_name_prefix="extraction"
+                )
+            return self._thread_pool
+
+        raise ValueError(f"Unknown executor kind: {kind}")
+
+    def _release(self, _future=None) -> None:
+        """Free a slot once the underlying job has actually finished"""
+        self._in_flight -= 1
+        self._slots.release()
+
+    async def _acquire(self) -> None:
+        """Backpressure: wait briefly for a free slot, then shed load"""
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise HTTPException(
+                status_code=503,
+                detail="Server is busy processing other files. Please try again shortly."
+            )
+        self._in_flight += 1
+
+    async def run(self, kind: str, func: Callable, *args) -> any:
+        """Run func(*args) on the pool for kind, waiting at most REQUEST_TIMEOUT (or the override)"""
+        await self._acquire()
+        try:
+            future = self._get_pool(kind).submit(func, *args)
+        except BrokenProcessPool:
+            self._reset_process_pool()
+            self._release()
+            raise HTTPException(status_code=503, detail="Extraction workers are restarting. Please try again.")
+        except Exception:
+            self._release()
+            raise
+
+        # The slot is held until the job really completes, even if we stop waiting
+        loop = asyncio.get_running_loop()
+        future.add_done_callback(lambda f: loop.is_closed() or loop.call_soon_threadsafe(self._release))
+
+        job_timeout = job_timeout_override.get() or self.job_timeout
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout=job_timeout)
+        except asyncio.TimeoutError:
+            # Jobs that have not started yet are dropped; running ones finish in the background
+            future.cancel()
+            logger.warning(f"Extraction job {getattr(func, '__name__', func)} exceeded {job_timeout}s")
+            raise HTTPException(
+                status_code=504,
+                detail="Text extraction timed out. Please try again with a smaller file."
+            )
+        except BrokenProcessPool:
+            self._reset_process_pool()
+            raise HTTPException(status_code=503, detail="Extraction workers are restarting. Please try again.")
+
+    async def iterate(self, func: Callable[..., Iterator], *args, buffer: int = 8) -> AsyncIterator[any]:
+        """Run the generator func(*args) on the thread pool, yielding its items as they are produced.
+
+        At most buffer items wait for the consumer, so a slow consumer pauses the
+        generator. Waiting for items counts against the job timeout; the
+        generator stops at its next item once the consumer goes away.
+        """
+        await self._acquire()
+        loop = asyncio.get_running_loop()
+        items: asyncio.Queue[tuple[any, BaseException | None]] = asyncio.Queue()
+        credits = threading.Semaphore(buffer)
+        stop = threading.Event()
+        done = object()
+
+        def put(item: any, error: BaseException | None = None) -> None:
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(items.put_nowait, (item, error))
+
+        def produce() -> None:
+            try:
+                for item in func(*args):
+                    while not credits.acquire(timeout=0.1):
+                        if stop.is_set():
+                            return
+                    if stop.is_set():
+                        return
+                    put(item)
+            except BaseException as e:
+                put(done, e)
+            else:
+                put(done)
+
+        try:
+            future = self._get_pool(THREAD).submit(produce)
+        except Exception:
+            self._release()
+            raise
+        future.add_done_callback(lambda f: loop.is_closed() or loop.call_soon_threadsafe(self._release))
+
+        remaining = job_timeout_override.get() or self.job_timeout
+        try:
+            while True:
+                started = loop.time()
+                try:
+                    item, error = await asyncio.wait_for(items.get(), timeout=max(0, remaining))
+                except asyncio.TimeoutError:
+                    logger.warning(f"Extraction job {getattr(func, '__name__', func)} exceeded its timeout")
+                    raise HTTPException(
+                        status_code=504,
+                        detail="Text extraction timed out. Please try again with a smaller file."
+                    )
+                remaining -= loop.time() - started
+                if item is done:
+                    if error is not None:
+                        raise error
+                    return
+                credits.release()
+                yield item
+        finally:
+            stop.set()
+
+    async def warm_up(self, func: Callable) -> None:
+        """Start every process worker now by running func once per worker"""
+        pool = self._get_pool(PROCESS)
+        loop = asyncio.get_running_loop()
+        try:
+            pids = await asyncio.gather(*(
+                loop.run_in_executor(pool, func) for _ in range(self.process_workers)
+            ))
+            logger.info(f"Warmed up {len(set(pids))} extraction worker processes")
+        except BrokenProcessPool:
+            self._reset_process_pool()
+
+    def _reset_process_pool(self) -> None:
+        """Drop a broken process pool so the next job starts a fresh one"""
+        logger.error("Extraction process pool is broken; recreating it")
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+        self._process_pool = None
+
+    def stats(self) -> dict[str, any]:
+        """Get executor load statistics"""
+        return {
+            "in_flight": self._in_flight,
+            "max_pending": self.max_pending,
+            "process_workers": self.process_workers,
+            "thread_workers": self.thread_workers
+        }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Shut down both pools"""
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=wait, cancel_futures=True)
+            self._process_pool = None
+        if self._thread_pool is not None:
+            self._thread_pool.shutdown(wait=wait, cancel_futures=True)
+            self._thread_pool = None
+
+# Create executor instance
+extraction_executor = ExtractionExecutor(
+    process_workers=settings.EXTRACTION_PROCESS_WORKERS,
+    thread_workers=settings.EXTRACTION_THREAD_WORKERS,
+    max_pending=settings.EXTRACTION_MAX_PENDING,
+    queue_timeout=settings.EXTRACTION_QUEUE_TIMEOUT,
+    job_timeout=settings.REQUEST_TIMEOUT
+)
+EXECUTOR_IN_FLIGHT.set_function(lambda: extraction_executor.stats()["in_flight"])
@@ -0,0 +1,191 @@
+import asyncio
+import hashlib
+import logging
+import mimetypes
+import os
+import tempfile
+import time
+from fastapi import HTTPException, UploadFile
+from app.core.config import settings
+from app.core.metrics import observe_stage, span
+from app.core.utils import get_file_extension, validate_file_type
+
+logger = logging.getLogger(__name__)
+
+class UploadSpool:
+    """Upload body kept in memory up to a threshold, otherwise in a temp file on disk"""
+
+    def __init__(self, max_memory: int, directory: str | None = None):
+        self.max_memory = max_memory
+        self.directory = directory
+        self.size = 0
+        self.path: str | None = None
+
+        self._chunks: list[bytes] = []
+        self._file = None
+        self._content: bytes | None = None
+
+    @property
+    def on_disk(self) -> bool:
+        return self.path is not None
+
+    def write(self, chunk: bytes) -> None:
+        """Append a chunk, rolling over to disk once max_memory is exceeded"""
+        self.size += len(chunk)
+
+        if self._file is None and self.size > self.max_memory:
+            self._file = tempfile.NamedTemporaryFile(
+                prefix="upload-", dir=self.directory, delete=False
+            )
+            self.path = self._file.name
+            for buffered in self._chunks:
+                self._file.write(buffered)
+            self._chunks = []
+
+        if self._file is not None:
+            self._file.write(chunk)
+        else:
+            self._chunks.append(chunk)
+
+    def finish(self) -> None:
+        """Seal the spool once the whole body has been written"""
+        if self._file is not None:
+            self._file.close()
+        else:
+            self._content = b''.join(self._chunks)
+            self._chunks = []
+
+    @property
+    def source(self) -> bytes | str:
+        """Extractor input: the bytes for small uploads, the temp file path for large ones"""
+        return self.path if self.path is not None else self._content
+
+    def read_bytes(self) -> bytes:
+        """Get the full body as bytes (copies from disk for large uploads)"""
+        if self.path is None:
+            return self._content
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    def close(self) -> None:
+        """Release memory and delete the temp file"""
+        self._chunks = []
+        self._content = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self.path is not None:
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+            self.path = None
+
+class IngestedFile:
+    """A validated, hashed upload spooled for extraction"""
+
+    def __init__(
+        self,
+        filename: str,
+        content_type: str | None,
+        extension: str,
+        file_hash: str,
+        spool: UploadSpool
+    ):
+        self.filename = filename
+        self.content_type = content_type
+        self.extension = extension
+        self.hash = file_hash
+        self.spool = spool
+        # Set once the upload is kept in the document store
+        self.document: dict[str, any] | None = None
+
+    @property
+    def size(self) -> int:
+        return self.spool.size
+
+    @property
+    def source(self) -> bytes | str:
+        return self.spool.source
+
+    def info(self) -> dict[str, any]:
+        """File info in the shape returned by validate_upload_file"""
+        info = {
+            "filename": self.filename,
+            "content_type": self.content_type,
+            "size": self.size,
+            "extension": self.extension,
+            "hash": self.hash
+        }
+        if self.document is not None:
+            info["document"] = self.document
+        return info
+
+    def close(self) -> None:
+        self.spool.close()
+
+    def __enter__(self) -> "IngestedFile":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+async def ingest_upload(
+    file: UploadFile,
+    max_size: int | None = None,
+    chunk_size: int | None = None
+) -> IngestedFile:
+    """Validate, hash and spool an upload in a single streaming pass"""
+    if not file.filename:
+        raise HTTPException(status_code=400, detail="No filename provided")
+
+    # Validate file type
+    if not validate_file_type(file.filename):
+        raise HTTPException(
+            status_code=400,
+            detail=f"File type not allowed. Supported types: {', '.join(settings.ALLOWED_FILE_TYPES)}"
+        )
+
+    max_size = settings.MAX_FILE_SIZE if max_size is None else max_size
+    chunk_size = chunk_size or settings.INGEST_CHUNK_SIZE
+
+    extension = get_file_extension(file.filename)
+    hasher = hashlib.sha256()
+    hash_seconds = 0.0
+    spool = UploadSpool(settings.INGEST_SPOOL_MAX_MEMORY, settings.INGEST_SPOOL_DIR)
+    try:
+        with span("upload_read", file_type=extension) as read_span:
+            while chunk := await file.read(chunk_size):
+                # Reject as soon as the limit is crossed instead of reading the rest
+                if spool.size + len(chunk) > max_size:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"File too large. Maximum size: {max_size / (1024*1024):.1f}MB"
+                    )
+
+                hash_started = time.perf_counter()
+                hasher.update(chunk)
+                hash_seconds += time.perf_counter() - hash_started
+                if spool.on_disk:
+                    await asyncio.to_thread(spool.write, chunk)
+                else:
+                    spool.write(chunk)
+                read_span.size = spool.size
+
+            spool.finish()
+    except BaseException:
+        spool.close()
+        raise
+    # Hashing happens in the same pass as reading; its share is recorded separately
+    observe_stage("hash", hash_seconds, extension, spool.size)
+
+    # Get MIME type
+    mime_type, _ = mimetypes.guess_type(file.filename)
+
+    return IngestedFile(
+        filename=file.filename,
+        content_type=mime_type or file.content_type,
+        extension=extension,
+        file_hash=hasher.hexdigest(),
+        spool=spool
+    )
@@ -0,0 +1,406 @@
+import asyncio
+import logging
+import re
+import time
+import uuid
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Id of the request being served, set by RequestContextMiddleware
+request_id_var: ContextVar[str | None] = ContextVar("request_id", default=None)
+
+# Client-supplied request ids are only trusted when they look like ids
+_REQUEST_ID_RE = re.compile(r'^[A-Za-z0-9._:-]{1,128}$')
+
+# Latency buckets in seconds, from cache hits up to long OCR jobs
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Upper bounds of the upload size buckets used as a label
+SIZE_BUCKETS = ((100 * 1024, "0-100KB"), (1024 * 1024, "100KB-1MB"), (10 * 1024 * 1024, "1-10MB"))
+
+def size_bucket(size: int | None) -> str:
+    """Label for an upload size"""
+    if size is None:
+        return ""
+    for bound, label in SIZE_BUCKETS:
+        if size < bound:
+            return label
+    return "10MB+"
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    # Empty label values are the same as absent labels to Prometheus, so leave them out
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values) if value]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+class Metric(ABC):
+    """A metric family with fixed label names, rendered in the Prometheus text format.
+
+    Children are created per label combination on first use and updated from
+    the event loop, so no locking is needed on the hot path.
+    """
+
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._children: dict[tuple[str, ...], any] = {}
+        self._callback: Callable[[], float] | None = None
+
+    @abstractmethod
+    def _new_child(self) -> any:
+        """Create the value holder for one label combination"""
+
+    def labels(self, *values: str) -> any:
+        """Get the child for a label combination"""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            child = self._children[values] = self._new_child()
+        return child
+
+    def children(self) -> dict[tuple[str, ...], any]:
+        """Snapshot of the children by label values"""
+        return dict(self._children)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for values, child in list(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+    def _render_child(self, values: tuple[str, ...], child: any) -> list[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"]
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+class Counter(Metric):
+    """Monotonically increasing count"""
+
+    type = "counter"
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+    def inc(self, amount: float = 1) -> None:
+        self.labels().inc(amount)
+
+class Gauge(Metric):
+    """Value that goes up and down, or is read from a callback when rendered"""
+
+    type = "gauge"
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+    def inc(self, amount: float = 1) -> None:
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1) -> None:
+        self.labels().dec(amount)
+
+    def set_function(self, callback: Callable[[], float]) -> None:
+        """Read the (unlabelled) value from callback at render time"""
+        self._callback = callback
+
+    def render(self) -> list[str]:
+        if self._callback is not None:
+            try:
+                self.labels().set(self._callback())
+            except Exception as e:
+                logger.warning(f"Metric callback for {self.name} failed: {str(e)}")
+        return super().render()
+
+class _HistogramValue:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class Histogram(Metric):
+    """Distribution of observed values in cumulative buckets"""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self) -> _HistogramValue:
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def _render_child(self, values: tuple[str, ...], child: _HistogramValue) -> list[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip((*self.buckets, float('inf')), child.counts):
+            cumulative += count
+            labels = _format_labels(self.labelnames, values, f'le="{_format_value(bound)}"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+        lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+class MetricsRegistry:
+    """Collection of metric families exposed together"""
+
+    def __init__(self):
+        self._metrics: dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+# Create registry instance
+metrics_registry = MetricsRegistry()
+
+HTTP_REQUESTS = metrics_registry.register(Counter(
+    "skillscore_http_requests_total", "HTTP requests served", ("method", "route", "status")
+))
+HTTP_REQUEST_SECONDS = metrics_registry.register(Histogram(
+    "skillscore_http_request_duration_seconds", "HTTP request latency, including streamed bodies", ("method", "route")
+))
+HTTP_IN_FLIGHT = metrics_registry.register(Gauge(
+    "skillscore_http_requests_in_flight", "HTTP requests being served"
+))
+STAGE_SECONDS = metrics_registry.register(Histogram(
+    "skillscore_stage_duration_seconds", "Time spent per request stage", ("stage", "file_type", "size_bucket")
+))
+STAGE_IN_FLIGHT = metrics_registry.register(Gauge(
+    "skillscore_stage_in_flight", "Stages currently running", ("stage",)
+))
+STAGE_FAILURES = metrics_registry.register(Counter(
+    "skillscore_stage_failures_total", "Stages that raised, e.g. extractor failures", ("stage", "file_type", "error")
+))
+PDF_PAGE_SECONDS = metrics_registry.register(Histogram(
+    "skillscore_pdf_page_duration_seconds", "Text layer extraction time per PDF page, and OCR time for scanned pages", ("source",)
+))
+CACHE_REQUESTS = metrics_registry.register(Counter(
+    "skillscore_cache_requests_total", "Cache lookups by outcome", ("cache", "result")
+))
+ADMISSION_REJECTIONS = metrics_registry.register(Counter(
+    "skillscore_admission_rejections_total", "Requests shed by admission control", ("reason", "cost_class")
+))
+# Read from the owning services when scraped
+EXECUTOR_IN_FLIGHT = metrics_registry.register(Gauge(
+    "skillscore_extraction_executor_in_flight", "Extraction jobs holding an executor slot"
+))
+BACKGROUND_JOBS_QUEUED = metrics_registry.register(Gauge(
+    "skillscore_background_jobs_queued", "Background extraction jobs waiting for a worker"
+))
+BACKGROUND_JOBS_RUNNING = metrics_registry.register(Gauge(
+    "skillscore_background_jobs_running", "Background extraction jobs being processed"
+))
+QUESTION_GENERATIONS_IN_FLIGHT = metrics_registry.register(Gauge(
+    "skillscore_question_generations_in_flight", "Upstream question generation calls in flight"
+))
+ADMISSION_WAITING = metrics_registry.register(Gauge(
+    "skillscore_admission_waiting", "Extractions waiting for a concurrency slot"
+))
+SIMILARITY_INDEX_ENTRIES = metrics_registry.register(Gauge(
+    "skillscore_similarity_index_entries", "Text signatures in the near-duplicate index"
+))
+SIMILARITY_INDEX_BYTES = metrics_registry.register(Gauge(
+    "skillscore_similarity_index_bytes", "Approximate memory used by the near-duplicate index"
+))
+
+def record_cache(cache: str, hit: bool) -> None:
+    """Count a cache lookup"""
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+def _add_request_id(logger: any, method: str, event_dict: dict[str, any]) -> dict[str, any]:
+    request_id = request_id_var.get()
+    if request_id is not None:
+        event_dict.setdefault("request_id", request_id)
+    return event_dict
+
+# Span logger, configured on first use since importing structlog takes ~100ms
+_span_logger = None
+
+def get_span_logger() -> any:
+    """Get the structured logger spans are written to"""
+    global _span_logger
+    if _span_logger is None:
+        import structlog
+        structlog.configure(
+            processors=[
+                structlog.processors.add_log_level,
+                structlog.processors.TimeStamper(fmt="iso"),
+                _add_request_id,
+                structlog.processors.JSONRenderer()
+            ],
+            wrapper_class=structlog.make_filtering_bound_logger(logging.INFO),
+            cache_logger_on_first_use=True
+        )
+        _span_logger = structlog.get_logger("skillscore.spans")
+    return _span_logger
+
+class Span:
+    """Times a stage into STAGE_SECONDS and logs it as a structured span.
+
+    Successful spans are logged only with TRACE_SPANS; failed ones always are.
+    Labels can be filled in while the stage runs (e.g. the size once it is known).
+    """
+
+    __slots__ = ("stage", "file_type", "size", "fields", "started")
+
+    def __init__(self, stage: str, file_type: str = "", size: int | None = None, **fields):
+        self.stage = stage
+        self.file_type = file_type
+        self.size = size
+        self.fields = fields
+        self.started = 0.0
+
+    def __enter__(self) -> "Span":
+        STAGE_IN_FLIGHT.labels(self.stage).inc()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        elapsed = time.perf_counter() - self.started
+        STAGE_IN_FLIGHT.labels(self.stage).dec()
+        STAGE_SECONDS.labels(self.stage, self.file_type, size_bucket(self.size)).observe(elapsed)
+
+        if exc_type is None:
+            if settings.TRACE_SPANS:
+                self._log("info", elapsed, "ok")
+            return
+        # Cancellation is the caller going away, not the stage failing
+        if issubclass(exc_type, (asyncio.CancelledError, GeneratorExit)):
+            return
+        STAGE_FAILURES.labels(self.stage, self.file_type, exc_type.__name__).inc()
+        self._log("warning", elapsed, "error", error=f"{exc_type.__name__}: {str(exc)}")
+
+    def _log(self, level: str, elapsed: float, outcome: str, **extra) -> None:
+        getattr(get_span_logger(), level)(
+            "span",
+            stage=self.stage,
+            duration_ms=round(elapsed * 1000, 3),
+            outcome=outcome,
+            **({"file_type": self.file_type} if self.file_type else {}),
+            **({"size": self.size} if self.size is not None else {}),
+            **self.fields,
+            **extra
+        )
+
+def span(stage: str, file_type: str = "", size: int | None = None, **fields) -> Span:
+    """Time a stage: with span("extract", file_type="pdf", size=n): ..."""
+    return Span(stage, file_type, size, **fields)
+
+def observe_stage(stage: str, seconds: float, file_type: str = "", size: int | None = None) -> None:
+    """Record a stage timed elsewhere, e.g. in a worker process"""
+    STAGE_SECONDS.labels(stage, file_type, size_bucket(size)).observe(seconds)
+
+def route_template(scope: dict[str, any]) -> str:
+    """Path of the matched route with its parameters as placeholders, e.g. /api/v1/jobs/{job_id}"""
+    if "endpoint" not in scope:
+        # Unmatched paths share one label so scanners cannot blow up the label set
+        return "unmatched"
+    path = scope["path"]
+    params = scope.get("path_params")
+    if not params:
+        return path
+    placeholders = {str(value): f"{{{name}}}" for name, value in params.items()}
+    return '/'.join(placeholders.get(segment, segment) for segment in path.split('/'))
+
+class RequestContextMiddleware:
+    """Assigns each request an id and records HTTP latency, status and in-flight metrics.
+
+    The id comes from a well-formed X-Request-ID header or is generated, is
+    echoed in the response and tags every span logged while serving it.
+    """
+
+    def __init__(self, app: any):
+        self.app = app
+
+    async def __call__(self, scope: dict[str, any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")
+                break
+        if not request_id or not _REQUEST_ID_RE.match(request_id):
+            request_id = uuid.uuid4().hex
+        token = request_id_var.set(request_id)
+
+        status = 500
+
+        async def send_with_request_id(message: dict[str, any]) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = [*message.get("headers", []), (b"x-request-id", request_id.encode())]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            elapsed = time.perf_counter() - started
+            HTTP_IN_FLIGHT.dec()
+            route = route_template(scope)
+            method = scope["method"]
+            HTTP_REQUESTS.labels(method, route, str(status)).inc()
+            HTTP_REQUEST_SECONDS.labels(method, route).observe(elapsed)
+            request_id_var.reset(token)
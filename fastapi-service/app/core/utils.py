@@ -1,4 +1,5 @@
 import os
+import re
 import uuid
 import hashlib
 import mimetypes
@@ -50,6 +51,11 @@ def create_upload_path(user_id: str, filename: str) -> str:
     safe_filename = sanitize_filename(filename)
     return f"users/{user_id}/documents/{file_id}_{safe_filename}"
 
+def create_content_path(content_hash: str, extension: str) -> str:
+    """Create the storage path for content shared by every upload with this hash"""
+    # Shard by the head of the hash to keep directories small
+    return f"contents/{content_hash[:2]}/{content_hash}.{extension or 'bin'}"
+
 async def validate_upload_file(file: UploadFile) -> dict[str, any]:
     """Validate uploaded file and return file info"""
     if not file.filename:
@@ -62,25 +68,28 @@ async def validate_upload_file(file: UploadFile) -> dict[str, any]:
             detail=f"File type not allowed. Supported types: {', '.join(settings.ALLOWED_FILE_TYPES)}"
         )
     
-    # Read file content to validate size
-    content = await file.read()
+    # Stream the file to validate size and hash without holding it in memory
+    hasher = hashlib.sha256()
+    size = 0
+    while chunk := await file.read(settings.INGEST_CHUNK_SIZE):
+        size += len(chunk)
+        if not validate_file_size(size):
+            raise HTTPException(
+                status_code=400,
+                detail=f"File too large. Maximum size: {settings.MAX_FILE_SIZE / (1024*1024):.1f}MB"
+            )
+        hasher.update(chunk)
     await file.seek(0)  # Reset file pointer
     
-    if not validate_file_size(len(content)):
-        raise HTTPException(
-            status_code=400,
-            detail=f"File too large. Maximum size: {settings.MAX_FILE_SIZE / (1024*1024):.1f}MB"
-        )
-    
     # Get MIME type
     mime_type, _ = mimetypes.guess_type(file.filename)
     
     return {
         "filename": file.filename,
         "content_type": mime_type or file.content_type,
-        "size": len(content),
+        "size": size,
         "extension": get_file_extension(file.filename),
-        "hash": generate_file_hash(content)
+        "hash": hasher.hexdigest()
     }
 
 def format_error_response(error: Exception, context: str = "") -> dict[str, any]:
@@ -144,8 +153,15 @@ def create_success_response(data: any, message: str = "Success") -> dict[str, an
         "data": data
     }
 
-def validate_question_params(difficulty: str, count: int) -> dict[str, any]:
-    """Validate question generation parameters"""
+# Question types the generator can produce
+QUESTION_TYPES = ["mcq", "short_answer", "true_false", "fill_blank"]
+
+def validate_question_params(
+    difficulty: str,
+    count: int | None = None,
+    question_types: dict[str, int] | None = None
+) -> dict[str, any]:
+    """Validate question generation parameters, either a single count or a per-type mix"""
     valid_difficulties = ["easy", "medium", "hard"]
     
     if difficulty not in valid_difficulties:
@@ -154,26 +170,122 @@ def validate_question_params(difficulty: str, count: int) -> dict[str, any]:
             detail=f"Invalid difficulty. Must be one of: {', '.join(valid_difficulties)}"
         )
     
-    if count < 1 or count > settings.MAX_QUESTIONS_PER_REQUEST:
+    if question_types is not None:
+        unknown = [question_type for question_type in question_types if question_type not in QUESTION_TYPES]
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid question type: {', '.join(unknown)}. Must be one of: {', '.join(QUESTION_TYPES)}"
+            )
+        if any(type_count < 0 for type_count in question_types.values()):
+            raise HTTPException(status_code=400, detail="Question counts cannot be negative")
+        
+        question_types = {t: c for t, c in question_types.items() if c > 0}
+        count = sum(question_types.values())
+    
+    if count is None or count < 1 or count > settings.MAX_QUESTIONS_PER_REQUEST:
         raise HTTPException(
             status_code=400,
             detail=f"Invalid question count. Must be between 1 and {settings.MAX_QUESTIONS_PER_REQUEST}"
         )
     
-    return {"difficulty": difficulty, "count": count}
+    params = {"difficulty": difficulty, "count": count}
+    if question_types is not None:
+        params["question_types"] = question_types
+    return params
+
+# Text cleaning tables, compiled once
+# Control characters that str.split() does not treat as whitespace are dropped
+_CONTROL_TABLE = dict.fromkeys(c for c in range(32) if not chr(c).isspace())
+_PARAGRAPH_SPLIT_RE = re.compile(r'\n\s*\n')
+
+def _normalize_whitespace(text: str) -> str:
+    """Collapse whitespace runs, keeping blank-line paragraph breaks"""
+    paragraphs = (' '.join(paragraph.split()) for paragraph in _PARAGRAPH_SPLIT_RE.split(text))
+    return '\n\n'.join(paragraph for paragraph in paragraphs if paragraph)
+
+def _collapse(whitespace: str) -> str:
+    """Shorten a whitespace run while keeping how many line breaks it holds (up to two)"""
+    newlines = whitespace.count('\n')
+    if newlines:
+        return '\n' * min(newlines, 2)
+    return ' ' if whitespace else ''
+
+def _separator(whitespace: str) -> str:
+    """Collapse a whitespace run to a paragraph break, a space or nothing"""
+    if not whitespace:
+        return ''
+    return '\n\n' if whitespace.count('\n') >= 2 else ' '
+
+class TextCleaner:
+    """Incrementally clean streamed text, stopping once the length budget is exceeded.
+    
+    Text returned by feed() is final: the cut at the budget happens in the
+    chunk that crosses it, so the pieces always concatenate to finish().
+    """
+    
+    def __init__(self, max_length: int | None = None):
+        self.max_length = settings.MAX_TEXT_LENGTH if max_length is None else max_length
+        self.length = 0
+        self._parts: list[str] = []
+        self._pending = ''  # Whitespace between chunks, collapsed
+        self._truncated = False
+    
+    @property
+    def full(self) -> bool:
+        """Whether enough text has been collected to fill the budget"""
+        return self._truncated
+    
+    def feed(self, chunk: str) -> str:
+        """Clean a chunk and return the newly added text"""
+        if self.full or not chunk:
+            return ""
+        
+        chunk = chunk.translate(_CONTROL_TABLE)
+        body = chunk.strip()
+        if not body:
+            self._pending = _collapse(self._pending + chunk)
+            return ""
+        
+        leading = self._pending + chunk[:len(chunk) - len(chunk.lstrip())]
+        self._pending = _collapse(chunk[len(chunk.rstrip()):])
+        
+        text = _normalize_whitespace(body)
+        if self.length:
+            text = _separator(leading) + text
+        if self.length + len(text) > self.max_length:
+            text = self._truncate(text)
+        
+        self._parts.append(text)
+        self.length += len(text)
+        return text
+    
+    def _truncate(self, text: str) -> str:
+        """Cut the chunk crossing the budget as truncate_text would, but never inside text already returned"""
+        self._truncated = True
+        text = text[:self.max_length - self.length]
+        last_space = text.rfind(' ')
+        # A word boundary in the last 20% of the budget
+        if last_space >= 0 and self.length + last_space > self.max_length * 0.8:
+            text = text[:last_space]
+        return text + "..."
+    
+    def finish(self) -> str:
+        """Get the cleaned text, truncated to the budget"""
+        return ''.join(self._parts)
 
-def clean_extracted_text(text: str) -> str:
+def clean_extracted_text(text: str, max_length: int | None = None) -> str:
     """Clean and normalize extracted text"""
     if not text:
         return ""
     
-    # Remove excessive whitespace
-    text = ' '.join(text.split())
-    
-    # Remove control characters
-    text = ''.join(char for char in text if ord(char) >= 32 or char in '\n\t')
+    cleaner = TextCleaner(max_length)
     
-    # Truncate if too long
-    text = truncate_text(text)
+    # Cleaning only shrinks text, so feed windows until the budget is filled
+    window = max(cleaner.max_length, 4096)
+    for start in range(0, len(text), window):
+        cleaner.feed(text[start:start + window])
+        if cleaner.full:
+            break
     
-    return text.strip()
\ No newline at end of file
+    return cleaner.finish()
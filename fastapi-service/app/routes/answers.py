@@ -0,0 +1,69 @@
+import logging
+from typing import Any
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel
+from app.core.admission import admission_controller
+from app.core.auth import auth_required
+from app.core.config import settings
+from app.core.utils import QUESTION_TYPES, create_success_response
+from app.services.gemini import is_valid_question
+from app.services.grading import answer_grading_service
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+class AnswerSubmission(BaseModel):
+    student_id: str | None = None
+    # One answer per question, in question order: an option index or text, a boolean, or text
+    answers: list[str | int | bool | None]
+
+class EvaluateAnswersRequest(BaseModel):
+    # Questions as /questions/generate returns them, each with its "type"
+    questions: list[dict[str, Any]]
+    # A single student's answers, or submissions for a whole class graded together
+    answers: list[str | int | bool | None] | None = None
+    submissions: list[AnswerSubmission] | None = None
+
+def validate_grading_request(request: EvaluateAnswersRequest) -> list[AnswerSubmission]:
+    """Check the questions and answers, returning the submissions to grade"""
+    if not request.questions or len(request.questions) > settings.GRADING_MAX_QUESTIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid question count. Must be between 1 and {settings.GRADING_MAX_QUESTIONS}"
+        )
+    for index, question in enumerate(request.questions):
+        question_type = question.get("type")
+        if question_type not in QUESTION_TYPES or not is_valid_question(question_type, question):
+            raise HTTPException(status_code=400, detail=f"Invalid question at index {index}")
+
+    if (request.answers is None) == (request.submissions is None):
+        raise HTTPException(status_code=400, detail="Provide either answers or submissions")
+    submissions = request.submissions if request.answers is None else [AnswerSubmission(answers=request.answers)]
+    if not submissions or len(submissions) > settings.GRADING_MAX_SUBMISSIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid submission count. Must be between 1 and {settings.GRADING_MAX_SUBMISSIONS}"
+        )
+    if any(len(submission.answers) > len(request.questions) for submission in submissions):
+        raise HTTPException(status_code=400, detail="More answers than questions")
+    return submissions
+
+@router.post("/evaluate")
+async def evaluate_answers(
+    request: EvaluateAnswersRequest,
+    current_user: dict[str, any] = Depends(auth_required)
+):
+    """Grade one submission or a whole class against the same questions"""
+    submissions = validate_grading_request(request)
+    cost_classes = ["grading"]
+    if settings.GRADING_MODEL_ENABLED and any(question["type"] == "short_answer" for question in request.questions):
+        cost_classes.append("generation")
+    await admission_controller.charge(current_user["user_id"], cost_classes)
+
+    result = await answer_grading_service.grade(
+        request.questions, [submission.answers for submission in submissions]
+    )
+    for submission, graded in zip(submissions, result["submissions"]):
+        graded["student_id"] = submission.student_id
+    return create_success_response(result, message="Answers graded successfully")
@@ -0,0 +1,49 @@
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Query
+from app.core.auth import auth_required
+from app.core.utils import create_success_response
+from app.services.document_store import DocumentStore, document_store
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+def require_document_store() -> DocumentStore:
+    """Get the document store, or 404 when uploads are not kept"""
+    if document_store is None:
+        raise HTTPException(status_code=404, detail="Document storage is not enabled")
+    return document_store
+
+@router.get("")
+async def list_documents(
+    limit: int = Query(50, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+    store: DocumentStore = Depends(require_document_store),
+    current_user: dict[str, any] = Depends(auth_required)
+):
+    """List the current user's stored uploads, newest first"""
+    documents = await store.list_documents(current_user["user_id"], limit, offset)
+    return create_success_response({"documents": documents, "limit": limit, "offset": offset})
+
+@router.get("/{document_id}")
+async def get_document(
+    document_id: str,
+    store: DocumentStore = Depends(require_document_store),
+    current_user: dict[str, any] = Depends(auth_required)
+):
+    """Get a stored upload with its extracted text, once extracted"""
+    document = await store.get_document(document_id, current_user["user_id"])
+    if document is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return create_success_response(document)
+
+@router.delete("/{document_id}")
+async def delete_document(
+    document_id: str,
+    store: DocumentStore = Depends(require_document_store),
+    current_user: dict[str, any] = Depends(auth_required)
+):
+    """Delete a stored upload; its content is removed once no upload references it"""
+    if not await store.delete_document(document_id, current_user["user_id"]):
+        raise HTTPException(status_code=404, detail="Document not found")
+    return create_success_response({"id": document_id}, message="Document deleted")
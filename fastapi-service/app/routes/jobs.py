@@ -0,0 +1,66 @@
+import logging
+from typing import AsyncIterator
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Query, UploadFile
+from fastapi.responses import JSONResponse
+from app.core.admission import admission_controller
+from app.core.auth import auth_required
+from app.core.config import settings
+from app.core.ingest import ingest_upload
+from app.core.utils import create_success_response
+from app.routes.streaming import format_stream
+from app.routes.upload import store_upload, upload_cost_classes
+from app.services.jobs import extraction_job_queue, public_job, validate_callback_url
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+@router.post("")
+async def submit_job(
+    file: UploadFile = File(...),
+    priority: str = Query("normal", pattern="^(high|normal|low)$"),
+    callback_url: str | None = Form(None),
+    current_user: dict[str, any] = Depends(auth_required)
+):
+    """Queue a file for background extraction and return the job immediately"""
+    callback_url = validate_callback_url(callback_url)
+    await admission_controller.charge(current_user["user_id"], upload_cost_classes([file]))
+    ingested = await ingest_upload(file)
+    try:
+        await store_upload(current_user["user_id"], ingested)
+        job = await extraction_job_queue.submit(ingested, current_user["user_id"], priority, callback_url)
+    except Exception:
+        ingested.close()
+        raise
+
+    return JSONResponse(
+        status_code=202,
+        content=create_success_response(public_job(job), message="Extraction job queued"),
+        headers={"Location": f"{settings.API_V1_STR}/jobs/{job['id']}"}
+    )
+
+@router.get("/{job_id}")
+async def get_job(
+    job_id: str,
+    current_user: dict[str, any] = Depends(auth_required)
+):
+    """Get the status, and once finished the result, of an extraction job"""
+    job = await extraction_job_queue.get(job_id, current_user["user_id"])
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return create_success_response(public_job(job))
+
+@router.get("/{job_id}/events")
+async def job_events(
+    job_id: str,
+    current_user: dict[str, any] = Depends(auth_required)
+):
+    """Stream the job as server-sent events each time its status changes"""
+    if await extraction_job_queue.get(job_id, current_user["user_id"]) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def records() -> AsyncIterator[dict[str, any]]:
+        async for job in extraction_job_queue.watch(job_id, current_user["user_id"]):
+            yield {"type": job["status"], "job": public_job(job)}
+
+    return format_stream(records(), "sse")
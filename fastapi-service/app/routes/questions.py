@@ -0,0 +1,91 @@
+import logging
+from typing import AsyncIterator
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel
+from app.core.admission import admission_controller
+from app.core.auth import auth_required
+from app.core.config import settings
+from app.core.utils import (
+    create_success_response,
+    format_error_response,
+    validate_question_params
+)
+from app.routes.streaming import STREAM_FORMAT_PATTERN, format_stream
+from app.services.chunking import QuestionDeduplicator
+from app.services.gemini import GeminiError, question_generation_service
+from app.services.text_extraction import text_extraction_service
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+class GenerateQuestionsRequest(BaseModel):
+    text: str
+    question_type: str = "mcq"
+    difficulty: str = "medium"
+    count: int = settings.DEFAULT_MCQ_COUNT
+    # Per-type counts, e.g. {"mcq": 5, "true_false": 3}; overrides question_type and count
+    question_types: dict[str, int] | None = None
+    stream: bool = False
+
+def gemini_http_error(error: GeminiError) -> HTTPException:
+    """Map a Gemini failure to a gateway error with a user-friendly message"""
+    response = format_error_response(error, "question generation")
+    status_code = 504 if str(error) == "Timeout" else 502
+    return HTTPException(status_code=status_code, detail=response["message"])
+
+async def stream_question_records(
+    text: str,
+    question_types: dict[str, int],
+    difficulty: str
+) -> AsyncIterator[dict[str, any]]:
+    """Yield a record per question as it is parsed, then a summary"""
+    plan = await question_generation_service.plan_sections(text, question_types)
+    deduplicator = QuestionDeduplicator(settings.QUESTION_DEDUP_THRESHOLD)
+    index = 0
+    try:
+        async for question in question_generation_service.stream_sections(plan, difficulty, deduplicator):
+            yield {"type": "question", "index": index, "question": question}
+            index += 1
+    except GeminiError as e:
+        error = gemini_http_error(e)
+        yield {"type": "error", "status_code": error.status_code, "message": error.detail}
+    yield {
+        "type": "summary",
+        "total": index,
+        "requested": sum(question_types.values()),
+        "sections": {"used": len(plan), "duplicates_dropped": deduplicator.dropped}
+    }
+
+@router.post("/generate")
+async def generate_questions(
+    request: GenerateQuestionsRequest,
+    stream_format: str = Query("ndjson", alias="format", pattern=STREAM_FORMAT_PATTERN),
+    current_user: dict[str, any] = Depends(auth_required)
+):
+    """Generate questions of one or more types from text in a single upstream call"""
+    # Checked before charging, since an invalid type would otherwise only fail inside the streamed body
+    question_types = request.question_types
+    if question_types is None:
+        question_types = {request.question_type: request.count}
+    params = validate_question_params(request.difficulty, question_types=question_types)
+    question_types = params["question_types"]
+
+    validation = await text_extraction_service.validate_text_content(request.text)
+    if not validation["valid"]:
+        raise HTTPException(status_code=400, detail=validation["reason"])
+    await admission_controller.charge(current_user["user_id"], ["generation"])
+
+    # Long texts are split into sections instead of truncated, see app/services/chunking.py
+    if request.stream:
+        records = stream_question_records(request.text, question_types, params["difficulty"])
+        return format_stream(records, stream_format)
+
+    try:
+        result = await question_generation_service.generate_document_questions(
+            request.text, question_types, params["difficulty"]
+        )
+    except GeminiError as e:
+        raise gemini_http_error(e)
+
+    return create_success_response(result, message="Questions generated successfully")
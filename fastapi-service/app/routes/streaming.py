@@ -0,0 +1,34 @@
+import json
+from typing import AsyncIterator
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+
+# Query pattern for routes that accept a stream format
+STREAM_FORMAT_PATTERN = "^(ndjson|sse)$"
+
+def format_stream(
+    records: AsyncIterator[dict[str, any]],
+    stream_format: str,
+    background: BackgroundTask | None = None
+) -> StreamingResponse:
+    """Stream records as NDJSON lines or server-sent events"""
+    async def ndjson() -> AsyncIterator[str]:
+        async for record in records:
+            yield json.dumps(record) + "\n"
+
+    async def sse() -> AsyncIterator[str]:
+        async for record in records:
+            yield f"event: {record.get('type', 'message')}\ndata: {json.dumps(record)}\n\n"
+
+    if stream_format == "sse":
+        body, media_type = sse(), "text/event-stream"
+    else:
+        body, media_type = ndjson(), "application/x-ndjson"
+
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        # Disable proxy buffering so each record reaches the client immediately
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=background
+    )
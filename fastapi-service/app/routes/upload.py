@@ -0,0 +1,122 @@
+import logging
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from starlette.background import BackgroundTask
+from app.core.admission import admission_controller
+from app.core.auth import auth_required
+from app.core.config import settings
+from app.core.ingest import IngestedFile, ingest_upload
+from app.core.metrics import span
+from app.core.utils import create_success_response
+from app.routes.streaming import STREAM_FORMAT_PATTERN, format_stream
+from app.services.document_store import document_store
+from app.services.text_extraction import text_extraction_service
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+def upload_cost_classes(files: list[UploadFile]) -> list[str]:
+    """Cost classes of the supported files in an upload, for rate limiting"""
+    cost_classes = [text_extraction_service.cost_class(file.filename) for file in files]
+    return [cost_class for cost_class in cost_classes if cost_class is not None]
+
+async def store_upload(user_id: str, ingested: IngestedFile) -> None:
+    """Keep an upload in the document store; content already stored under its hash is not written again"""
+    if document_store is None:
+        return
+    with span("store", file_type=ingested.extension, size=ingested.size):
+        ingested.document = await document_store.add_document(user_id, ingested)
+
+@router.post("/file")
+async def upload_file(
+    file: UploadFile = File(...),
+    purpose: str = Query("extraction", pattern="^(extraction|generation)$"),
+    current_user: dict[str, any] = Depends(auth_required)
+):
+    """Upload a file and extract its text, keeping up to GENERATION_MAX_TEXT_LENGTH characters for question generation"""
+    await admission_controller.charge(current_user["user_id"], upload_cost_classes([file]))
+    max_chars = settings.GENERATION_MAX_TEXT_LENGTH if purpose == "generation" else None
+    with await ingest_upload(file) as ingested:
+        await store_upload(current_user["user_id"], ingested)
+        result = await text_extraction_service.extract_text(ingested, max_chars)
+        file_info = ingested.info()
+
+    return create_success_response({**result, "file": file_info}, message=result["message"])
+
+@router.post("/batch")
+async def upload_batch(
+    files: list[UploadFile] = File(...),
+    stream_format: str = Query("ndjson", alias="format", pattern=STREAM_FORMAT_PATTERN),
+    current_user: dict[str, any] = Depends(auth_required)
+):
+    """Upload many files and stream each extraction result as it finishes"""
+    if len(files) > settings.BATCH_MAX_FILES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many files. Maximum per batch: {settings.BATCH_MAX_FILES}"
+        )
+
+    await admission_controller.charge(current_user["user_id"], upload_cost_classes(files))
+
+    # Spool every upload before responding; the request body is gone once streaming starts
+    ingested: list[tuple[int, IngestedFile]] = []
+    rejected: list[dict[str, any]] = []
+
+    def release_spools() -> None:
+        # Covers clients that disconnect before the stream starts
+        for _, spooled in ingested:
+            spooled.close()
+
+    try:
+        for index, file in enumerate(files):
+            try:
+                spooled = await ingest_upload(file)
+            except HTTPException as e:
+                rejected.append({
+                    "index": index,
+                    "filename": file.filename,
+                    "success": False,
+                    "status_code": e.status_code,
+                    "message": e.detail
+                })
+                continue
+            ingested.append((index, spooled))
+            await store_upload(current_user["user_id"], spooled)
+    except BaseException:
+        release_spools()
+        raise
+
+    records = text_extraction_service.extract_batch(ingested, rejected)
+    return format_stream(records, stream_format, background=BackgroundTask(release_spools))
+
+@router.post("/stream")
+async def upload_stream(
+    file: UploadFile = File(...),
+    stream_format: str = Query("ndjson", alias="format", pattern=STREAM_FORMAT_PATTERN),
+    current_user: dict[str, any] = Depends(auth_required)
+):
+    """Upload a file and stream its text as it is extracted, page by page for PDFs"""
+    cost_classes = upload_cost_classes([file])
+    if not cost_classes:
+        raise HTTPException(status_code=400, detail=f"Unsupported file format: {file.filename}")
+    await admission_controller.charge(current_user["user_id"], cost_classes)
+
+    ingested = await ingest_upload(file)
+    try:
+        await store_upload(current_user["user_id"], ingested)
+    except BaseException:
+        ingested.close()
+        raise
+
+    records = text_extraction_service.extract_stream(ingested)
+    return format_stream(records, stream_format, background=BackgroundTask(ingested.close))
+
+@router.get("/supported-formats")
+async def get_supported_formats():
+    """Get supported file formats"""
+    return {
+        "formats": text_extraction_service.get_supported_formats(),
+        "extractors": [plugin.info() for plugin in text_extraction_service.registry.plugins()],
+        "max_file_size": settings.MAX_FILE_SIZE,
+        "max_batch_files": settings.BATCH_MAX_FILES
+    }
@@ -0,0 +1,68 @@
+"""Production server: the skillscore-api command.
+
+Runs SERVER_WORKERS uvicorn worker processes (one per core by default). With
+more than one worker, jobs, rate limits and the extraction cache move to
+SQLite files under UPLOAD_DIR so every worker sees the same state, and the
+cores are split between the workers' extraction pools. On SIGTERM each worker
+stops accepting connections, lets in-flight requests finish, then lets running
+background jobs finish, each for up to SERVER_DRAIN_TIMEOUT seconds.
+    skillscore-api
+    skillscore-api --workers 4 --port 8080
+"""
+import argparse
+import logging
+import os
+import uvicorn
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Settings that let every worker process on the host share state
+SHARED_STATE = {
+    "JOB_STORE": "sqlite",
+    "ADMISSION_BACKEND": "sqlite",
+    "EXTRACTION_CACHE_SHARED": "true",
+}
+
+def configure_workers(workers: int) -> dict[str, str]:
+    """Environment for the worker processes, which read it when they import the settings.
+
+    Settings given explicitly (environment or .env) always win.
+    """
+    environment = {}
+    if workers > 1 and settings.SERVER_SHARED_STATE:
+        environment.update(SHARED_STATE)
+
+    # Without this every worker would start a process pool as large as the host
+    per_worker = str(max(1, (os.cpu_count() or 1) // workers))
+    environment.update({"EXTRACTION_PROCESS_WORKERS": per_worker, "PDF_MAX_PARALLEL_BATCHES": per_worker})
+
+    environment = {name: value for name, value in environment.items() if name not in settings.model_fields_set}
+    os.environ.update(environment)
+    return environment
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=settings.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=settings.SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=settings.SERVER_WORKERS)
+    parser.add_argument("--reload", action="store_true", help="Single worker that restarts on code changes, for development")
+    args = parser.parse_args()
+    logging.basicConfig(level=getattr(logging, settings.LOG_LEVEL))
+
+    workers = 1 if args.reload else max(1, args.workers)
+    for name, value in configure_workers(workers).items():
+        logger.info(f"{name}={value}")
+
+    uvicorn.run(
+        "main:app",
+        host=args.host,
+        port=args.port,
+        workers=workers,
+        reload=args.reload,
+        timeout_graceful_shutdown=settings.SERVER_DRAIN_TIMEOUT,
+        log_level=settings.LOG_LEVEL.lower()
+    )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+import math
+import re
+from collections import Counter
+from app.core.config import settings
+
+# Rough token estimate for Gemini models, about four characters per token
+CHARS_PER_TOKEN = 4
+
+# Boundaries used to split text, from coarsest to finest
+_PARAGRAPH_SPLIT_RE = re.compile(r'\n\s*\n')
+_SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?])\s+')
+_TERM_RE = re.compile(r'[a-z][a-z0-9]{3,}')
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the token count of text without a tokenizer"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+def extract_terms(text: str) -> set[str]:
+    """Distinct lowercase terms of four or more characters"""
+    return set(_TERM_RE.findall(text.lower()))
+
+def _split_unit(text: str, max_chars: int) -> list[str]:
+    """Split an oversized paragraph at sentence, then word, boundaries"""
+    units = []
+    current = ''
+    for sentence in _SENTENCE_SPLIT_RE.split(text):
+        # Hard-wrap sentences that alone exceed the budget
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(' ', 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            if current:
+                units.append(current)
+                current = ''
+            units.append(sentence[:cut])
+            sentence = sentence[cut:].lstrip()
+
+        if current and len(current) + len(sentence) + 1 > max_chars:
+            units.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        units.append(current)
+    return units
+
+class DocumentChunker:
+    """Splits long text into token-budgeted sections and picks the ones that cover it best"""
+
+    def __init__(self, token_budget: int, overlap_tokens: int, max_sections: int):
+        self.token_budget = max(1, token_budget)
+        self.overlap_tokens = max(0, min(overlap_tokens, self.token_budget // 2))
+        self.max_sections = max(1, max_sections)
+
+    def needs_chunking(self, text: str) -> bool:
+        """Whether text is too long for a single upstream call"""
+        return estimate_tokens(text) > self.token_budget
+
+    def split(self, text: str) -> list[dict[str, any]]:
+        """Split text into sections along paragraph boundaries, repeating some context between them"""
+        max_chars = self.token_budget * CHARS_PER_TOKEN
+        overlap_chars = self.overlap_tokens * CHARS_PER_TOKEN
+
+        units = []
+        for paragraph in _PARAGRAPH_SPLIT_RE.split(text):
+            paragraph = paragraph.strip()
+            if not paragraph:
+                continue
+            units.extend(_split_unit(paragraph, max_chars) if len(paragraph) > max_chars else [paragraph])
+
+        sections = []
+        current: list[str] = []
+        length = 0
+        fresh = False  # Whether current holds anything beyond the carried overlap
+        for unit in units:
+            if current and fresh and length + len(unit) + 2 > max_chars:
+                sections.append(current)
+                # Carry trailing paragraphs into the next section as overlap
+                carried = []
+                carried_length = 0
+                for previous in reversed(current):
+                    if carried_length + len(previous) > overlap_chars:
+                        break
+                    carried.insert(0, previous)
+                    carried_length += len(previous) + 2
+                while carried and carried_length + len(unit) > max_chars:
+                    carried_length -= len(carried.pop(0)) + 2
+                current, length = carried, carried_length
+
+            current.append(unit)
+            length += len(unit) + 2
+            fresh = True
+        if fresh:
+            sections.append(current)
+
+        return [
+            {"index": index, "text": '\n\n'.join(parts), "tokens": estimate_tokens('\n\n'.join(parts))}
+            for index, parts in enumerate(sections)
+        ]
+
+    def rank(self, sections: list[dict[str, any]], limit: int) -> list[dict[str, any]]:
+        """Greedily pick the sections adding the most uncovered, distinctive terms, returned in document order"""
+        if len(sections) <= limit:
+            return list(sections)
+
+        terms = [extract_terms(section["text"]) for section in sections]
+        document_frequency = Counter(term for section_terms in terms for term in section_terms)
+        # Terms that appear everywhere say little about what a section covers
+        weights = {
+            term: math.log(len(sections) / frequency) + 0.1
+            for term, frequency in document_frequency.items()
+        }
+
+        # Gain of each section is the weight of its terms not yet covered, updated as sections are picked
+        gains = {i: sum(weights[term] for term in section_terms) for i, section_terms in enumerate(terms)}
+        selected = []
+        while gains and len(selected) < limit:
+            best = max(gains, key=lambda i: (gains[i], -i))
+            selected.append(best)
+            newly_covered = terms[best]
+            del gains[best]
+            for i in gains:
+                gains[i] -= sum(weights[term] for term in terms[i] & newly_covered)
+            for i, section_terms in enumerate(terms):
+                terms[i] = section_terms - newly_covered
+
+        return [sections[i] for i in sorted(selected)]
+
+    def plan(self, text: str, question_types: dict[str, int]) -> list[tuple[dict[str, any], dict[str, int]]]:
+        """Split and rank text, then spread the requested questions over the chosen sections"""
+        sections = self.split(text)
+        total = sum(question_types.values())
+        chosen = self.rank(sections, min(self.max_sections, total))
+
+        # Hand out questions one at a time to the section with the fewest so far
+        mixes: list[dict[str, int]] = [{} for _ in chosen]
+        assigned = [0] * len(chosen)
+        for question_type, count in question_types.items():
+            for _ in range(count):
+                target = min(range(len(chosen)), key=lambda i: (assigned[i], i))
+                mixes[target][question_type] = mixes[target].get(question_type, 0) + 1
+                assigned[target] += 1
+
+        return [(section, mix) for section, mix in zip(chosen, mixes) if mix]
+
+class QuestionDeduplicator:
+    """Drops questions whose wording overlaps too much with one already accepted"""
+
+    def __init__(self, threshold: float):
+        self.threshold = threshold
+        self._seen: list[set[str]] = []
+        self.dropped = 0
+
+    def add(self, question: dict[str, any]) -> bool:
+        """Accept question unless it duplicates an earlier one"""
+        words = set(re.findall(r'\w+', str(question.get("question", "")).lower()))
+        for seen in self._seen:
+            union = len(words | seen)
+            if union and len(words & seen) / union >= self.threshold:
+                self.dropped += 1
+                return False
+        self._seen.append(words)
+        return True
+
+# Create chunker instance
+document_chunker = DocumentChunker(
+    token_budget=settings.CHUNK_TOKEN_BUDGET,
+    overlap_tokens=settings.CHUNK_OVERLAP_TOKENS,
+    max_sections=settings.CHUNK_MAX_SECTIONS
+)
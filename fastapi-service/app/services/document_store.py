@@ -0,0 +1,318 @@
+import asyncio
+import logging
+import os
+import shutil
+import sqlite3
+import time
+import zlib
+from abc import ABC, abstractmethod
+from contextlib import closing
+from pathlib import Path
+from app.core.config import settings
+from app.core.ingest import IngestedFile
+from app.core.metrics import record_cache
+from app.core.utils import create_content_path, generate_file_id, sanitize_filename
+
+logger = logging.getLogger(__name__)
+
+def compress_text(text: str) -> bytes:
+    return zlib.compress(text.encode("utf-8"), settings.DOCUMENT_STORE_COMPRESSION_LEVEL)
+
+def decompress_text(data: bytes) -> str:
+    return zlib.decompress(data).decode("utf-8")
+
+class DocumentStore(ABC):
+    """Uploads stored once per content hash, with a lightweight reference per user upload"""
+
+    name = "base"
+
+    @abstractmethod
+    async def add_document(self, user_id: str, ingested: IngestedFile) -> dict[str, any]:
+        """Reference an upload for a user, storing its content only if the hash is new"""
+
+    @abstractmethod
+    async def get_document(self, document_id: str, user_id: str) -> dict[str, any] | None:
+        ...
+
+    @abstractmethod
+    async def list_documents(self, user_id: str, limit: int, offset: int) -> list[dict[str, any]]:
+        ...
+
+    @abstractmethod
+    async def delete_document(self, document_id: str, user_id: str) -> bool:
+        """Drop a user's reference, and the content once nobody references it"""
+
+    @abstractmethod
+    async def get_extraction(self, content_hash: str, extractor: str) -> dict[str, any] | None:
+        """Get the stored extraction of some content, if made by this extractor version"""
+
+    @abstractmethod
+    async def set_extraction(self, content_hash: str, extractor: str, result: dict[str, any]) -> None:
+        ...
+
+    def stats(self) -> dict[str, any]:
+        return {}
+
+class LocalDocumentStore(DocumentStore):
+    """Content blobs as files under a directory, indexed in a SQLite file next to them.
+
+    The index is shared by every process on the host. Extracted text is kept
+    zlib-compressed in the index; blobs are stored as uploaded, since PDF,
+    DOCX and image formats are compressed already.
+    """
+
+    name = "local"
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.path = self.directory / "documents.sqlite3"
+        self.deduplicated = 0
+        self.stored = 0
+        with closing(self._connect()) as connection:
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS contents (
+                    hash TEXT PRIMARY KEY,
+                    path TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    refs INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    extractor TEXT,
+                    file_type TEXT,
+                    word_count INTEGER,
+                    char_count INTEGER,
+                    text BLOB
+                )
+            """)
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS documents (
+                    id TEXT PRIMARY KEY,
+                    user_id TEXT NOT NULL,
+                    content_hash TEXT NOT NULL REFERENCES contents (hash),
+                    filename TEXT NOT NULL,
+                    content_type TEXT,
+                    created_at REAL NOT NULL
+                )
+            """)
+            connection.execute("CREATE INDEX IF NOT EXISTS documents_user ON documents (user_id, created_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit mode so BEGIN IMMEDIATE controls the write lock explicitly
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA journal_mode=WAL")
+        return connection
+
+    def _stage_blob(self, source: bytes | str, name: str) -> Path:
+        """Copy an upload into the store's directory under a temp name, ready to rename into place"""
+        tmp_path = self.directory / "contents" / f"{name}.tmp"
+        tmp_path.parent.mkdir(parents=True, exist_ok=True)
+        if isinstance(source, str):
+            shutil.copyfile(source, tmp_path)
+        else:
+            with open(tmp_path, "wb") as f:
+                f.write(source)
+        return tmp_path
+
+    @staticmethod
+    def _document(row: sqlite3.Row) -> dict[str, any]:
+        return {
+            "id": row["id"],
+            "filename": row["filename"],
+            "content_type": row["content_type"],
+            "content_hash": row["content_hash"],
+            "size": row["size"],
+            "created_at": row["created_at"]
+        }
+
+    def _add_document(self, user_id: str, ingested: IngestedFile) -> dict[str, any]:
+        now = time.time()
+        document_id = generate_file_id()
+        relative_path = create_content_path(ingested.hash, ingested.extension)
+        path = self.directory / relative_path
+        tmp_path = None
+        placed = False
+        connection = self._connect()
+        try:
+            # Copy new content before taking the write lock, so a large upload does not block other writers
+            if connection.execute("SELECT 1 FROM contents WHERE hash = ?", (ingested.hash,)).fetchone() is None:
+                tmp_path = self._stage_blob(ingested.source, document_id)
+
+            # Under the write lock, so a concurrent delete of the last reference cannot remove the blob
+            connection.execute("BEGIN IMMEDIATE")
+            exists = connection.execute("SELECT 1 FROM contents WHERE hash = ?", (ingested.hash,)).fetchone()
+            if exists:
+                connection.execute("UPDATE contents SET refs = refs + 1 WHERE hash = ?", (ingested.hash,))
+            else:
+                # The content was deleted since the check above
+                if tmp_path is None:
+                    tmp_path = self._stage_blob(ingested.source, document_id)
+                connection.execute(
+                    "INSERT INTO contents (hash, path, size, refs, created_at) VALUES (?, ?, ?, 1, ?)",
+                    (ingested.hash, relative_path, ingested.size, now)
+                )
+            connection.execute(
+                "INSERT INTO documents (id, user_id, content_hash, filename, content_type, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (document_id, user_id, ingested.hash, sanitize_filename(ingested.filename), ingested.content_type, now)
+            )
+            if not exists:
+                # Atomic, so readers never see a partial file
+                path.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(tmp_path, path)
+                placed = True
+            connection.execute("COMMIT")
+        except BaseException:
+            if connection.in_transaction:
+                # Still under the lock, so no other upload can have placed this content meanwhile
+                if placed:
+                    path.unlink(missing_ok=True)
+                connection.execute("ROLLBACK")
+            raise
+        finally:
+            connection.close()
+            if tmp_path is not None and not placed:
+                tmp_path.unlink(missing_ok=True)
+
+        if exists:
+            self.deduplicated += 1
+        else:
+            self.stored += 1
+        return {"id": document_id, "content_hash": ingested.hash, "deduplicated": bool(exists)}
+
+    def _get_document(self, document_id: str, user_id: str) -> dict[str, any] | None:
+        with closing(self._connect()) as connection:
+            row = connection.execute(
+                "SELECT d.*, c.size, c.file_type, c.word_count, c.char_count, c.text FROM documents d "
+                "JOIN contents c ON c.hash = d.content_hash WHERE d.id = ? AND d.user_id = ?",
+                (document_id, user_id)
+            ).fetchone()
+        if row is None:
+            return None
+        document = self._document(row)
+        if row["text"] is not None:
+            document.update({
+                "text": decompress_text(row["text"]),
+                "file_type": row["file_type"],
+                "word_count": row["word_count"],
+                "char_count": row["char_count"]
+            })
+        return document
+
+    def _list_documents(self, user_id: str, limit: int, offset: int) -> list[dict[str, any]]:
+        with closing(self._connect()) as connection:
+            rows = connection.execute(
+                "SELECT d.*, c.size FROM documents d JOIN contents c ON c.hash = d.content_hash "
+                "WHERE d.user_id = ? ORDER BY d.created_at DESC LIMIT ? OFFSET ?",
+                (user_id, limit, offset)
+            ).fetchall()
+        return [self._document(row) for row in rows]
+
+    def _delete_document(self, document_id: str, user_id: str) -> bool:
+        connection = self._connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute(
+                "SELECT content_hash FROM documents WHERE id = ? AND user_id = ?", (document_id, user_id)
+            ).fetchone()
+            if row is None:
+                connection.execute("ROLLBACK")
+                return False
+            content_hash = row["content_hash"]
+            connection.execute("DELETE FROM documents WHERE id = ?", (document_id,))
+            connection.execute("UPDATE contents SET refs = refs - 1 WHERE hash = ?", (content_hash,))
+            orphan = connection.execute(
+                "SELECT path FROM contents WHERE hash = ? AND refs <= 0", (content_hash,)
+            ).fetchone()
+            if orphan is not None:
+                connection.execute("DELETE FROM contents WHERE hash = ?", (content_hash,))
+            connection.execute("COMMIT")
+
+            # Only once the row is gone for good, and unless the same content was uploaded again since
+            if orphan is not None:
+                connection.execute("BEGIN IMMEDIATE")
+                if connection.execute("SELECT 1 FROM contents WHERE hash = ?", (content_hash,)).fetchone() is None:
+                    (self.directory / orphan["path"]).unlink(missing_ok=True)
+                connection.execute("COMMIT")
+            return True
+        except BaseException:
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            raise
+        finally:
+            connection.close()
+
+    def _get_extraction(self, content_hash: str, extractor: str) -> dict[str, any] | None:
+        with closing(self._connect()) as connection:
+            row = connection.execute(
+                "SELECT file_type, word_count, char_count, text FROM contents WHERE hash = ? AND extractor = ?",
+                (content_hash, extractor)
+            ).fetchone()
+        if row is None or row["text"] is None:
+            return None
+        return {
+            "text": decompress_text(row["text"]),
+            "word_count": row["word_count"],
+            "char_count": row["char_count"],
+            "file_type": row["file_type"]
+        }
+
+    def _set_extraction(self, content_hash: str, extractor: str, result: dict[str, any]) -> None:
+        text = compress_text(result["text"])
+        with closing(self._connect()) as connection:
+            connection.execute(
+                "UPDATE contents SET extractor = ?, file_type = ?, word_count = ?, char_count = ?, text = ? WHERE hash = ?",
+                (extractor, result["file_type"], result["word_count"], result["char_count"], text, content_hash)
+            )
+
+    def _stats(self) -> dict[str, any]:
+        with closing(self._connect()) as connection:
+            contents, stored_bytes, references, text_bytes = connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(refs), 0), COALESCE(SUM(LENGTH(text)), 0) FROM contents"
+            ).fetchone()
+        return {
+            "contents": contents,
+            "documents": references,
+            "stored_bytes": stored_bytes,
+            "compressed_text_bytes": text_bytes
+        }
+
+    async def add_document(self, user_id: str, ingested: IngestedFile) -> dict[str, any]:
+        document = await asyncio.to_thread(self._add_document, user_id, ingested)
+        record_cache("document_contents", document["deduplicated"])
+        return document
+
+    async def get_document(self, document_id: str, user_id: str) -> dict[str, any] | None:
+        return await asyncio.to_thread(self._get_document, document_id, user_id)
+
+    async def list_documents(self, user_id: str, limit: int, offset: int) -> list[dict[str, any]]:
+        return await asyncio.to_thread(self._list_documents, user_id, limit, offset)
+
+    async def delete_document(self, document_id: str, user_id: str) -> bool:
+        return await asyncio.to_thread(self._delete_document, document_id, user_id)
+
+    async def get_extraction(self, content_hash: str, extractor: str) -> dict[str, any] | None:
+        return await asyncio.to_thread(self._get_extraction, content_hash, extractor)
+
+    async def set_extraction(self, content_hash: str, extractor: str, result: dict[str, any]) -> None:
+        try:
+            await asyncio.to_thread(self._set_extraction, content_hash, extractor, result)
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to store extraction for content {content_hash}: {str(e)}")
+
+    def stats(self) -> dict[str, any]:
+        return {
+            "backend": self.name,
+            "directory": str(self.directory),
+            "stored": self.stored,
+            "deduplicated": self.deduplicated,
+            **self._stats()
+        }
+
+def create_document_store() -> DocumentStore | None:
+    """Build the document store from settings"""
+    if not settings.DOCUMENT_STORE_ENABLED:
+        return None
+    return LocalDocumentStore(settings.DOCUMENT_STORE_DIR or os.path.join(settings.UPLOAD_DIR, "documents"))
+
+# Create store instance
+document_store = create_document_store()
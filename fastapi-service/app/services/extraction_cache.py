@@ -0,0 +1,330 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import time
+import zlib
+from abc import ABC, abstractmethod
+from contextlib import closing
+from pathlib import Path
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Fields stored for a successful extraction
+CACHED_FIELDS = ("text", "word_count", "char_count", "file_type")
+
+# Share of the disk budget left filled after pruning an over-budget cache
+_DISK_PRUNE_TARGET = 0.9
+
+def make_cache_key(content_hash: str, file_type: str, extractor_version: str) -> str:
+    """Build the cache key for an extraction result"""
+    return f"{extractor_version}-{file_type}-{content_hash}"
+
+def _entry_size(value: dict[str, any]) -> int:
+    """Approximate memory footprint of a cached result"""
+    return len(value.get("text", "")) * 2 + 128
+
+class ExtractionCacheBackend(ABC):
+    """Base class for extraction cache tiers"""
+
+    name = "base"
+
+    @abstractmethod
+    async def get(self, key: str) -> dict[str, any] | None:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: dict[str, any]) -> None:
+        ...
+
+    def stats(self) -> dict[str, any]:
+        return {}
+
+class MemoryExtractionCache(ExtractionCacheBackend):
+    """LRU tier bounded by an approximate byte budget"""
+
+    name = "memory"
+
+    def __init__(self, max_bytes: int, ttl: float | None):
+        self._cache = TTLCache(max_bytes=max_bytes, ttl=ttl, sizeof=_entry_size)
+
+    async def get(self, key: str) -> dict[str, any] | None:
+        return self._cache.get(key)
+
+    async def set(self, key: str, value: dict[str, any]) -> None:
+        self._cache.set(key, value)
+
+    def stats(self) -> dict[str, any]:
+        return self._cache.stats()
+
+class DiskExtractionCache(ExtractionCacheBackend):
+    """JSON files under UPLOAD_DIR, evicted by age and total size"""
+
+    name = "disk"
+
+    def __init__(self, directory: str, max_bytes: int, ttl: float | None, prune_every: int = 100):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.prune_every = prune_every
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._writes = 0
+        # Size of the directory as of the last prune plus files written since, unknown until the first prune
+        self._bytes: int | None = None
+
+    def _path(self, key: str) -> Path:
+        # Shard by the tail of the content hash to keep directories small
+        return self.directory / key[-2:] / f"{key}.json"
+
+    def _read(self, key: str) -> dict[str, any] | None:
+        path = self._path(key)
+        try:
+            if self.ttl is not None and time.time() - path.stat().st_mtime > self.ttl:
+                path.unlink(missing_ok=True)
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Discarding unreadable extraction cache entry {key}: {str(e)}")
+            path.unlink(missing_ok=True)
+            return None
+
+    def _write(self, key: str, value: dict[str, any]) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Write atomically so concurrent readers never see partial files; the temp name is unique per writer
+        with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=path.parent, suffix=".tmp", delete=False) as f:
+            try:
+                json.dump(value, f)
+            except BaseException:
+                f.close()
+                os.unlink(f.name)
+                raise
+        size = os.path.getsize(f.name)
+        os.replace(f.name, path)
+
+        # Pruning scans the whole directory, so only do it when over budget or every prune_every writes for expiry
+        self._writes += 1
+        if self._bytes is not None:
+            self._bytes += size
+        if self._bytes is None or self._bytes > self.max_bytes or self._writes % self.prune_every == 0:
+            self._prune()
+
+    def _prune(self) -> None:
+        """Remove expired files, then the oldest ones until within budget"""
+        files = []
+        total = 0
+        now = time.time()
+        for path in self.directory.glob("*/*.json"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            if self.ttl is not None and now - stat.st_mtime > self.ttl:
+                path.unlink(missing_ok=True)
+                self.evictions += 1
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        if total > self.max_bytes:
+            # Leave headroom so a full cache is not scanned again on the next write
+            target = self.max_bytes * _DISK_PRUNE_TARGET
+            for _, size, path in sorted(files):
+                path.unlink(missing_ok=True)
+                self.evictions += 1
+                total -= size
+                if total <= target:
+                    break
+        self._bytes = total
+
+    async def get(self, key: str) -> dict[str, any] | None:
+        value = await asyncio.to_thread(self._read, key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: dict[str, any]) -> None:
+        try:
+            await asyncio.to_thread(self._write, key, value)
+        except OSError as e:
+            logger.warning(f"Failed to write extraction cache entry {key}: {str(e)}")
+
+    def stats(self) -> dict[str, any]:
+        return {
+            "directory": str(self.directory),
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
+
+class SqliteExtractionCache(ExtractionCacheBackend):
+    """Compressed results in a SQLite file shared by every worker process on the host"""
+
+    name = "sqlite"
+
+    def __init__(self, path: str, max_bytes: int, ttl: float | None, prune_every: int = 100):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.prune_every = prune_every
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._writes = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with closing(self._connect()) as connection, connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, stored_at REAL NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS entries_age ON entries (stored_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        # Callers close it; using the connection as a context manager only commits or rolls back
+        connection = sqlite3.connect(self.path, timeout=10)
+        connection.execute("PRAGMA journal_mode=WAL")
+        return connection
+
+    def _read(self, key: str) -> dict[str, any] | None:
+        oldest = time.time() - self.ttl if self.ttl is not None else 0
+        with closing(self._connect()) as connection, connection:
+            row = connection.execute(
+                "SELECT value FROM entries WHERE key = ? AND stored_at > ?", (key, oldest)
+            ).fetchone()
+        return json.loads(zlib.decompress(row[0])) if row else None
+
+    def _write(self, key: str, value: dict[str, any]) -> None:
+        data = zlib.compress(json.dumps(value).encode("utf-8"))
+        with closing(self._connect()) as connection, connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, stored_at) VALUES (?, ?, ?, ?)",
+                (key, data, len(data), time.time())
+            )
+        self._writes += 1
+        if self._writes % self.prune_every == 0:
+            self._prune()
+
+    def _prune(self) -> None:
+        """Remove expired entries, then the oldest ones until within budget"""
+        with closing(self._connect()) as connection, connection:
+            if self.ttl is not None:
+                self.evictions += connection.execute(
+                    "DELETE FROM entries WHERE stored_at <= ?", (time.time() - self.ttl,)
+                ).rowcount
+            total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            # Newest entries whose running total fits the budget are kept
+            self.evictions += connection.execute("""
+                DELETE FROM entries WHERE key IN (
+                    SELECT key FROM (
+                        SELECT key, SUM(size) OVER (ORDER BY stored_at DESC) AS kept FROM entries
+                    ) WHERE kept > ?
+                )
+            """, (self.max_bytes,)).rowcount
+
+    async def get(self, key: str) -> dict[str, any] | None:
+        try:
+            value = await asyncio.to_thread(self._read, key)
+        except (sqlite3.Error, ValueError, zlib.error) as e:
+            logger.warning(f"Failed to read extraction cache entry {key}: {str(e)}")
+            value = None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: dict[str, any]) -> None:
+        try:
+            await asyncio.to_thread(self._write, key, value)
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to write extraction cache entry {key}: {str(e)}")
+
+    def stats(self) -> dict[str, any]:
+        return {
+            "path": self.path,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
+
+class ExtractionCache:
+    """Tiered cache of extraction results keyed by content hash"""
+
+    def __init__(self, tiers: list[ExtractionCacheBackend]):
+        self.tiers = tiers
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, key: str) -> dict[str, any] | None:
+        """Look a result up tier by tier, promoting hits to faster tiers"""
+        for index, tier in enumerate(self.tiers):
+            value = await tier.get(key)
+            if value is not None:
+                for faster_tier in self.tiers[:index]:
+                    await faster_tier.set(key, value)
+                self.hits += 1
+                return value
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, result: dict[str, any]) -> None:
+        """Store the cacheable fields of a result in every tier"""
+        value = {field: result[field] for field in CACHED_FIELDS}
+        for tier in self.tiers:
+            await tier.set(key, value)
+
+    def stats(self) -> dict[str, any]:
+        """Get hit/miss counters for the cache and each tier"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "tiers": {tier.name: tier.stats() for tier in self.tiers}
+        }
+
+def create_extraction_cache() -> ExtractionCache | None:
+    """Build the extraction cache from settings"""
+    if not settings.EXTRACTION_CACHE_ENABLED:
+        return None
+
+    tiers: list[ExtractionCacheBackend] = [
+        MemoryExtractionCache(
+            max_bytes=settings.EXTRACTION_CACHE_MAX_BYTES,
+            ttl=settings.EXTRACTION_CACHE_TTL
+        )
+    ]
+    if settings.EXTRACTION_CACHE_SHARED:
+        tiers.append(
+            SqliteExtractionCache(
+                path=os.path.join(settings.UPLOAD_DIR, "extraction-cache.sqlite3"),
+                max_bytes=settings.EXTRACTION_CACHE_DISK_MAX_BYTES,
+                ttl=settings.EXTRACTION_CACHE_TTL
+            )
+        )
+    if settings.EXTRACTION_CACHE_DISK_ENABLED:
+        tiers.append(
+            DiskExtractionCache(
+                directory=os.path.join(settings.UPLOAD_DIR, "extraction-cache"),
+                max_bytes=settings.EXTRACTION_CACHE_DISK_MAX_BYTES,
+                ttl=settings.EXTRACTION_CACHE_TTL
+            )
+        )
+    return ExtractionCache(tiers)
+
+# Create cache instance
+extraction_cache = create_extraction_cache()
@@ -0,0 +1,557 @@
+import codecs
+import importlib
+import io
+import logging
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, BinaryIO, Iterator
+
+# Parsing libraries are imported on first use, so importing this module stays cheap
+if TYPE_CHECKING:
+    import zipfile
+    from PIL import Image
+    from PyPDF2 import PdfReader
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever extractor or cleaning output changes, so cached results are invalidated
+EXTRACTOR_VERSION = "5"
+
+# Returned instead of raising when OCR is unavailable or fails
+OCR_FAILED_TEXT = "[OCR extraction failed - please ensure Tesseract is installed and configured]"
+
+# Embedded images smaller than this (in pixels per side) are logos or bullets, not scans
+MIN_OCR_IMAGE_SIDE = 200
+
+# These functions are executed inside worker pools, so they must stay at
+# module level (picklable) and must not touch the event loop. Their input is
+# either the upload bytes or the path of the spooled upload on disk.
+
+# Libraries a pool worker imports when warmed up
+WORKER_LIBRARIES = ("PyPDF2", "PIL.Image", "PIL.ImageOps", "pytesseract", "chardet")
+
+def warm_worker() -> int:
+    """No-op job that makes a pool worker import the extractor libraries ahead of real work"""
+    for name in WORKER_LIBRARIES:
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            logger.warning(f"Extractor library {name} is not available: {str(e)}")
+    return os.getpid()
+
+def open_source(source: bytes | str) -> BinaryIO:
+    """Open extractor input as a seekable binary stream"""
+    if not isinstance(source, str):
+        return io.BytesIO(source)
+
+    # Spooled files are read on demand rather than loaded into memory
+    return open(source, "rb")
+
+def read_source(source: bytes | str) -> bytes:
+    """Get extractor input as bytes"""
+    if not isinstance(source, str):
+        return source
+    with open(source, "rb") as f:
+        return f.read()
+
+def get_pdf_page_count(source: bytes | str) -> int:
+    """Count the pages of a PDF file"""
+    from PyPDF2 import PdfReader
+    try:
+        with open_source(source) as stream:
+            return len(PdfReader(stream).pages)
+    except Exception as e:
+        logger.error(f"PDF extraction error: {str(e)}")
+        raise Exception(f"Failed to extract text from PDF: {str(e)}")
+
+def extract_pdf_pages(
+    source: bytes | str,
+    start: int,
+    stop: int,
+    ocr_min_chars: int | None = None
+) -> list[dict[str, any]]:
+    """Extract text from PDF pages [start, stop), timing each page.
+
+    Pages with fewer than ocr_min_chars characters of text also return their
+    embedded images under "images", for OCR. A spooled PDF stays open in the
+    worker, so later batches of the same document skip parsing it again.
+    """
+    if isinstance(source, str):
+        return _extract_pdf_pages(_open_pdf(source), start, stop, ocr_min_chars)
+    with open_source(source) as stream:
+        return _extract_pdf_pages(_read_pdf(stream), start, stop, ocr_min_chars)
+
+# The spooled PDF this worker (process or thread) has open, as (key, stream, reader)
+_open_pdfs = threading.local()
+
+def _open_pdf(path: str) -> "PdfReader":
+    """Get the parsed PDF at path, reusing the one this worker opened last"""
+    stat = os.stat(path)
+    # A new file at a reused temp path must not match the old document
+    key = (path, stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    cached = getattr(_open_pdfs, "document", None)
+    if cached is not None:
+        if cached[0] == key:
+            return cached[2]
+        # Only one document is kept open per worker
+        _open_pdfs.document = None
+        cached[1].close()
+
+    stream = open(path, "rb")
+    try:
+        reader = _read_pdf(stream)
+    except BaseException:
+        stream.close()
+        raise
+    _open_pdfs.document = (key, stream, reader)
+    return reader
+
+def _read_pdf(stream: BinaryIO) -> "PdfReader":
+    from PyPDF2 import PdfReader
+    try:
+        return PdfReader(stream)
+    except Exception as e:
+        logger.error(f"PDF extraction error: {str(e)}")
+        raise Exception(f"Failed to extract text from PDF: {str(e)}")
+
+def _extract_pdf_pages(
+    pdf_reader: "PdfReader",
+    start: int,
+    stop: int,
+    ocr_min_chars: int | None
+) -> list[dict[str, any]]:
+    results = []
+    for page_num in range(start, min(stop, len(pdf_reader.pages))):
+        started = time.perf_counter()
+        error = None
+        try:
+            page_text = pdf_reader.pages[page_num].extract_text() or ""
+        except Exception as e:
+            logger.warning(f"Failed to extract text from PDF page {page_num + 1}: {str(e)}")
+            page_text = ""
+            error = str(e)
+
+        page = {
+            "page": page_num + 1,
+            "text": page_text,
+            # Length after whitespace normalization, used for the character budget
+            "chars": len(' '.join(page_text.split())),
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+            "error": error
+        }
+        # Scanned pages have no text layer, only the page image
+        if ocr_min_chars is not None and page["chars"] < ocr_min_chars:
+            page["images"] = _extract_page_images(pdf_reader.pages[page_num], page_num)
+        results.append(page)
+
+    return results
+
+def _extract_page_images(page, page_num: int) -> list[bytes]:
+    """Get the encoded images of a PDF page that are large enough to hold text"""
+    from PIL import Image
+    try:
+        page_images = page.images
+    except Exception as e:
+        logger.warning(f"Failed to read images from PDF page {page_num + 1}: {str(e)}")
+        return []
+
+    images = []
+    for index in range(len(page_images)):
+        try:
+            data = page_images[index].data
+            # Only the header is read to get the size
+            with Image.open(io.BytesIO(data)) as header:
+                if min(header.size) >= MIN_OCR_IMAGE_SIDE:
+                    images.append(data)
+        except Exception as e:
+            logger.warning(f"Skipping unreadable image on PDF page {page_num + 1}: {str(e)}")
+    return images
+
+# WordprocessingML elements, in ElementTree's {namespace}name form
+_W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+_W_P, _W_TBL, _W_TR, _W_TC, _W_R = f'{_W}p', f'{_W}tbl', f'{_W}tr', f'{_W}tc', f'{_W}r'
+_W_BODY, _W_T, _W_VMERGE, _W_VAL = f'{_W}body', f'{_W}t', f'{_W}vMerge', f'{_W}val'
+# Run content that stands for a character (w:tab also defines tab stops outside runs)
+_W_RUN_CHARS = {f'{_W}tab': '\t', f'{_W}br': '\n', f'{_W}cr': '\n', f'{_W}noBreakHyphen': '-'}
+# Legacy copies of drawings and text boxes, duplicating the content of mc:Choice
+_MC_FALLBACK = '{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback'
+_OFFICE_DOCUMENT_REL = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument'
+_PACKAGE_RELS = '{http://schemas.openxmlformats.org/package/2006/relationships}Relationship'
+
+def _docx_main_part(archive: "zipfile.ZipFile") -> str:
+    """Find the main document part, which is word/document.xml unless the package says otherwise"""
+    import xml.etree.ElementTree as ET
+    try:
+        relationships = ET.fromstring(archive.read('_rels/.rels'))
+    except (KeyError, ET.ParseError):
+        return 'word/document.xml'
+    for relationship in relationships.iter(_PACKAGE_RELS):
+        if relationship.get('Type') == _OFFICE_DOCUMENT_REL:
+            return relationship.get('Target', '').lstrip('/')
+    return 'word/document.xml'
+
+def iter_docx_blocks(source: bytes | str, max_chars: int | None = None) -> Iterator[str]:
+    """Yield the text of each non-empty paragraph and table row, in document order.
+    
+    Streams the main document part out of the zip with an iterative XML parser
+    instead of building the python-docx object model. Merged cells are read
+    once: a horizontally merged cell is a single w:tc, and continuation cells
+    of a vertical merge are skipped. Cells that hold tables get their rows as
+    lines. Stops once about max_chars cleaned characters have been yielded.
+    """
+    import xml.etree.ElementTree as ET
+    import zipfile
+    from app.core.config import settings
+    max_chars = settings.MAX_TEXT_LENGTH if max_chars is None else max_chars
+    
+    with open_source(source) as docx_file, zipfile.ZipFile(docx_file) as archive:
+        with archive.open(_docx_main_part(archive)) as document:
+            paragraphs: list[list[str]] = []  # Text of open paragraphs (text boxes nest them)
+            tables: list[dict[str, any]] = []  # Open tables with their current row and cell
+            runs = 0
+            skipped = 0
+            body = None
+            total = 0
+            for event, element in ET.iterparse(document, events=("start", "end")):
+                tag = element.tag
+                if tag == _MC_FALLBACK:
+                    skipped += 1 if event == "start" else -1
+                    continue
+                if skipped:
+                    continue
+                
+                if event == "start":
+                    if tag == _W_P:
+                        paragraphs.append([])
+                    elif tag == _W_R:
+                        runs += 1
+                    elif tag == _W_TC and tables:
+                        tables[-1]["cell"] = []
+                        tables[-1]["merged"] = False
+                    elif tag == _W_TR and tables:
+                        tables[-1]["row"] = []
+                    elif tag == _W_TBL:
+                        tables.append({"row": None, "cell": None, "merged": False})
+                    elif body is None and tag == _W_BODY:
+                        body = element
+                    continue
+                
+                if tag == _W_T:
+                    if paragraphs and element.text:
+                        paragraphs[-1].append(element.text)
+                    continue
+                if tag == _W_R:
+                    runs -= 1
+                    continue
+                if tag in _W_RUN_CHARS:
+                    if runs and paragraphs:
+                        paragraphs[-1].append(_W_RUN_CHARS[tag])
+                    continue
+                if tag == _W_VMERGE:
+                    # Only the first cell of a vertical merge holds its text
+                    if tables and tables[-1]["cell"] is not None and element.get(_W_VAL) != 'restart':
+                        tables[-1]["merged"] = True
+                    continue
+                
+                if tag == _W_P:
+                    block = ''.join(paragraphs.pop())
+                elif tag == _W_TC and tables:
+                    table = tables[-1]
+                    text = '\n'.join(table["cell"]).strip()
+                    if text and not table["merged"]:
+                        table["row"].append(text)
+                    table["cell"] = None
+                    continue
+                elif tag == _W_TR and tables:
+                    block = ' | '.join(tables[-1]["row"])
+                    tables[-1]["row"] = None
+                elif tag == _W_TBL and tables:
+                    tables.pop()
+                    block = None
+                else:
+                    continue
+                
+                # Paragraphs, and rows of nested tables, belong to the innermost open cell
+                cell = next((table["cell"] for table in reversed(tables) if table["cell"] is not None), None)
+                if block and block.strip():
+                    if cell is not None:
+                        cell.append(block)
+                    else:
+                        # Text box paragraphs come out before the paragraph anchoring them
+                        yield block
+                        total += len(' '.join(block.split())) + 2
+                        if total > max_chars:
+                            return
+                
+                # Drop finished top-level blocks so memory stays flat on long documents
+                if body is not None and not paragraphs and not tables:
+                    body.clear()
+
+def extract_docx_text(source: bytes | str, max_chars: int | None = None) -> str:
+    """Extract text from DOCX file"""
+    try:
+        return '\n\n'.join(iter_docx_blocks(source, max_chars))
+    except Exception as e:
+        logger.error(f"DOCX extraction error: {str(e)}")
+        raise Exception(f"Failed to extract text from DOCX: {str(e)}")
+
+def stream_docx_text(source: bytes | str, chunk_chars: int | None = None) -> Iterator[dict[str, any]]:
+    """Yield DOCX text in chunks of whole paragraphs, at least chunk_chars long except the last"""
+    from app.core.config import settings
+    chunk_chars = chunk_chars or settings.EXTRACTION_STREAM_CHUNK_CHARS
+    blocks = []
+    size = 0
+    for block in iter_docx_blocks(source):
+        blocks.append(block)
+        size += len(block)
+        if size >= chunk_chars:
+            yield {"text": '\n\n'.join(blocks)}
+            blocks, size = [], 0
+    if blocks:
+        yield {"text": '\n\n'.join(blocks)}
+
+# Byte order marks, longest first since the UTF-32 LE mark starts with the UTF-16 LE one
+_BOMS = (
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+
+# Legacy single-byte encodings to try after the detected one; latin-1 never fails
+_FALLBACK_ENCODINGS = ('cp1252', 'latin-1')
+
+# Detections below this confidence are mostly guesses on short Western European text
+_MIN_DETECTION_CONFIDENCE = 0.2
+
+class _DecodeError(Exception):
+    """Decoding failed at an absolute byte offset of the stream"""
+
+    def __init__(self, encoding: str, offset: int):
+        super().__init__(f"Invalid {encoding} at byte {offset}")
+        self.offset = offset
+
+def extract_txt_text(
+    source: bytes | str,
+    max_chars: int | None = None,
+    chunk_size: int | None = None,
+    sample_size: int | None = None
+) -> dict[str, any]:
+    """Extract text from TXT file, decoding only as much as the character budget needs"""
+    from app.core.config import settings
+    try:
+        with open_source(source) as stream:
+            return decode_text_stream(
+                stream,
+                settings.MAX_TEXT_LENGTH if max_chars is None else max_chars,
+                chunk_size or settings.TXT_DECODE_CHUNK_SIZE,
+                sample_size or settings.TXT_DETECTION_SAMPLE_SIZE
+            )
+    except Exception as e:
+        logger.error(f"TXT extraction error: {str(e)}")
+        raise Exception(f"Failed to extract text from TXT: {str(e)}")
+
+def decode_text_stream(stream: BinaryIO, max_chars: int, chunk_size: int, sample_size: int) -> dict[str, any]:
+    """Decode a text stream: BOM, then strict UTF-8, then detection on a bounded sample"""
+    head = stream.read(sample_size)
+    encoding, start = None, 0
+    for bom, bom_encoding in _BOMS:
+        if head.startswith(bom):
+            encoding = bom_encoding
+            # utf-8-sig skips its own mark; the UTF-16/32 codecs need it to pick the byte order
+            start = len(bom) if bom_encoding == 'utf-8-sig' else 0
+            break
+
+    if encoding is not None:
+        candidates = [encoding]
+    elif _is_utf8_prefix(head):
+        candidates = ['utf-8']
+    else:
+        candidates = _detect_encodings(head)
+
+    while True:
+        encoding = candidates.pop(0)
+        stream.seek(start)
+        try:
+            # The last resort decodes with replacement characters instead of failing
+            strict = bool(candidates) or encoding == 'utf-8'
+            text, truncated = _decode_chunks(stream, encoding, max_chars, chunk_size, strict)
+            return {"text": text, "encoding": encoding, "truncated": truncated}
+        except _DecodeError as e:
+            if encoding == 'utf-8':
+                # Valid UTF-8 up to here; detect from the bytes around the first invalid one
+                stream.seek(max(0, e.offset - sample_size // 2))
+                candidates = _detect_encodings(stream.read(sample_size))
+            logger.info(f"TXT decode fell back from {encoding}: {str(e)}")
+
+def _is_utf8_prefix(data: bytes) -> bool:
+    """Whether data is valid UTF-8, allowing a character cut off at the end"""
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(data, final=False)
+        return True
+    except UnicodeDecodeError:
+        return False
+
+def _detect_encodings(sample: bytes) -> list[str]:
+    """Candidate encodings for a sample, most likely first"""
+    import chardet
+    result = chardet.detect(sample)
+    detected = (result.get('encoding') or '').lower()
+    # Browsers read latin-1 and ascii labels as windows-1252, which is a superset for text
+    if (
+        detected in ('ascii', 'iso-8859-1', 'latin-1', 'windows-1252', 'utf-8', '')
+        or (result.get('confidence') or 0) < _MIN_DETECTION_CONFIDENCE
+    ):
+        detected = 'cp1252'
+    try:
+        codecs.lookup(detected)
+    except LookupError:
+        detected = 'cp1252'
+    return list(dict.fromkeys([detected, *_FALLBACK_ENCODINGS]))
+
+def _decode_chunks(
+    stream: BinaryIO,
+    encoding: str,
+    max_chars: int,
+    chunk_size: int,
+    strict: bool
+) -> tuple[str, bool]:
+    """Decode chunk by chunk until the stream ends or the cleaned text fills max_chars"""
+    from app.core.utils import TextCleaner
+    decoder = codecs.getincrementaldecoder(encoding)('strict' if strict else 'replace')
+    cleaner = TextCleaner(max_chars)
+    parts = []
+    offset = stream.tell()
+    while True:
+        chunk = stream.read(chunk_size)
+        try:
+            text = decoder.decode(chunk, final=not chunk)
+        except UnicodeDecodeError as e:
+            raise _DecodeError(encoding, offset + e.start)
+        offset += len(chunk)
+        parts.append(text)
+        cleaner.feed(text)
+        if not chunk:
+            return ''.join(parts), False
+        if cleaner.full:
+            return ''.join(parts), True
+
+def prepare_ocr_tiles(
+    source: bytes | str,
+    target_dpi: int,
+    max_dimension: int,
+    binarize: bool,
+    tile_height: int,
+    max_tiles: int
+) -> dict[str, any]:
+    """Downscale, grayscale and optionally binarize an image, then cut it into horizontal bands for OCR"""
+    from PIL import Image, ImageOps
+    try:
+        with open_source(source) as stream:
+            image = Image.open(stream)
+            image.load()
+    except Exception as e:
+        raise Exception(f"Failed to open image: {str(e)}")
+    original_size = image.size
+
+    # Phone photos carry their orientation in EXIF rather than in the pixels
+    image = ImageOps.exif_transpose(image).convert('L')
+
+    # Scale down to the target DPI when the image declares a higher one, and cap the longest side
+    scale = 1.0
+    dpi = image.info.get('dpi', (0, 0))[0] or 0
+    if dpi > target_dpi:
+        scale = target_dpi / dpi
+    scale = min(scale, max_dimension / max(image.size))
+    if scale < 1.0:
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        image = image.reduce(2) if scale <= 0.5 and image.width >= 4 and image.height >= 4 else image
+        image = image.resize(size, Image.LANCZOS)
+
+    image = ImageOps.autocontrast(image, cutoff=1)
+    if binarize:
+        threshold = _otsu_threshold(image.histogram())
+        image = image.point(lambda value: 255 if value > threshold else 0)
+
+    tiles = []
+    for top, bottom in _band_bounds(image, tile_height, max_tiles):
+        buffer = io.BytesIO()
+        image.crop((0, top, image.width, bottom)).save(buffer, format='PNG')
+        tiles.append(buffer.getvalue())
+
+    return {
+        "tiles": tiles,
+        "original_size": original_size,
+        "size": image.size
+    }
+
+def _otsu_threshold(histogram: list[int]) -> int:
+    """Gray level that best separates ink from background"""
+    total = sum(histogram)
+    weighted_total = sum(level * count for level, count in enumerate(histogram))
+    background = weighted_background = 0
+    best_level, best_variance = 127, -1.0
+    for level, count in enumerate(histogram):
+        background += count
+        if background == 0:
+            continue
+        foreground = total - background
+        if foreground == 0:
+            break
+        weighted_background += level * count
+        mean_background = weighted_background / background
+        mean_foreground = (weighted_total - weighted_background) / foreground
+        variance = background * foreground * (mean_background - mean_foreground) ** 2
+        if variance > best_variance:
+            best_level, best_variance = level, variance
+    return best_level
+
+def _band_bounds(image: "Image.Image", tile_height: int, max_tiles: int) -> list[tuple[int, int]]:
+    """Split rows into bands, cutting at the lightest row near each boundary so text lines stay whole"""
+    from PIL import Image, ImageOps
+    height = image.height
+    count = min(max_tiles, max(1, round(height / tile_height)))
+    if count == 1:
+        return [(0, height)]
+
+    # Mean darkness of each row, computed by squashing the image to one column
+    ink = list(ImageOps.invert(image).resize((1, height), Image.BOX).getdata())
+    band = height / count
+    window = max(1, int(band / 4))
+
+    cuts = [0]
+    for i in range(1, count):
+        target = int(band * i)
+        low, high = max(cuts[-1] + 1, target - window), min(height - 1, target + window)
+        cuts.append(min(range(low, high + 1), key=lambda row: (ink[row], abs(row - target))))
+    cuts.append(height)
+    return list(zip(cuts, cuts[1:]))
+
+# Tesseract handles kept warm per worker process when tesserocr is installed
+_tesseract_apis: dict[tuple[str, int], any] = {}
+
+def ocr_tile(tile: bytes, lang: str, psm: int) -> str:
+    """OCR one prepared tile, reusing a loaded Tesseract engine when tesserocr is available"""
+    from PIL import Image
+    try:
+        return _ocr_tile(Image.open(io.BytesIO(tile)), lang, psm)
+    except Exception as e:
+        # Some OCR exceptions cannot be pickled back to the parent process
+        raise Exception(f"Failed to OCR image: {str(e) or type(e).__name__}")
+
+def _ocr_tile(image: "Image.Image", lang: str, psm: int) -> str:
+    try:
+        import tesserocr
+    except ImportError:
+        # pytesseract runs the tesseract binary once per call
+        import pytesseract
+        return pytesseract.image_to_string(image, lang=lang, config=f"--psm {psm}")
+
+    api = _tesseract_apis.get((lang, psm))
+    if api is None:
+        api = tesserocr.PyTessBaseAPI(lang=lang, psm=psm)
+        _tesseract_apis[(lang, psm)] = api
+    api.SetImage(image)
+    return api.GetUTF8Text()
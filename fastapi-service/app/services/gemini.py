@@ -0,0 +1,525 @@
+import asyncio
+import json
+import logging
+from typing import AsyncIterator
+import httpx
+from fastapi import HTTPException
+from app.core.cache import TTLCache
+from app.core.clients import get_http_client
+from app.core.config import settings
+from app.core.metrics import QUESTION_GENERATIONS_IN_FLIGHT, record_cache, span
+from app.core.utils import generate_file_hash
+from app.services.chunking import DocumentChunker, QuestionDeduplicator, document_chunker
+from app.services.json_stream import JsonArrayStreamParser
+from app.services.similarity import similarity_index
+
+logger = logging.getLogger(__name__)
+
+# Output format and rules for each question type, mirroring the mobile client prompts
+QUESTION_FORMATS = {
+    "mcq": {
+        "label": "multiple choice",
+        "example": {
+            "question": "Question text here?",
+            "options": ["Option A", "Option B", "Option C", "Option D"],
+            "correctAnswer": 0,
+            "explanation": "Explanation of why this is the correct answer",
+            "topic": "Main topic this question covers",
+            "difficulty": "easy|medium|hard"
+        },
+        "rules": [
+            "Ensure only one option is clearly correct",
+            "Include plausible distractors",
+            "Vary question types (factual, conceptual, application)"
+        ]
+    },
+    "short_answer": {
+        "label": "short answer",
+        "example": {
+            "question": "Question text here?",
+            "answer": "Model answer in one to three sentences",
+            "keyPoints": ["Key point a correct answer must mention"],
+            "explanation": "Explanation of the answer",
+            "topic": "Main topic",
+            "difficulty": "easy|medium|hard"
+        },
+        "rules": [
+            "Questions must be answerable in one to three sentences",
+            "List the key points a grader should look for"
+        ]
+    },
+    "true_false": {
+        "label": "true/false",
+        "example": {
+            "question": "Statement to evaluate",
+            "answer": True,
+            "explanation": "Explanation of why this is true/false",
+            "topic": "Main topic",
+            "difficulty": "easy|medium|hard"
+        },
+        "rules": [
+            "Create clear, unambiguous statements",
+            "Mix true and false answers",
+            "Avoid trick questions"
+        ]
+    },
+    "fill_blank": {
+        "label": "fill-in-the-blank",
+        "example": {
+            "question": "The _____ is responsible for cellular respiration.",
+            "answer": "mitochondria",
+            "alternatives": ["mitochondrion", "mitochondria"],
+            "explanation": "Explanation of the answer",
+            "topic": "Main topic",
+            "difficulty": "easy|medium|hard"
+        },
+        "rules": [
+            "Use _____ to indicate blanks",
+            "Include alternative acceptable answers",
+            "Focus on key terms and concepts"
+        ]
+    }
+}
+
+class GeminiError(Exception):
+    """Gemini request or response error"""
+    pass
+
+def is_valid_question(question_type: str, question: any) -> bool:
+    """Check a generated question has the fields its type requires"""
+    if not isinstance(question, dict) or not question.get("question"):
+        return False
+
+    if question_type == "mcq":
+        options = question.get("options")
+        answer = question.get("correctAnswer")
+        return (
+            isinstance(options, list) and len(options) == 4
+            and isinstance(answer, int) and 0 <= answer <= 3
+        )
+    if question_type == "true_false":
+        return isinstance(question.get("answer"), bool)
+    return bool(question.get("answer"))
+
+class GeminiClient:
+    """Async Gemini REST client on the shared connection pool"""
+
+    def __init__(self, api_key: str, model: str, base_url: str, timeout: float):
+        self.api_key = api_key
+        self.model = model
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def _request_body(self, prompt: str) -> dict[str, any]:
+        return {
+            "contents": [{"parts": [{"text": prompt}]}],
+            "generationConfig": {"responseMimeType": "application/json"}
+        }
+
+    async def generate(self, prompt: str) -> str:
+        """Send a prompt and return the response text"""
+        url = f"{self.base_url}/v1beta/models/{self.model}:generateContent"
+        try:
+            with span("gemini", operation="generate"):
+                response = await get_http_client().post(
+                    url,
+                    json=self._request_body(prompt),
+                    headers={"x-goog-api-key": self.api_key},
+                    timeout=self.timeout
+                )
+                if response.status_code != 200:
+                    raise GeminiError(f"Gemini API error: {response.status_code}")
+        except httpx.TimeoutException:
+            raise GeminiError("Timeout")
+        except httpx.HTTPError as e:
+            raise GeminiError(f"Network request failed: {str(e)}")
+
+        data = response.json()
+        try:
+            parts = data["candidates"][0]["content"]["parts"]
+        except (KeyError, IndexError, TypeError):
+            raise GeminiError("Invalid response format from Gemini API")
+        return ''.join(part.get("text", "") for part in parts)
+
+    async def stream_generate(self, prompt: str) -> AsyncIterator[str]:
+        """Send a prompt and yield response text as it is generated"""
+        url = f"{self.base_url}/v1beta/models/{self.model}:streamGenerateContent"
+        try:
+            # Covers the whole stream, up to the last chunk
+            with span("gemini", operation="stream"):
+                async with get_http_client().stream(
+                    "POST",
+                    url,
+                    params={"alt": "sse"},
+                    json=self._request_body(prompt),
+                    headers={"x-goog-api-key": self.api_key},
+                    timeout=self.timeout
+                ) as response:
+                    if response.status_code != 200:
+                        raise GeminiError(f"Gemini API error: {response.status_code}")
+
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        try:
+                            parts = json.loads(line[5:])["candidates"][0]["content"]["parts"]
+                        except (ValueError, KeyError, IndexError, TypeError):
+                            raise GeminiError("Invalid response format from Gemini API")
+                        text = ''.join(part.get("text", "") for part in parts)
+                        if text:
+                            yield text
+        except httpx.TimeoutException:
+            raise GeminiError("Timeout")
+        except httpx.HTTPError as e:
+            raise GeminiError(f"Network request failed: {str(e)}")
+
+class QuestionBroadcast:
+    """Questions from one upstream call, replayed to every coalesced subscriber"""
+
+    def __init__(self):
+        self.questions: list[dict[str, any]] = []
+        self.done = False
+        self.error: Exception | None = None
+        self._changed = asyncio.Condition()
+
+    async def publish(self, question: dict[str, any]) -> None:
+        async with self._changed:
+            self.questions.append(question)
+            self._changed.notify_all()
+
+    async def finish(self, error: Exception | None = None) -> None:
+        async with self._changed:
+            self.done = True
+            self.error = error
+            self._changed.notify_all()
+
+    async def subscribe(self) -> AsyncIterator[dict[str, any]]:
+        """Yield every question from the start, then new ones as they arrive"""
+        index = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: index < len(self.questions) or self.done)
+                available = self.questions[index:]
+                finished, error = self.done, self.error
+            for question in available:
+                yield question
+            index += len(available)
+            if finished and index >= len(self.questions):
+                if error is not None:
+                    raise error
+                return
+
+class QuestionGenerationService:
+    """Generates questions through Gemini with request coalescing and a response cache"""
+
+    def __init__(self, client: GeminiClient, cache: TTLCache, chunker: DocumentChunker, section_concurrency: int):
+        self.client = client
+        self.cache = cache
+        self.chunker = chunker
+        self.section_concurrency = max(1, section_concurrency)
+        self._in_flight: dict[str, QuestionBroadcast] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self.upstream_calls = 0
+        self.coalesced = 0
+        self.near_duplicate_reuses = 0
+
+    def build_prompt(self, text: str, question_types: dict[str, int], difficulty: str) -> str:
+        """Build one prompt asking for every requested question type"""
+        if len(question_types) == 1:
+            (question_type, count), = question_types.items()
+            request = f"Generate {count} {QUESTION_FORMATS[question_type]['label']} questions based on the following text content."
+        else:
+            request = "Generate the following questions based on the following text content:\n" + '\n'.join(
+                f"- {count} {QUESTION_FORMATS[question_type]['label']} questions (type \"{question_type}\")"
+                for question_type, count in question_types.items()
+            )
+
+        structures = '\n'.join(
+            f"{question_type}: {json.dumps({'type': question_type, **QUESTION_FORMATS[question_type]['example']})}"
+            for question_type in question_types
+        )
+        rules = ["Make questions clear and unambiguous"]
+        for question_type in question_types:
+            rules.extend(QUESTION_FORMATS[question_type]["rules"])
+        rules.extend([
+            "Provide detailed explanations",
+            "Cover different aspects of the content",
+            "Return only valid JSON, no additional text"
+        ])
+
+        return (
+            f"{request}\n\n"
+            f"Difficulty level: {difficulty}\n\n"
+            f"Text content:\n{text}\n\n"
+            "Please format the response as a single JSON array. Every item must include its "
+            "\"type\" and follow the structure for that type:\n"
+            f"{structures}\n\n"
+            "Rules:\n" + '\n'.join(f"- {rule}" for rule in rules)
+        )
+
+    def cache_key(self, content_hash: str, question_types: dict[str, int], difficulty: str) -> str:
+        mix = ','.join(f"{question_type}={count}" for question_type, count in sorted(question_types.items()))
+        return f"{self.client.model}:{content_hash}:{mix}:{difficulty}"
+
+    def _request_key(self, text: str, question_types: dict[str, int], difficulty: str) -> str:
+        """Validate the requested types and build the cache/coalescing key"""
+        unknown = [question_type for question_type in question_types if question_type not in QUESTION_FORMATS]
+        if unknown or not question_types:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid question type. Must be one of: {', '.join(QUESTION_FORMATS)}"
+            )
+        return self.cache_key(generate_file_hash(text.encode()), question_types, difficulty)
+
+    async def stream_questions(
+        self,
+        text: str,
+        question_types: dict[str, int],
+        difficulty: str = "medium"
+    ) -> AsyncIterator[dict[str, any]]:
+        """Yield questions as soon as each one is complete"""
+        key = self._request_key(text, question_types, difficulty)
+
+        cached = self.cache.get(key)
+        record_cache("questions", cached is not None)
+        if cached is None:
+            reused = await self._near_duplicate_questions(key, text, question_types, difficulty)
+            cached = reused["questions"] if reused is not None else None
+        if cached is not None:
+            for question in cached:
+                yield question
+            return
+
+        async for question in self._subscribe(key, text, question_types, difficulty):
+            yield question
+
+    async def generate_question_set(
+        self,
+        text: str,
+        question_types: dict[str, int],
+        difficulty: str = "medium"
+    ) -> dict[str, any]:
+        """Generate a mix of question types in one upstream call"""
+        key = self._request_key(text, question_types, difficulty)
+
+        cached = self.cache.get(key)
+        record_cache("questions", cached is not None)
+        if cached is not None:
+            return {"questions": cached, "cached": True}
+        reused = await self._near_duplicate_questions(key, text, question_types, difficulty)
+        if reused is not None:
+            return {**reused, "cached": True}
+
+        questions = [question async for question in self._subscribe(key, text, question_types, difficulty)]
+        return {"questions": questions, "cached": False}
+
+    async def _near_duplicate_questions(
+        self,
+        key: str,
+        text: str,
+        question_types: dict[str, int],
+        difficulty: str
+    ) -> dict[str, any] | None:
+        """Questions already generated from near-identical text, e.g. the OCR of a photo of the same notes"""
+        if similarity_index is None:
+            return None
+        _, matches = await similarity_index.find(text, exclude=generate_file_hash(text.encode()))
+        for match in matches:
+            questions = self.cache.get(self.cache_key(match["key"], question_types, difficulty))
+            if questions is not None:
+                record_cache("questions_near_duplicate", True)
+                # Later requests for this exact text hit the cache directly
+                self.cache.set(key, questions)
+                self.near_duplicate_reuses += 1
+                return {
+                    "questions": questions,
+                    "near_duplicate": {"text_hash": match["key"], "similarity": match["similarity"]}
+                }
+        record_cache("questions_near_duplicate", False)
+        return None
+    
+    async def generate_questions(
+        self,
+        text: str,
+        question_type: str = "mcq",
+        difficulty: str = "medium",
+        count: int | None = None
+    ) -> dict[str, any]:
+        """Generate questions of a single type"""
+        return await self.generate_document_questions(
+            text, {question_type: count or settings.DEFAULT_MCQ_COUNT}, difficulty
+        )
+
+    async def plan_sections(
+        self,
+        text: str,
+        question_types: dict[str, int]
+    ) -> list[tuple[dict[str, any], dict[str, int]]]:
+        """Pick the sections of text to generate from and the question mix for each"""
+        if not self.chunker.needs_chunking(text):
+            return [({"index": 0, "text": text}, question_types)]
+        # Splitting and ranking a long text takes tens of milliseconds, keep it off the event loop
+        return await asyncio.to_thread(self.chunker.plan, text, question_types)
+
+    async def stream_sections(
+        self,
+        plan: list[tuple[dict[str, any], dict[str, int]]],
+        difficulty: str = "medium",
+        deduplicator: QuestionDeduplicator | None = None
+    ) -> AsyncIterator[dict[str, any]]:
+        """Generate every planned section concurrently, yielding deduplicated questions as they arrive"""
+        if len(plan) == 1:
+            (section, question_types), = plan
+            async for question in self.stream_questions(section["text"], question_types, difficulty):
+                yield question
+            return
+
+        deduplicator = deduplicator or QuestionDeduplicator(settings.QUESTION_DEDUP_THRESHOLD)
+        queue: asyncio.Queue = asyncio.Queue()
+        semaphore = asyncio.Semaphore(self.section_concurrency)
+        errors: list[GeminiError] = []
+
+        async def run_section(section: dict[str, any], question_types: dict[str, int]) -> None:
+            try:
+                async with semaphore:
+                    async for question in self.stream_questions(section["text"], question_types, difficulty):
+                        await queue.put({**question, "section": section["index"]})
+            except GeminiError as e:
+                logger.warning(f"Question generation failed for section {section['index']}: {str(e)}")
+                errors.append(e)
+            finally:
+                await queue.put(None)
+
+        tasks = [asyncio.create_task(run_section(section, question_types)) for section, question_types in plan]
+        yielded = 0
+        try:
+            pending = len(tasks)
+            while pending:
+                question = await queue.get()
+                if question is None:
+                    pending -= 1
+                elif deduplicator.add(question):
+                    yielded += 1
+                    yield question
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        # Partial results are still useful; only fail when every section did
+        if not yielded and errors:
+            raise errors[0]
+
+    async def generate_document_questions(
+        self,
+        text: str,
+        question_types: dict[str, int],
+        difficulty: str = "medium"
+    ) -> dict[str, any]:
+        """Generate questions from text of any length, one upstream call per chosen section"""
+        plan = await self.plan_sections(text, question_types)
+        if len(plan) == 1:
+            result = await self.generate_question_set(text, question_types, difficulty)
+            return {**result, "sections": {"used": 1, "duplicates_dropped": 0}}
+
+        deduplicator = QuestionDeduplicator(settings.QUESTION_DEDUP_THRESHOLD)
+        questions = [question async for question in self.stream_sections(plan, difficulty, deduplicator)]
+        return {
+            "questions": questions,
+            "cached": False,
+            "sections": {"used": len(plan), "duplicates_dropped": deduplicator.dropped}
+        }
+
+    async def _subscribe(
+        self,
+        key: str,
+        text: str,
+        question_types: dict[str, int],
+        difficulty: str
+    ) -> AsyncIterator[dict[str, any]]:
+        """Follow the upstream call for key, starting one if none is in flight"""
+        broadcast = self._in_flight.get(key)
+        if broadcast is None:
+            broadcast = QuestionBroadcast()
+            self._in_flight[key] = broadcast
+            # The upstream call runs as its own task so a disconnecting caller cannot cancel it for the others
+            task = asyncio.create_task(self._generate(key, broadcast, text, question_types, difficulty))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        else:
+            self.coalesced += 1
+
+        async for question in broadcast.subscribe():
+            yield question
+
+    async def _generate(
+        self,
+        key: str,
+        broadcast: QuestionBroadcast,
+        text: str,
+        question_types: dict[str, int],
+        difficulty: str
+    ) -> None:
+        """Stream one upstream response into the broadcast, validating each question"""
+        self.upstream_calls += 1
+        remaining = dict(question_types)
+        parser = JsonArrayStreamParser()
+        try:
+            prompt = self.build_prompt(text, question_types, difficulty)
+            async for chunk in self.client.stream_generate(prompt):
+                for question in parser.feed(chunk):
+                    # Single-type prompts do not ask the model for a type field
+                    if len(question_types) == 1 and isinstance(question, dict):
+                        question.setdefault("type", next(iter(question_types)))
+                    question_type = question.get("type") if isinstance(question, dict) else None
+                    if remaining.get(question_type, 0) <= 0 or not is_valid_question(question_type, question):
+                        logger.warning(f"Dropping malformed or unrequested {question_type} question from Gemini response")
+                        continue
+                    remaining[question_type] -= 1
+                    await broadcast.publish({"type": question_type, **question})
+
+            if not broadcast.questions:
+                raise GeminiError("No valid questions in response")
+
+            self.cache.set(key, list(broadcast.questions))
+            await broadcast.finish()
+        except asyncio.CancelledError:
+            await broadcast.finish(GeminiError("Question generation was cancelled"))
+            raise
+        except Exception as e:
+            await broadcast.finish(e if isinstance(e, GeminiError) else GeminiError(str(e)))
+            return
+        finally:
+            self._in_flight.pop(key, None)
+
+        # Lets requests for near-identical text reuse these questions
+        if similarity_index is not None:
+            try:
+                await similarity_index.add_text(generate_file_hash(text.encode()), text)
+            except Exception as e:
+                logger.warning(f"Failed to index text for question reuse: {str(e)}")
+
+    def stats(self) -> dict[str, any]:
+        """Get upstream call, coalescing and cache statistics"""
+        return {
+            "upstream_calls": self.upstream_calls,
+            "coalesced": self.coalesced,
+            "near_duplicate_reuses": self.near_duplicate_reuses,
+            "in_flight": len(self._in_flight),
+            "cache": self.cache.stats()
+        }
+
+# Create service instances
+gemini_client = GeminiClient(
+    api_key=settings.GEMINI_API_KEY,
+    model=settings.GEMINI_MODEL,
+    base_url=settings.GEMINI_BASE_URL,
+    timeout=settings.GEMINI_TIMEOUT
+)
+question_generation_service = QuestionGenerationService(
+    client=gemini_client,
+    cache=TTLCache(max_entries=settings.QUESTION_CACHE_MAX_ENTRIES, ttl=settings.QUESTION_CACHE_TTL),
+    chunker=document_chunker,
+    section_concurrency=settings.CHUNK_CONCURRENCY
+)
+QUESTION_GENERATIONS_IN_FLIGHT.set_function(lambda: question_generation_service.stats()["in_flight"])
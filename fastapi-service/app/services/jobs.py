@@ -0,0 +1,434 @@
+import asyncio
+import itertools
+import json
+import logging
+import sqlite3
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import closing
+from pathlib import Path
+from typing import AsyncIterator
+from urllib.parse import urlparse
+from fastapi import HTTPException
+from app.core.clients import get_http_client
+from app.core.config import settings
+from app.core.executors import job_timeout_override
+from app.core.ingest import IngestedFile
+from app.core.metrics import BACKGROUND_JOBS_QUEUED, BACKGROUND_JOBS_RUNNING, span
+from app.services.text_extraction import text_extraction_service
+
+logger = logging.getLogger(__name__)
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+FINISHED_STATES = (SUCCEEDED, FAILED)
+
+# Lower numbers are picked first
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+
+class JobStore(ABC):
+    """Base class for job state backends"""
+
+    name = "base"
+
+    @abstractmethod
+    async def create(self, job: dict[str, any]) -> None:
+        ...
+
+    @abstractmethod
+    async def get(self, job_id: str) -> dict[str, any] | None:
+        ...
+
+    @abstractmethod
+    async def update(self, job_id: str, **fields) -> dict[str, any] | None:
+        ...
+
+    @abstractmethod
+    async def prune(self, finished_before: float) -> int:
+        """Delete finished jobs older than the given timestamp"""
+        ...
+
+class MemoryJobStore(JobStore):
+    """Jobs kept in a dict, visible to this process only"""
+
+    name = "memory"
+
+    def __init__(self):
+        self._jobs: dict[str, dict[str, any]] = {}
+
+    async def create(self, job: dict[str, any]) -> None:
+        self._jobs[job["id"]] = dict(job)
+
+    async def get(self, job_id: str) -> dict[str, any] | None:
+        job = self._jobs.get(job_id)
+        return dict(job) if job is not None else None
+
+    async def update(self, job_id: str, **fields) -> dict[str, any] | None:
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        job.update(fields)
+        return dict(job)
+
+    async def prune(self, finished_before: float) -> int:
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job["status"] in FINISHED_STATES and job["finished_at"] < finished_before
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+        return len(expired)
+
+class SqliteJobStore(JobStore):
+    """Jobs in a SQLite file, shared by every process on the host"""
+
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as connection, connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, status TEXT NOT NULL, finished_at REAL, data TEXT NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        # Callers close it; using the connection as a context manager only commits or rolls back
+        connection = sqlite3.connect(self.path, timeout=10)
+        # WAL lets readers poll while a worker writes
+        connection.execute("PRAGMA journal_mode=WAL")
+        return connection
+
+    def _write(self, job: dict[str, any]) -> None:
+        with closing(self._connect()) as connection, connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO jobs (id, status, finished_at, data) VALUES (?, ?, ?, ?)",
+                (job["id"], job["status"], job.get("finished_at"), json.dumps(job))
+            )
+
+    def _read(self, job_id: str) -> dict[str, any] | None:
+        with closing(self._connect()) as connection, connection:
+            row = connection.execute("SELECT data FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _update(self, job_id: str, fields: dict[str, any]) -> dict[str, any] | None:
+        job = self._read(job_id)
+        if job is None:
+            return None
+        job.update(fields)
+        self._write(job)
+        return job
+
+    def _prune(self, finished_before: float) -> int:
+        with closing(self._connect()) as connection, connection:
+            return connection.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+                (*FINISHED_STATES, finished_before)
+            ).rowcount
+
+    async def create(self, job: dict[str, any]) -> None:
+        await asyncio.to_thread(self._write, job)
+
+    async def get(self, job_id: str) -> dict[str, any] | None:
+        return await asyncio.to_thread(self._read, job_id)
+
+    async def update(self, job_id: str, **fields) -> dict[str, any] | None:
+        # Each job is only ever updated by the process running it, so read-modify-write is safe
+        return await asyncio.to_thread(self._update, job_id, fields)
+
+    async def prune(self, finished_before: float) -> int:
+        return await asyncio.to_thread(self._prune, finished_before)
+
+def create_job_store() -> JobStore:
+    """Build the job store from settings"""
+    if settings.JOB_STORE == "sqlite":
+        return SqliteJobStore(settings.JOB_SQLITE_PATH or str(Path(settings.UPLOAD_DIR) / "jobs.sqlite3"))
+    if settings.JOB_STORE != "memory":
+        raise ValueError(f"Unknown job store: {settings.JOB_STORE}")
+    return MemoryJobStore()
+
+def public_job(job: dict[str, any]) -> dict[str, any]:
+    """Job fields returned to clients"""
+    return {key: value for key, value in job.items() if key not in ("user_id", "callback_url")}
+
+def _shutdown_failure() -> dict[str, any]:
+    return {
+        "status": FAILED,
+        "finished_at": time.time(),
+        "error": {"status_code": 503, "message": "Server shut down before the job finished"}
+    }
+
+class ExtractionJobQueue:
+    """Runs extractions in the background, highest priority first, with a fixed number of workers"""
+
+    def __init__(
+        self,
+        store: JobStore,
+        workers: int,
+        max_queued: int,
+        job_timeout: float,
+        max_retries: int,
+        result_ttl: float,
+        poll_interval: float
+    ):
+        self.store = store
+        self.workers = max(1, workers)
+        self.max_queued = max_queued
+        self.job_timeout = job_timeout
+        self.max_retries = max_retries
+        self.result_ttl = result_ttl
+        self.poll_interval = poll_interval
+
+        self._queue: asyncio.PriorityQueue | None = None
+        self._order = itertools.count()  # Keeps equal priorities first-in, first-out
+        self._files: dict[str, IngestedFile] = {}
+        self._changed: dict[str, asyncio.Event] = {}
+        self._worker_tasks: list[asyncio.Task] = []
+        self._webhook_tasks: set[asyncio.Task] = set()
+        self._running = 0
+        self._draining = False
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    def start(self) -> None:
+        """Start the workers if they are not running yet"""
+        if self._worker_tasks:
+            return
+        self._draining = False
+        self._queue = asyncio.PriorityQueue()
+        self._worker_tasks = [
+            asyncio.create_task(self._worker(), name=f"extraction-job-{i}")
+            for i in range(self.workers)
+        ]
+
+    async def submit(
+        self,
+        ingested: IngestedFile,
+        user_id: str | None,
+        priority: str = "normal",
+        callback_url: str | None = None
+    ) -> dict[str, any]:
+        """Queue an ingested upload for extraction; the queue owns and releases its spool"""
+        self.start()
+        if self._queue.qsize() >= self.max_queued:
+            raise HTTPException(
+                status_code=503,
+                detail="Too many queued extraction jobs. Please try again shortly."
+            )
+
+        now = time.time()
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": QUEUED,
+            "priority": priority,
+            "user_id": user_id,
+            "callback_url": callback_url,
+            "file": ingested.info(),
+            "created_at": now,
+            "started_at": None,
+            "finished_at": None,
+            "attempts": 0,
+            "result": None,
+            "error": None
+        }
+        await self.store.create(job)
+        self._files[job["id"]] = ingested
+        self._changed[job["id"]] = asyncio.Event()
+        self._queue.put_nowait((PRIORITIES[priority], next(self._order), job["id"]))
+
+        # Housekeeping piggybacks on submissions
+        await self.store.prune(now - self.result_ttl)
+        return job
+
+    async def get(self, job_id: str, user_id: str | None) -> dict[str, any] | None:
+        """Get a job, hiding jobs that belong to other users"""
+        job = await self.store.get(job_id)
+        if job is None or job["user_id"] != user_id:
+            return None
+        return job
+
+    async def watch(self, job_id: str, user_id: str | None) -> AsyncIterator[dict[str, any]]:
+        """Yield the job whenever its status changes, until it finishes"""
+        last_status = None
+        while True:
+            # Take the event before reading so a change in between is not missed
+            event = self._changed.get(job_id)
+            job = await self.get(job_id, user_id)
+            if job is None:
+                return
+            if job["status"] != last_status:
+                last_status = job["status"]
+                yield job
+            if job["status"] in FINISHED_STATES:
+                return
+
+            # Jobs run by this process signal changes; others are polled from the store
+            if event is not None:
+                try:
+                    await asyncio.wait_for(event.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+            else:
+                await asyncio.sleep(self.poll_interval)
+
+    async def _set(self, job_id: str, **fields) -> dict[str, any] | None:
+        """Update a job and wake anyone watching it"""
+        job = await self.store.update(job_id, **fields)
+        event = self._changed.get(job_id)
+        if event is not None:
+            event.set()
+            # Watchers wait on a fresh event for the next change
+            self._changed[job_id] = asyncio.Event()
+        return job
+
+    async def _worker(self) -> None:
+        # Workers stop taking queued jobs once the queue is draining
+        while not self._draining:
+            _, _, job_id = await self._queue.get()
+            self._running += 1
+            self._idle.clear()
+            try:
+                await self._run(job_id)
+            except Exception as e:
+                logger.error(f"Extraction job {job_id} crashed: {str(e)}")
+            finally:
+                self._running -= 1
+                self._queue.task_done()
+                if not self._running:
+                    self._idle.set()
+
+    async def _run(self, job_id: str) -> None:
+        ingested = self._files[job_id]
+        job = None
+        try:
+            await self._set(job_id, status=RUNNING, started_at=time.time())
+            # Background jobs may take longer than a request
+            job_timeout_override.set(self.job_timeout)
+
+            for attempt in range(1, self.max_retries + 2):
+                try:
+                    result = await text_extraction_service.extract_text(ingested)
+                except HTTPException as e:
+                    # Busy workers are worth waiting for; anything else is final
+                    if e.status_code != 503 or attempt > self.max_retries:
+                        raise
+                    await self._set(job_id, attempts=attempt)
+                    await asyncio.sleep(min(2 ** attempt, 30))
+                    continue
+                job = await self._set(
+                    job_id,
+                    status=SUCCEEDED,
+                    attempts=attempt,
+                    finished_at=time.time(),
+                    result=result
+                )
+                break
+        except asyncio.CancelledError:
+            await self.store.update(job_id, **_shutdown_failure())
+            raise
+        except HTTPException as e:
+            job = await self._set(
+                job_id,
+                status=FAILED,
+                finished_at=time.time(),
+                error={"status_code": e.status_code, "message": e.detail}
+            )
+        except Exception as e:
+            logger.error(f"Extraction job {job_id} failed: {str(e)}")
+            job = await self._set(
+                job_id,
+                status=FAILED,
+                finished_at=time.time(),
+                error={"status_code": 500, "message": "Text extraction failed"}
+            )
+        finally:
+            ingested.close()
+            self._files.pop(job_id, None)
+            self._changed.pop(job_id, None)
+
+        if job is not None and job.get("callback_url"):
+            # Delivered on the side so a slow receiver does not hold up the next job
+            task = asyncio.create_task(self._notify(job), name=f"extraction-job-webhook-{job_id}")
+            self._webhook_tasks.add(task)
+            task.add_done_callback(self._webhook_tasks.discard)
+
+    async def _notify(self, job: dict[str, any]) -> None:
+        """POST the finished job to its webhook, best effort"""
+        try:
+            with span("webhook", job_id=job["id"]):
+                response = await get_http_client().post(
+                    job["callback_url"],
+                    json=public_job(job),
+                    timeout=settings.JOB_WEBHOOK_TIMEOUT
+                )
+            if response.status_code >= 400:
+                logger.warning(f"Webhook for job {job['id']} returned {response.status_code}")
+        except Exception as e:
+            logger.warning(f"Webhook for job {job['id']} failed: {str(e)}")
+
+    def stats(self) -> dict[str, any]:
+        """Get queue depth and worker statistics"""
+        return {
+            "store": self.store.name,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "running": self._running,
+            "webhooks_pending": len(self._webhook_tasks),
+            "workers": self.workers,
+            "max_queued": self.max_queued
+        }
+
+    async def shutdown(self, drain_timeout: float = 0) -> None:
+        """Stop the workers and release the spools of unfinished jobs.
+
+        Running jobs get up to drain_timeout seconds to finish first.
+        """
+        self._draining = True
+        if drain_timeout > 0 and self._running:
+            logger.info(f"Waiting up to {drain_timeout}s for {self._running} running extraction jobs")
+            try:
+                await asyncio.wait_for(self._idle.wait(), timeout=drain_timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Cancelling {self._running} extraction jobs still running after {drain_timeout}s")
+
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+
+        # Deliveries are bounded by JOB_WEBHOOK_TIMEOUT, let the last ones go out
+        if self._webhook_tasks:
+            await asyncio.wait(set(self._webhook_tasks), timeout=settings.JOB_WEBHOOK_TIMEOUT)
+
+        # Jobs still waiting in the queue
+        for job_id, ingested in list(self._files.items()):
+            ingested.close()
+            await self.store.update(job_id, **_shutdown_failure())
+        self._files.clear()
+        self._changed.clear()
+
+def validate_callback_url(callback_url: str | None) -> str | None:
+    """Only allow webhooks to configured hosts"""
+    if not callback_url:
+        return None
+    parsed = urlparse(callback_url)
+    if parsed.scheme not in ("http", "https") or parsed.hostname not in settings.JOB_WEBHOOK_HOSTS:
+        raise HTTPException(status_code=400, detail="Callback URL host is not allowed")
+    return callback_url
+
+# Create job queue instance
+extraction_job_queue = ExtractionJobQueue(
+    store=create_job_store(),
+    workers=settings.JOB_WORKERS,
+    max_queued=settings.JOB_MAX_QUEUED,
+    job_timeout=settings.JOB_TIMEOUT,
+    max_retries=settings.JOB_MAX_RETRIES,
+    result_ttl=settings.JOB_RESULT_TTL,
+    poll_interval=settings.JOB_POLL_INTERVAL
+)
+BACKGROUND_JOBS_QUEUED.set_function(lambda: extraction_job_queue.stats()["queued"])
+BACKGROUND_JOBS_RUNNING.set_function(lambda: extraction_job_queue.stats()["running"])
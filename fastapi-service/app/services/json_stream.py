@@ -0,0 +1,109 @@
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+class JsonArrayStreamParser:
+    """Incrementally parses a streamed JSON array, returning each element once it is complete.
+
+    Text before the opening bracket (e.g. a ```json fence) is skipped, and
+    elements that fail to parse are dropped instead of failing the stream.
+    """
+
+    def __init__(self):
+        self._buffer = ''
+        self._position = 0  # Next character of the buffer to scan
+        self._started = False
+        self._finished = False
+        self._depth = 0  # Nesting depth inside the top-level array
+        self._in_string = False
+        self._escaped = False
+        self._element_start: int | None = None
+        self.dropped = 0
+
+    @property
+    def finished(self) -> bool:
+        """Whether the closing bracket of the array has been seen"""
+        return self._finished
+
+    def feed(self, chunk: str) -> list[any]:
+        """Add streamed text and return the elements it completed"""
+        if self._finished:
+            return []
+
+        self._buffer += chunk
+        elements = []
+        buffer = self._buffer
+        position = self._position
+
+        if not self._started:
+            start = buffer.find('[', position)
+            if start == -1:
+                self._buffer = ''
+                self._position = 0
+                return []
+            self._started = True
+            position = start + 1
+
+        while position < len(buffer):
+            char = buffer[position]
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 0:
+                        elements.extend(self._complete(buffer, position))
+            elif char == '"':
+                self._in_string = True
+                if self._depth == 0:
+                    self._element_start = position
+            elif char in '{[':
+                if self._depth == 0:
+                    self._element_start = position
+                self._depth += 1
+            elif char in '}]':
+                if self._depth == 0:
+                    # Closing bracket of the top-level array
+                    elements.extend(self._complete(buffer, position - 1))
+                    self._finished = True
+                    break
+                self._depth -= 1
+                if self._depth == 0:
+                    elements.extend(self._complete(buffer, position))
+            elif self._depth == 0:
+                if char == ',':
+                    elements.extend(self._complete(buffer, position - 1))
+                elif not char.isspace() and self._element_start is None:
+                    # Bare scalar element (number, true, false, null)
+                    self._element_start = position
+
+            position += 1
+
+        # Keep only the unfinished element in the buffer
+        keep_from = self._element_start if self._element_start is not None else position
+        self._buffer = buffer[keep_from:]
+        self._position = position - keep_from
+        if self._element_start is not None:
+            self._element_start = 0
+        return elements
+
+    def _complete(self, buffer: str, end: int) -> list[any]:
+        """Parse the element spanning from its start to end (inclusive)"""
+        start = self._element_start
+        self._element_start = None
+        if start is None:
+            return []
+
+        text = buffer[start:end + 1].strip()
+        if not text:
+            return []
+        try:
+            return [json.loads(text)]
+        except ValueError:
+            self.dropped += 1
+            logger.warning("Dropping unparseable element from streamed JSON array")
+            return []
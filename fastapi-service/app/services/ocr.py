@@ -0,0 +1,113 @@
+import asyncio
+import logging
+import time
+from typing import AsyncIterator
+from fastapi import HTTPException
+from app.core.config import settings
+from app.core.executors import ExtractionExecutor, extraction_executor, PROCESS
+from app.services.extractors import OCR_FAILED_TEXT, prepare_ocr_tiles, ocr_tile
+
+logger = logging.getLogger(__name__)
+
+class OcrEngine:
+    """Preprocesses images and OCRs their bands in parallel on the warm process pool"""
+
+    def __init__(
+        self,
+        executor: ExtractionExecutor,
+        lang: str,
+        psm: int,
+        target_dpi: int,
+        max_dimension: int,
+        binarize: bool,
+        tile_height: int,
+        max_tiles: int
+    ):
+        self.executor = executor
+        self.lang = lang
+        self.psm = psm
+        self.target_dpi = target_dpi
+        self.max_dimension = max_dimension
+        self.binarize = binarize
+        self.tile_height = max(1, tile_height)
+        self.max_tiles = max(1, max_tiles)
+
+    async def _prepare(self, content: bytes | str) -> dict[str, any]:
+        return await self.executor.run(
+            PROCESS,
+            prepare_ocr_tiles,
+            content,
+            self.target_dpi,
+            self.max_dimension,
+            self.binarize,
+            self.tile_height,
+            self.max_tiles
+        )
+
+    async def extract(self, content: bytes | str) -> dict[str, any]:
+        """OCR an image, returning its text and preprocessing details"""
+        started = time.perf_counter()
+        try:
+            prepared = await self._prepare(content)
+            # Bands are cut between text lines, so their text is joined in order
+            texts = await asyncio.gather(*(
+                self.executor.run(PROCESS, ocr_tile, tile, self.lang, self.psm)
+                for tile in prepared["tiles"]
+            ), return_exceptions=True)
+            # Wait for every band before failing so no job outlives the request
+            for text in texts:
+                if isinstance(text, BaseException):
+                    raise text
+        except HTTPException:
+            # Busy and timeout errors reach the client as they do for other formats
+            raise
+        except Exception as e:
+            # OCR failures return a helpful message instead of an error
+            logger.error(f"Image OCR extraction error: {str(e)}")
+            return {"text": OCR_FAILED_TEXT, "cacheable": False, "ocr": {"error": str(e)}}
+
+        return {
+            "text": '\n'.join(text.strip() for text in texts if text.strip()),
+            "ocr": {
+                "tiles": len(prepared["tiles"]),
+                "original_size": list(prepared["original_size"]),
+                "size": list(prepared["size"]),
+                "lang": self.lang,
+                "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)
+            }
+        }
+
+    async def stream(self, content: bytes | str) -> AsyncIterator[dict[str, any]]:
+        """Yield the text of each band, top to bottom, as soon as it and the bands above it are OCR'd"""
+        tasks: list[asyncio.Task] = []
+        try:
+            prepared = await self._prepare(content)
+            tasks = [
+                asyncio.create_task(self.executor.run(PROCESS, ocr_tile, tile, self.lang, self.psm))
+                for tile in prepared["tiles"]
+            ]
+            yield {"bands": len(tasks), "size": list(prepared["size"]), "lang": self.lang}
+            for index, task in enumerate(tasks):
+                yield {"text": (await task).strip(), "band": index + 1}
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Image OCR extraction error: {str(e)}")
+            yield {"text": OCR_FAILED_TEXT, "cacheable": False, "error": str(e)}
+        finally:
+            # No band job outlives the stream
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+# Create engine instance
+ocr_engine = OcrEngine(
+    executor=extraction_executor,
+    lang=settings.OCR_LANG,
+    psm=settings.OCR_PSM,
+    target_dpi=settings.OCR_TARGET_DPI,
+    max_dimension=settings.OCR_MAX_DIMENSION,
+    binarize=settings.OCR_BINARIZE,
+    tile_height=settings.OCR_TILE_HEIGHT,
+    max_tiles=settings.OCR_MAX_TILES
+)
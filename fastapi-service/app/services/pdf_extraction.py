@@ -0,0 +1,158 @@
+import asyncio
+import logging
+import os
+import tempfile
+import time
+from collections import deque
+from typing import AsyncIterator
+from app.core.config import settings
+from app.core.executors import ExtractionExecutor, extraction_executor, PROCESS, THREAD
+from app.services.extractors import get_pdf_page_count, extract_pdf_pages
+from app.services.ocr import OcrEngine, ocr_engine
+
+logger = logging.getLogger(__name__)
+
+def _spool_pdf(content: bytes) -> str:
+    """Write PDF bytes to a temp file, returning its path"""
+    with tempfile.NamedTemporaryFile(
+        prefix="pdf-", suffix=".pdf", dir=settings.INGEST_SPOOL_DIR, delete=False
+    ) as f:
+        f.write(content)
+    return f.name
+
+class PdfExtractionEngine:
+    """Extracts PDF pages in parallel batches, stopping once the character budget is met.
+
+    Pages without a text layer are OCR'd from their embedded images when an
+    OCR engine is configured.
+    """
+
+    def __init__(
+        self,
+        executor: ExtractionExecutor,
+        batch_size: int,
+        max_parallel_batches: int,
+        char_budget: int,
+        ocr: OcrEngine | None = None,
+        ocr_min_chars: int = 20
+    ):
+        self.executor = executor
+        self.batch_size = max(1, batch_size)
+        self.max_parallel_batches = max(1, max_parallel_batches)
+        self.char_budget = char_budget
+        self.ocr = ocr
+        self.ocr_min_chars = ocr_min_chars
+
+    async def _extract_batch(self, content: bytes | str, start: int, stop: int) -> list[dict[str, any]]:
+        """Extract a batch of pages, then OCR its text-less pages in parallel"""
+        ocr_min_chars = self.ocr_min_chars if self.ocr is not None else None
+        pages = await self.executor.run(PROCESS, extract_pdf_pages, content, start, stop, ocr_min_chars)
+        await asyncio.gather(*(self._ocr_page(page) for page in pages if page.get("images")))
+        for page in pages:
+            page.pop("images", None)
+        return pages
+
+    async def _ocr_page(self, page: dict[str, any]) -> None:
+        """Replace a scanned page's text with the OCR text of its images"""
+        started = time.perf_counter()
+        results = await asyncio.gather(*(self.ocr.extract(image) for image in page["images"]))
+
+        errors = [result["ocr"]["error"] for result in results if "error" in result["ocr"]]
+        texts = [result["text"] for result in results if "error" not in result["ocr"]]
+        text = '\n'.join(text for text in texts if text.strip())
+        if text:
+            page["text"] = text
+            page["chars"] = len(' '.join(text.split()))
+        page["ocr"] = True
+        page["ocr_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        if errors:
+            page["error"] = errors[0]
+
+    async def _pages(self, content: bytes | str, page_count: int, char_budget: int) -> AsyncIterator[dict[str, any]]:
+        """Yield pages in order as their batches finish, until the character budget is met"""
+        batches = deque(
+            (start, min(start + self.batch_size, page_count))
+            for start in range(0, page_count, self.batch_size)
+        )
+        in_flight: deque[asyncio.Task] = deque()
+        chars = 0
+
+        # Batches get the path of an in-memory upload rather than a pickled copy of its bytes each,
+        # and workers keep the document open between batches
+        spooled = None
+        if isinstance(content, bytes) and len(batches) > 1:
+            spooled = content = await asyncio.to_thread(_spool_pdf, content)
+
+        try:
+            while batches or in_flight:
+                # Keep the window full, but stop scheduling once the budget is met
+                while batches and len(in_flight) < self.max_parallel_batches and chars < char_budget:
+                    start, stop = batches.popleft()
+                    in_flight.append(asyncio.create_task(self._extract_batch(content, start, stop)))
+
+                if not in_flight:
+                    break
+
+                # Consume batches in page order
+                for page in await in_flight.popleft():
+                    if chars >= char_budget:
+                        break
+                    if page["text"].strip():
+                        chars += page["chars"]
+                    yield page
+
+                if chars >= char_budget:
+                    break
+        finally:
+            # Drop batches that are no longer needed
+            for task in in_flight:
+                task.cancel()
+            await asyncio.gather(*in_flight, return_exceptions=True)
+            if spooled is not None:
+                try:
+                    os.unlink(spooled)
+                except FileNotFoundError:
+                    pass
+
+    async def stream(self, content: bytes | str) -> AsyncIterator[dict[str, any]]:
+        """Yield the page count, then each page with its text as soon as it and the pages before it are extracted"""
+        page_count = await self.executor.run(THREAD, get_pdf_page_count, content)
+        yield {"page_count": page_count}
+        async for page in self._pages(content, page_count, self.char_budget):
+            yield page
+
+    async def extract(self, content: bytes | str, max_chars: int | None = None) -> dict[str, any]:
+        """Extract text and per-page timing from a PDF, up to max_chars (the engine's char_budget by default)"""
+        started = time.perf_counter()
+        page_count = await self.executor.run(THREAD, get_pdf_page_count, content)
+
+        text_parts = []
+        pages = []
+        async for page in self._pages(content, page_count, self.char_budget if max_chars is None else max_chars):
+            page_text = page.pop("text")
+            if page_text.strip():
+                text_parts.append(page_text)
+            pages.append(page)
+
+        ocr_pages = [page for page in pages if page.get("ocr")]
+        return {
+            "text": '\n\n'.join(text_parts),
+            "page_count": page_count,
+            "pages_processed": len(pages),
+            "stopped_early": len(pages) < page_count,
+            "ocr_pages": [page["page"] for page in ocr_pages],
+            # Failed OCR may succeed later (e.g. once Tesseract is installed), so do not cache it
+            "cacheable": not any(page.get("error") for page in ocr_pages),
+            "pages": pages,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)
+        }
+
+# Create engine instance
+pdf_extraction_engine = PdfExtractionEngine(
+    executor=extraction_executor,
+    batch_size=settings.PDF_PAGE_BATCH_SIZE,
+    max_parallel_batches=settings.PDF_MAX_PARALLEL_BATCHES,
+    char_budget=settings.MAX_TEXT_LENGTH,
+    ocr=ocr_engine if settings.PDF_OCR_FALLBACK else None,
+    ocr_min_chars=settings.PDF_OCR_MIN_CHARS
+)
@@ -0,0 +1,188 @@
+import functools
+import importlib
+import inspect
+import logging
+from importlib.metadata import entry_points
+from typing import AsyncIterator, Callable
+from app.core.executors import extraction_executor, PROCESS, THREAD
+
+logger = logging.getLogger(__name__)
+
+# Cost classes, used to pick the pool an extractor runs on and for scheduling
+CPU = "cpu"  # Parsing that holds the GIL, e.g. PDF
+IO = "io"  # Light parsing dominated by reading, e.g. TXT and DOCX
+OCR = "ocr"  # Image preprocessing and Tesseract, the most expensive
+COST_CLASSES = (CPU, IO, OCR)
+
+# Entry point group third-party extractors register under
+ENTRY_POINT_GROUP = "skillscore.extractors"
+
+def resolve_target(target: str) -> any:
+    """Import "module:attribute.path" and return the attribute"""
+    module_name, _, attribute_path = target.partition(':')
+    value = importlib.import_module(module_name)
+    for attribute in filter(None, attribute_path.split('.')):
+        value = getattr(value, attribute)
+    return value
+
+class ExtractorPlugin:
+    """An extractor for some file extensions, imported the first time it is used.
+
+    target is "module:attribute" and resolves to either an async callable
+    taking the upload (bytes or spool path) and returning a dict with "text",
+    or a picklable sync function returning the text (or such a dict), which is
+    run on the pool matching the cost class. Extractors taking a max_chars
+    keyword are given the character budget when the caller sets one.
+
+    stream_target, if given, resolves to an async generator function or a
+    sync generator function (run on the thread pool) taking the same input
+    and yielding dicts with the "text" of each chunk in order, e.g. per page.
+    Dicts without "text" carry details only. Plugins without it stream their
+    whole extract() result as one chunk.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        extensions: list[str],
+        cost: str,
+        target: str,
+        version: str = "1",
+        stream_target: str | None = None
+    ):
+        if cost not in COST_CLASSES:
+            raise ValueError(f"Unknown cost class for extractor {name}: {cost}")
+        self.name = name
+        self.extensions = [extension.lower().lstrip('.') for extension in extensions]
+        self.cost = cost
+        self.target = target
+        self.version = version  # Bump when output changes, so cached results are invalidated
+        self.stream_target = stream_target
+        self._extractor: Callable | None = None
+        self._streamer: Callable | None = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._extractor is not None
+
+    def load(self) -> Callable:
+        """Import the extractor, once"""
+        if self._extractor is None:
+            self._extractor = resolve_target(self.target)
+            logger.debug(f"Loaded extractor {self.name} from {self.target}")
+        return self._extractor
+
+    def accepts_max_chars(self) -> bool:
+        """Whether the extractor takes a max_chars character budget"""
+        return "max_chars" in inspect.signature(self.load()).parameters
+
+    async def extract(self, content: bytes | str, max_chars: int | None = None) -> dict[str, any]:
+        """Extract text, returning a dict with "text" and any format-specific details"""
+        extractor = self.load()
+        if max_chars is not None and self.accepts_max_chars():
+            # A partial of a module-level function still pickles for the process pool
+            extractor = functools.partial(extractor, max_chars=max_chars)
+        if inspect.iscoroutinefunction(extractor):
+            return await extractor(content)
+
+        kind = THREAD if self.cost == IO else PROCESS
+        result = await extraction_executor.run(kind, extractor, content)
+        # Functions may return just the text, or a dict with "text" and details
+        return result if isinstance(result, dict) else {"text": result}
+
+    async def stream(self, content: bytes | str) -> AsyncIterator[dict[str, any]]:
+        """Yield chunks of text, with any chunk details, in document order"""
+        if self.stream_target is None:
+            yield await self.extract(content)
+            return
+
+        if self._streamer is None:
+            self._streamer = resolve_target(self.stream_target)
+        if inspect.isasyncgenfunction(self._streamer):
+            chunks = self._streamer(content)
+        else:
+            chunks = extraction_executor.iterate(self._streamer, content)
+        async for chunk in chunks:
+            yield chunk
+
+    def info(self) -> dict[str, any]:
+        return {
+            "name": self.name,
+            "extensions": self.extensions,
+            "cost": self.cost,
+            "version": self.version,
+            "streaming": self.stream_target is not None,
+            "loaded": self.loaded
+        }
+
+# Extractors that ship with the service
+BUILTIN_PLUGINS = [
+    ExtractorPlugin(
+        "pdf", ["pdf"], CPU, "app.services.pdf_extraction:pdf_extraction_engine.extract",
+        stream_target="app.services.pdf_extraction:pdf_extraction_engine.stream"
+    ),
+    ExtractorPlugin(
+        "docx", ["docx"], IO, "app.services.extractors:extract_docx_text",
+        stream_target="app.services.extractors:stream_docx_text"
+    ),
+    # Not streamed: an invalid byte late in the file can restart decoding with another encoding
+    ExtractorPlugin("txt", ["txt"], IO, "app.services.extractors:extract_txt_text", version="2"),
+    ExtractorPlugin(
+        "image", ["jpg", "jpeg", "png"], OCR, "app.services.ocr:ocr_engine.extract",
+        stream_target="app.services.ocr:ocr_engine.stream"
+    ),
+]
+
+class ExtractorRegistry:
+    """Maps file extensions to extractor plugins"""
+
+    def __init__(self, plugins: list[ExtractorPlugin] | None = None):
+        self._plugins: dict[str, ExtractorPlugin] = {}
+        self._entry_points_loaded = False
+        for plugin in plugins or []:
+            self.register(plugin)
+
+    def register(self, plugin: ExtractorPlugin) -> None:
+        """Add a plugin; later registrations win for the same extension"""
+        for extension in plugin.extensions:
+            if extension in self._plugins:
+                logger.info(f"Extractor {plugin.name} replaces {self._plugins[extension].name} for .{extension}")
+            self._plugins[extension] = plugin
+
+    def load_entry_points(self) -> None:
+        """Register plugins published under the skillscore.extractors entry point group, once.
+
+        Each entry point must resolve to an ExtractorPlugin (or a list of them)
+        declared in a module that is cheap to import.
+        """
+        if self._entry_points_loaded:
+            return
+        self._entry_points_loaded = True
+
+        for entry_point in entry_points(group=ENTRY_POINT_GROUP):
+            try:
+                declared = entry_point.load()
+                for plugin in declared if isinstance(declared, (list, tuple)) else [declared]:
+                    if not isinstance(plugin, ExtractorPlugin):
+                        raise TypeError("entry point must resolve to an ExtractorPlugin")
+                    self.register(plugin)
+            except Exception as e:
+                logger.error(f"Failed to load extractor plugin {entry_point.name}: {str(e)}")
+
+    def get(self, extension: str) -> ExtractorPlugin | None:
+        """Get the plugin for a file extension"""
+        self.load_entry_points()
+        return self._plugins.get(extension.lower())
+
+    def extensions(self) -> list[str]:
+        """Get every extension with a registered extractor"""
+        self.load_entry_points()
+        return list(self._plugins)
+
+    def plugins(self) -> list[ExtractorPlugin]:
+        """Get each registered plugin once"""
+        self.load_entry_points()
+        return list({id(plugin): plugin for plugin in self._plugins.values()}.values())
+
+# Create registry instance
+extractor_registry = ExtractorRegistry(BUILTIN_PLUGINS)
@@ -0,0 +1,313 @@
+import array
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing
+from app.core.config import settings
+from app.core.metrics import SIMILARITY_INDEX_BYTES, SIMILARITY_INDEX_ENTRIES, observe_stage
+
+logger = logging.getLogger(__name__)
+
+_WORD_RE = re.compile(r'\w+')
+
+# Marks a signature bin no shingle hashed into
+_EMPTY = (1 << 64) - 1
+
+# Signatures keep the low 32 bits of each bin; chance agreements stay negligible at half the memory
+_SIGNATURE_MASK = (1 << 32) - 1
+
+# Approximate memory per band entry: the bucket key and its slot in the bucket dict
+_BUCKET_ENTRY_BYTES = 55
+
+def shingle_hashes(words: list[str], size: int) -> set[int]:
+    """64-bit hashes of the distinct runs of size consecutive words"""
+    return {
+        int.from_bytes(hashlib.blake2b(' '.join(words[i:i + size]).encode(), digest_size=8).digest(), 'little')
+        for i in range(len(words) - size + 1)
+    }
+
+def minhash_signature(hashes: set[int], num_perm: int) -> array.array | None:
+    """One-permutation MinHash: each hash falls into one of num_perm bins, which keep their minimum.
+
+    Hashing every shingle once instead of once per permutation keeps this
+    fast in pure Python. Empty bins borrow the next filled bin to their right,
+    offset by the distance, so short texts still get comparable signatures.
+    """
+    if not hashes:
+        return None
+    bins = [_EMPTY] * num_perm
+    for value in hashes:
+        index = value % num_perm
+        value //= num_perm
+        if value < bins[index]:
+            bins[index] = value
+
+    signature = array.array('I', [value & _SIGNATURE_MASK for value in bins])
+    step = _EMPTY // num_perm
+    nearest, distance = 0, 0
+    for position in range(2 * num_perm - 1, -1, -1):
+        index = position % num_perm
+        if bins[index] != _EMPTY:
+            nearest, distance = bins[index], 0
+            continue
+        distance += 1
+        if position < num_perm:
+            signature[index] = (nearest + distance * step) & _SIGNATURE_MASK
+    return signature
+
+def estimate_similarity(a: array.array, b: array.array) -> float:
+    """Estimated Jaccard similarity of the shingle sets behind two signatures"""
+    return sum(x == y for x, y in zip(a, b)) / len(a)
+
+class SimilarityIndex:
+    """MinHash signatures of extracted texts in an in-memory LSH table, persisted to a SQLite file.
+
+    Signatures are cut into bands; texts sharing a whole band with the query
+    are candidates, and candidates agreeing on at least threshold of the
+    signature are near-duplicates. Every worker on the host appends to the
+    same file and reads the others' additions every sync_interval seconds.
+    """
+
+    def __init__(
+        self,
+        path: str | None,
+        threshold: float,
+        shingle_size: int,
+        num_perm: int,
+        bands: int,
+        min_words: int,
+        max_entries: int,
+        sync_interval: float = 1.0,
+        prune_every: int = 100
+    ):
+        if num_perm % bands:
+            raise ValueError("SIMILARITY_PERMUTATIONS must be a multiple of SIMILARITY_BANDS")
+        self.path = path
+        self.threshold = threshold
+        self.shingle_size = max(1, shingle_size)
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.min_words = max(min_words, self.shingle_size)
+        self.max_entries = max_entries
+        self.sync_interval = sync_interval
+        self.prune_every = prune_every
+        # Signatures only compare under the same parameters
+        self.params = f"{self.shingle_size}:{num_perm}"
+
+        self._entries: OrderedDict[str, tuple[array.array, dict[str, any]]] = OrderedDict()
+        # Band hash -> key, or a list of keys once several texts share the band
+        self._buckets: dict[int, str | list[str]] = {}
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._synced_rowid = 0
+        self._synced_at = 0.0
+        self.lookups = 0
+        self.lookup_seconds = 0.0
+        self.matches = 0
+
+        self._adds = 0
+        # The file is opened, created and trimmed on first use, so importing the service has no side effects
+        self._created = False
+
+    def _connect(self) -> sqlite3.Connection:
+        # Callers close it; using the connection as a context manager only commits or rolls back
+        if not self._created:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=10)
+        connection.execute("PRAGMA journal_mode=WAL")
+        if not self._created:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS signatures (id INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT NOT NULL, "
+                "params TEXT NOT NULL, signature BLOB NOT NULL, meta TEXT NOT NULL, UNIQUE (key, params))"
+            )
+            self._created = True
+            self._prune(connection)
+        return connection
+
+    def _prune(self, connection: sqlite3.Connection) -> None:
+        """Drop all but the newest max_entries signatures, which are all a worker ever loads"""
+        connection.execute(
+            "DELETE FROM signatures WHERE id NOT IN (SELECT id FROM signatures ORDER BY id DESC LIMIT ?)",
+            (self.max_entries,)
+        )
+
+    def _band_keys(self, signature: array.array) -> list[int]:
+        return [hash((band, *signature[band * self.rows:(band + 1) * self.rows])) for band in range(self.bands)]
+
+    def _insert(self, key: str, signature: array.array, meta: dict[str, any]) -> None:
+        """Add a signature to the in-memory table; the lock must be held"""
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (signature, meta)
+        for band_key in self._band_keys(signature):
+            bucket = self._buckets.get(band_key)
+            if bucket is None:
+                self._buckets[band_key] = key
+            elif isinstance(bucket, str):
+                self._buckets[band_key] = [bucket, key]
+            else:
+                bucket.append(key)
+        self._bytes += self._entry_bytes(key, signature, meta)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: str) -> None:
+        signature, meta = self._entries.pop(key)
+        for band_key in self._band_keys(signature):
+            bucket = self._buckets[band_key]
+            if isinstance(bucket, str):
+                del self._buckets[band_key]
+                continue
+            bucket.remove(key)
+            if len(bucket) == 1:
+                self._buckets[band_key] = bucket[0]
+        self._bytes -= self._entry_bytes(key, signature, meta)
+
+    def _entry_bytes(self, key: str, signature: array.array, meta: dict[str, any]) -> int:
+        return sys.getsizeof(key) + sys.getsizeof(signature) + sys.getsizeof(meta) + self.bands * _BUCKET_ENTRY_BYTES
+
+    def _sync(self) -> None:
+        """Load signatures added since the last sync, by this or another worker"""
+        self._synced_at = time.monotonic()
+        try:
+            with closing(self._connect()) as connection, connection:
+                rows = connection.execute(
+                    "SELECT id, key, signature, meta FROM signatures WHERE id > ? AND params = ? ORDER BY id",
+                    (self._synced_rowid, self.params)
+                ).fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to read the similarity index: {str(e)}")
+            return
+        with self._lock:
+            for rowid, key, data, meta in rows:
+                self._insert(key, array.array('I', data), json.loads(meta))
+                self._synced_rowid = max(self._synced_rowid, rowid)
+
+    def signature(self, text: str) -> array.array | None:
+        """MinHash signature of text, or None when it is too short to compare reliably"""
+        words = _WORD_RE.findall(text.lower())
+        if len(words) < self.min_words:
+            return None
+        return minhash_signature(shingle_hashes(words, self.shingle_size), self.num_perm)
+
+    def add(self, key: str, signature: array.array, meta: dict[str, any] | None = None) -> None:
+        """Index a signature under key, replacing any earlier one"""
+        meta = meta or {}
+        if self.path:
+            try:
+                with closing(self._connect()) as connection, connection:
+                    connection.execute(
+                        "INSERT OR REPLACE INTO signatures (key, params, signature, meta) VALUES (?, ?, ?, ?)",
+                        (key, self.params, signature.tobytes(), json.dumps(meta))
+                    )
+                    # Every worker appends to the file, so trim it as it grows
+                    self._adds += 1
+                    if self._adds % self.prune_every == 0:
+                        self._prune(connection)
+            except sqlite3.Error as e:
+                logger.warning(f"Failed to store signature {key}: {str(e)}")
+        with self._lock:
+            self._insert(key, signature, meta)
+
+    def query(self, signature: array.array, exclude: str | None = None, limit: int = 5) -> list[dict[str, any]]:
+        """Indexed texts whose estimated similarity reaches the threshold, most similar first"""
+        if self.path and time.monotonic() - self._synced_at >= self.sync_interval and os.path.exists(self.path):
+            self._sync()
+
+        started = time.perf_counter()
+        with self._lock:
+            candidates = set()
+            for band_key in self._band_keys(signature):
+                bucket = self._buckets.get(band_key)
+                if isinstance(bucket, str):
+                    candidates.add(bucket)
+                elif bucket is not None:
+                    candidates.update(bucket)
+            candidates.discard(exclude)
+            matches = []
+            for key in candidates:
+                other, meta = self._entries[key]
+                similarity = estimate_similarity(signature, other)
+                if similarity >= self.threshold:
+                    matches.append({**meta, "key": key, "similarity": round(similarity, 3)})
+        matches.sort(key=lambda match: match["similarity"], reverse=True)
+
+        self.lookups += 1
+        self.lookup_seconds += time.perf_counter() - started
+        self.matches += bool(matches)
+        return matches[:limit]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    async def find(self, text: str, exclude: str | None = None) -> tuple[array.array | None, list[dict[str, any]]]:
+        """Near-duplicates of text, along with its signature for indexing it afterwards"""
+        def lookup() -> tuple[array.array | None, list[dict[str, any]]]:
+            signature = self.signature(text)
+            return signature, self.query(signature, exclude) if signature is not None else []
+
+        started = time.perf_counter()
+        # Hashing every shingle takes milliseconds on long texts, keep it off the event loop
+        result = await asyncio.to_thread(lookup)
+        observe_stage("similarity", time.perf_counter() - started, size=len(text))
+        return result
+
+    async def add_text(self, key: str, text: str, meta: dict[str, any] | None = None) -> None:
+        """Index text under key, unless it is already indexed or too short"""
+        if key in self:
+            return
+
+        def index() -> None:
+            signature = self.signature(text)
+            if signature is not None:
+                self.add(key, signature, meta)
+
+        await asyncio.to_thread(index)
+
+    def stats(self) -> dict[str, any]:
+        """Get index size, approximate memory use and lookup latency"""
+        return {
+            "entries": len(self._entries),
+            "buckets": len(self._buckets),
+            "memory_bytes": self._bytes,
+            "lookups": self.lookups,
+            "lookups_matched": self.matches,
+            "mean_lookup_ms": round(self.lookup_seconds * 1000 / self.lookups, 4) if self.lookups else None,
+            "threshold": self.threshold,
+            "bands": self.bands,
+            "rows": self.rows,
+            "persisted": bool(self.path)
+        }
+
+def create_similarity_index() -> SimilarityIndex | None:
+    """Build the near-duplicate index from settings"""
+    if not settings.SIMILARITY_ENABLED:
+        return None
+    path = settings.SIMILARITY_INDEX_PATH
+    if path is None:
+        path = os.path.join(settings.UPLOAD_DIR, "similarity.sqlite3")
+    return SimilarityIndex(
+        path=path or None,
+        threshold=settings.SIMILARITY_THRESHOLD,
+        shingle_size=settings.SIMILARITY_SHINGLE_SIZE,
+        num_perm=settings.SIMILARITY_PERMUTATIONS,
+        bands=settings.SIMILARITY_BANDS,
+        min_words=settings.SIMILARITY_MIN_WORDS,
+        max_entries=settings.SIMILARITY_MAX_ENTRIES,
+        sync_interval=settings.SIMILARITY_SYNC_INTERVAL
+    )
+
+# Create index instance
+similarity_index = create_similarity_index()
+if similarity_index is not None:
+    SIMILARITY_INDEX_ENTRIES.set_function(lambda: similarity_index.stats()["entries"])
+    SIMILARITY_INDEX_BYTES.set_function(lambda: similarity_index.stats()["memory_bytes"])
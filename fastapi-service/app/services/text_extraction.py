@@ -1,12 +1,18 @@
-import io
+import asyncio
 import logging
+import time
+from contextlib import aclosing
+from typing import AsyncIterator
 from fastapi import UploadFile, HTTPException
-from PIL import Image
-import pytesseract
-from PyPDF2 import PdfReader
-from docx import Document
-import chardet
-from app.core.utils import clean_extracted_text, format_error_response
+from app.services.document_store import document_store
+from app.services.extraction_cache import extraction_cache, make_cache_key
+from app.services.extractors import EXTRACTOR_VERSION
+from app.services.registry import ExtractorPlugin, ExtractorRegistry, extractor_registry
+from app.services.similarity import similarity_index
+from app.core.admission import admission_controller
+from app.core.ingest import IngestedFile, ingest_upload
+from app.core.metrics import PDF_PAGE_SECONDS, observe_stage, record_cache, span
+from app.core.utils import TextCleaner, clean_extracted_text, format_error_response, generate_file_hash
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
@@ -14,38 +20,56 @@ logger = logging.getLogger(__name__)
 class TextExtractionService:
     """Service for extracting text from various file formats"""
     
-    def __init__(self):
-        self.supported_formats = {
-            'pdf': self._extract_from_pdf,
-            'docx': self._extract_from_docx,
-            'txt': self._extract_from_txt,
-            'jpg': self._extract_from_image,
-            'jpeg': self._extract_from_image,
-            'png': self._extract_from_image
-        }
+    def __init__(self, registry: ExtractorRegistry):
+        # Extractors are plugins, imported the first time a file of their format arrives
+        self.registry = registry
     
-    async def extract_text(self, file: UploadFile) -> dict[str, any]:
-        """Extract text from uploaded file based on its format"""
+    async def extract_text(self, file: UploadFile | IngestedFile, max_chars: int | None = None) -> dict[str, any]:
+        """Extract text from uploaded file based on its format, up to max_chars (MAX_TEXT_LENGTH by default)"""
+        # Uploads are streamed into a spool once; callers may pass one they already ingested
+        ingested = file if isinstance(file, IngestedFile) else None
         try:
             # Get file extension
             file_extension = file.filename.split('.')[-1].lower() if file.filename else ''
             
-            if file_extension not in self.supported_formats:
+            plugin = self.registry.get(file_extension)
+            if plugin is None:
                 raise HTTPException(
                     status_code=400,
                     detail=f"Unsupported file format: {file_extension}"
                 )
             
-            # Read file content
-            content = await file.read()
-            await file.seek(0)  # Reset file pointer
+            if ingested is None:
+                ingested = await ingest_upload(file)
+            content = ingested.source
+            
+            # Serve repeated uploads of the same content from the cache, then from the document store
+            extractor = f"{EXTRACTOR_VERSION}.{plugin.name}.{plugin.version}"
+            if max_chars is not None and max_chars != settings.MAX_TEXT_LENGTH:
+                # Text extracted under another budget is a different result
+                extractor = f"{extractor}.{max_chars}"
+            cache_key = make_cache_key(ingested.hash, file_extension, extractor)
+            cached = await self._cached(ingested, cache_key, extractor)
+            if cached is not None:
+                return {
+                    "success": True,
+                    **cached,
+                    "cached": True,
+                    "message": "Text extracted successfully"
+                }
             
-            # Extract text using appropriate method
-            extraction_method = self.supported_formats[file_extension]
-            extracted_text = await extraction_method(content)
+            # Extract text using the plugin for the format, once a slot of its cost class is free
+            async with admission_controller.slot(plugin.cost):
+                with span("extract", file_type=file_extension, size=ingested.size, extractor=plugin.name):
+                    extraction = await plugin.extract(content, max_chars)
+            extracted_text = extraction.pop("text")
+            # Extractors mark fallback results (e.g. failed OCR) as not worth caching
+            cacheable = extraction.pop("cacheable", True)
+            self._observe_pages(extraction)
             
             # Clean and validate extracted text
-            cleaned_text = clean_extracted_text(extracted_text)
+            with span("clean", file_type=file_extension, size=ingested.size):
+                cleaned_text = clean_extracted_text(extracted_text, max_chars)
             
             if not cleaned_text.strip():
                 return {
@@ -53,22 +77,31 @@ class TextExtractionService:
                     "text": "",
                     "word_count": 0,
                     "char_count": 0,
-                    "message": "No text could be extracted from the file"
+                    "message": "No text could be extracted from the file",
+                    **extraction
                 }
             
             # Calculate statistics
             word_count = len(cleaned_text.split())
             char_count = len(cleaned_text)
             
-            return {
+            result = {
                 "success": True,
                 "text": cleaned_text,
                 "word_count": word_count,
                 "char_count": char_count,
                 "file_type": file_extension,
-                "message": "Text extracted successfully"
+                "cached": False,
+                "message": "Text extracted successfully",
+                # Format-specific details, e.g. per-page timing for PDFs
+                **extraction
             }
             
+            if cacheable:
+                await self._remember(ingested, cache_key, extractor, result)
+            
+            return {**result, "near_duplicates": await self._near_duplicates(cleaned_text, file_extension)}
+            
         except HTTPException:
             raise
         except Exception as e:
@@ -77,106 +110,267 @@ class TextExtractionService:
                 status_code=500,
                 detail=f"Failed to extract text: {str(e)}"
             )
+        finally:
+            # Only release spools this call created
+            if ingested is not None and ingested is not file:
+                ingested.close()
+    
+    async def _cached(self, ingested: IngestedFile, cache_key: str, extractor: str) -> dict[str, any] | None:
+        """Get an earlier extraction of the same content from the cache, then from the document store"""
+        if extraction_cache is not None:
+            cached = await extraction_cache.get(cache_key)
+            record_cache("extraction", cached is not None)
+            if cached is not None:
+                return cached
+        if document_store is not None and ingested.document is not None:
+            stored = await document_store.get_extraction(ingested.hash, extractor)
+            record_cache("document_extractions", stored is not None)
+            if stored is not None:
+                if extraction_cache is not None:
+                    await extraction_cache.set(cache_key, stored)
+                return stored
+        return None
     
-    async def _extract_from_pdf(self, content: bytes) -> str:
-        """Extract text from PDF file"""
+    async def _remember(self, ingested: IngestedFile, cache_key: str, extractor: str, result: dict[str, any]) -> None:
+        """Keep a successful extraction for later uploads of the same content"""
+        if extraction_cache is not None:
+            await extraction_cache.set(cache_key, result)
+        if document_store is not None and ingested.document is not None:
+            await document_store.set_extraction(ingested.hash, extractor, result)
+    
+    async def extract_stream(self, ingested: IngestedFile) -> AsyncIterator[dict[str, any]]:
+        """Extract text chunk by chunk (pages for PDFs), yielding each cleaned chunk with running counts.
+        
+        Yields a "start" record, "chunk" records whose texts concatenate to the
+        cleaned document, "info" records with format details (e.g. page_count),
+        then a "summary", or an "error" once extraction fails.
+        """
+        started = time.perf_counter()
+        file_extension = ingested.extension
+        plugin = self.registry.get(file_extension)
+        if plugin is None:
+            yield {"type": "error", "status_code": 400, "message": f"Unsupported file format: {file_extension}"}
+            return
+        
+        yield {"type": "start", "file": ingested.info(), "extractor": plugin.name}
+        extractor = f"{EXTRACTOR_VERSION}.{plugin.name}.{plugin.version}"
+        cache_key = make_cache_key(ingested.hash, file_extension, extractor)
+        cached = await self._cached(ingested, cache_key, extractor)
+        if cached is not None:
+            yield {"type": "chunk", "index": 0, **cached}
+            yield {
+                "type": "summary",
+                "success": True,
+                **{name: value for name, value in cached.items() if name != "text"},
+                "chunks": 1,
+                "cached": True,
+                "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+                "message": "Text extracted successfully"
+            }
+            return
+        
+        cleaner = TextCleaner()
+        word_count = 0
+        char_count = 0
+        index = 0
+        first_chunk_ms = None
+        cacheable = True
+        details: dict[str, any] = {}
+        pages = []
         try:
-            pdf_file = io.BytesIO(content)
-            pdf_reader = PdfReader(pdf_file)
-            
-            text_parts = []
-            for page_num, page in enumerate(pdf_reader.pages):
-                try:
-                    page_text = page.extract_text()
-                    if page_text.strip():
-                        text_parts.append(page_text)
-                except Exception as e:
-                    logger.warning(f"Failed to extract text from PDF page {page_num + 1}: {str(e)}")
-                    continue
-            
-            return '\n\n'.join(text_parts)
-            
+            async with aclosing(self._read_ahead(plugin, ingested)) as chunks:
+                async for chunk in chunks:
+                    text = chunk.pop("text", None)
+                    cacheable = chunk.pop("cacheable", True) and cacheable
+                    if text is None:
+                        details.update(chunk)
+                        yield {"type": "info", **chunk}
+                        continue
+                    if "page" in chunk:
+                        pages.append(chunk)
+                    
+                    # Final as returned, cut at the budget like the full extraction
+                    added = cleaner.feed(text)
+                    # Chunks are separate paragraphs (pages, bands)
+                    cleaner.feed("\n\n")
+                    if not added:
+                        continue
+                    
+                    word_count += len(added.split())
+                    char_count += len(added)
+                    if first_chunk_ms is None:
+                        first_chunk_ms = round((time.perf_counter() - started) * 1000, 2)
+                        observe_stage("first_chunk", first_chunk_ms / 1000, file_extension, ingested.size)
+                    yield {
+                        "type": "chunk",
+                        "index": index,
+                        "text": added,
+                        "word_count": word_count,
+                        "char_count": char_count,
+                        **chunk
+                    }
+                    index += 1
+                    if cleaner.full:
+                        break
+        except HTTPException as e:
+            yield {"type": "error", "status_code": e.status_code, "message": e.detail}
+            return
         except Exception as e:
-            logger.error(f"PDF extraction error: {str(e)}")
-            raise Exception(f"Failed to extract text from PDF: {str(e)}")
+            logger.error(f"Streamed text extraction failed for {ingested.filename}: {str(e)}")
+            yield {"type": "error", "status_code": 500, "message": f"Failed to extract text: {str(e)}"}
+            return
+        
+        self._observe_pages({"pages": pages})
+        cleaned_text = cleaner.finish()
+        success = bool(cleaned_text.strip())
+        result = {
+            "success": success,
+            "text": cleaned_text,
+            "word_count": len(cleaned_text.split()),
+            "char_count": len(cleaned_text),
+            "file_type": file_extension,
+            "cached": False,
+            "message": "Text extracted successfully" if success else "No text could be extracted from the file",
+            **details
+        }
+        if success and cacheable:
+            await self._remember(ingested, cache_key, extractor, result)
+        
+        yield {
+            "type": "summary",
+            **{name: value for name, value in result.items() if name != "text"},
+            "near_duplicates": await self._near_duplicates(cleaned_text, file_extension) if success else [],
+            "chunks": index,
+            "first_chunk_ms": first_chunk_ms,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)
+        }
     
-    async def _extract_from_docx(self, content: bytes) -> str:
-        """Extract text from DOCX file"""
+    async def _read_ahead(self, plugin: ExtractorPlugin, ingested: IngestedFile) -> AsyncIterator[dict[str, any]]:
+        """Run the extractor to the end under its admission slot, buffering chunks the client has not read yet.
+
+        A slow or stalled client would otherwise pause the extractor and hold the
+        slot and an extraction thread for as long as it reads. Extractors stop
+        near MAX_TEXT_LENGTH, which bounds the buffer.
+        """
+        buffered: asyncio.Queue[dict[str, any] | BaseException | None] = asyncio.Queue()
+
+        async def extract() -> None:
+            try:
+                async with admission_controller.slot(plugin.cost):
+                    with span("extract_stream", file_type=ingested.extension, size=ingested.size, extractor=plugin.name):
+                        async with aclosing(plugin.stream(ingested.source)) as chunks:
+                            async for chunk in chunks:
+                                buffered.put_nowait(chunk)
+            except Exception as e:
+                buffered.put_nowait(e)
+            else:
+                buffered.put_nowait(None)
+
+        task = asyncio.create_task(extract(), name=f"extract-stream-{ingested.hash[:12]}")
         try:
-            docx_file = io.BytesIO(content)
-            doc = Document(docx_file)
-            
-            text_parts = []
-            
-            # Extract text from paragraphs
-            for paragraph in doc.paragraphs:
-                if paragraph.text.strip():
-                    text_parts.append(paragraph.text)
-            
-            # Extract text from tables
-            for table in doc.tables:
-                for row in table.rows:
-                    row_text = []
-                    for cell in row.cells:
-                        if cell.text.strip():
-                            row_text.append(cell.text.strip())
-                    if row_text:
-                        text_parts.append(' | '.join(row_text))
-            
-            return '\n\n'.join(text_parts)
-            
-        except Exception as e:
-            logger.error(f"DOCX extraction error: {str(e)}")
-            raise Exception(f"Failed to extract text from DOCX: {str(e)}")
+            while (chunk := await buffered.get()) is not None:
+                if isinstance(chunk, BaseException):
+                    raise chunk
+                yield chunk
+        finally:
+            # The client went away; stop extracting and give the slot back
+            task.cancel()
     
-    async def _extract_from_txt(self, content: bytes) -> str:
-        """Extract text from TXT file"""
+    async def _near_duplicates(self, text: str, file_type: str) -> list[dict[str, any]]:
+        """Index freshly extracted text and list earlier texts it nearly duplicates, e.g. the same notes as PDF and photo"""
+        if similarity_index is None:
+            return []
+        text_hash = generate_file_hash(text.encode())
         try:
-            # Detect encoding
-            detected = chardet.detect(content)
-            encoding = detected.get('encoding', 'utf-8')
-            
-            # Fallback encodings if detection fails
-            encodings_to_try = [encoding, 'utf-8', 'latin-1', 'cp1252']
-            
-            for enc in encodings_to_try:
-                try:
-                    if enc:
-                        text = content.decode(enc)
-                        return text
-                except (UnicodeDecodeError, LookupError):
-                    continue
-            
-            # If all encodings fail, use utf-8 with error handling
-            return content.decode('utf-8', errors='replace')
-            
+            signature, matches = await similarity_index.find(text, exclude=text_hash)
+            if signature is not None and text_hash not in similarity_index:
+                await asyncio.to_thread(similarity_index.add, text_hash, signature, {"file_type": file_type})
         except Exception as e:
-            logger.error(f"TXT extraction error: {str(e)}")
-            raise Exception(f"Failed to extract text from TXT: {str(e)}")
+            logger.warning(f"Near-duplicate lookup failed: {str(e)}")
+            return []
+        # Keys are text hashes, which clients can match against texts they already hold
+        return [
+            {"text_hash": match["key"], "similarity": match["similarity"], "file_type": match.get("file_type")}
+            for match in matches
+        ]
     
-    async def _extract_from_image(self, content: bytes) -> str:
-        """Extract text from image using OCR"""
+    def _observe_pages(self, extraction: dict[str, any]) -> None:
+        """Record per-page timings reported by page-based extractors (PDF)"""
+        for page in extraction.get("pages", ()):
+            PDF_PAGE_SECONDS.labels("text_layer").observe(page["elapsed_ms"] / 1000)
+            if "ocr_ms" in page:
+                PDF_PAGE_SECONDS.labels("ocr").observe(page["ocr_ms"] / 1000)
+    
+    async def extract_batch(
+        self,
+        files: list[tuple[int, IngestedFile]],
+        rejected: list[dict[str, any]] | None = None,
+        concurrency: int | None = None
+    ) -> AsyncIterator[dict[str, any]]:
+        """Extract many files concurrently, yielding each result as soon as it finishes"""
+        started = time.perf_counter()
+        semaphore = asyncio.Semaphore(concurrency or settings.BATCH_CONCURRENCY)
+        finished: asyncio.Queue[dict[str, any]] = asyncio.Queue()
+        
+        async def run(index: int, ingested: IngestedFile) -> None:
+            try:
+                async with semaphore:
+                    file_started = time.perf_counter()
+                    try:
+                        record = await self.extract_text(ingested)
+                    except HTTPException as e:
+                        record = {"success": False, "status_code": e.status_code, "message": e.detail}
+                    except Exception as e:
+                        # A failing file must never abort the rest of the batch
+                        logger.error(f"Batch extraction failed for {ingested.filename}: {str(e)}")
+                        record = {"success": False, "status_code": 500, "message": "Failed to extract text"}
+                    record["elapsed_ms"] = round((time.perf_counter() - file_started) * 1000, 2)
+                    if ingested.document is not None:
+                        record["document"] = ingested.document
+            finally:
+                ingested.close()
+            await finished.put({"type": "result", "index": index, "filename": ingested.filename, **record})
+        
+        tasks = [asyncio.create_task(run(index, ingested)) for index, ingested in files]
+        results = [{"type": "result", **record} for record in rejected or []]
         try:
-            # Open image
-            image = Image.open(io.BytesIO(content))
-            
-            # Convert to RGB if necessary
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
-            
-            # Perform OCR
-            text = pytesseract.image_to_string(image, lang='eng')
-            
-            return text
-            
-        except Exception as e:
-            logger.error(f"Image OCR extraction error: {str(e)}")
-            # If OCR fails, return a helpful message instead of raising an error
-            return "[OCR extraction failed - please ensure Tesseract is installed and configured]"
+            for record in results:
+                yield record
+            for _ in tasks:
+                record = await finished.get()
+                results.append(record)
+                yield record
+        finally:
+            # Stop outstanding work if the client goes away
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        
+        file_times = [record["elapsed_ms"] for record in results if "elapsed_ms" in record]
+        yield {
+            "type": "summary",
+            "total": len(results),
+            "succeeded": sum(1 for record in results if record.get("success")),
+            "failed": sum(1 for record in results if not record.get("success")),
+            "cached": sum(1 for record in results if record.get("cached")),
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+            "file_elapsed_ms_total": round(sum(file_times), 2),
+            "file_elapsed_ms_max": max(file_times, default=0)
+        }
+    
+    def cost_class(self, filename: str | None) -> str | None:
+        """Get the cost class of the extractor for a filename, or None if unsupported"""
+        extension = filename.split('.')[-1].lower() if filename else ''
+        plugin = self.registry.get(extension)
+        return plugin.cost if plugin is not None else None
+    
+    def get_cache_stats(self) -> dict[str, any] | None:
+        """Get extraction cache hit/miss statistics"""
+        return extraction_cache.stats() if extraction_cache is not None else None
     
     def get_supported_formats(self) -> list:
         """Get list of supported file formats"""
-        return list(self.supported_formats.keys())
+        return [extension for extension in self.registry.extensions() if extension in settings.ALLOWED_FILE_TYPES]
     
     async def validate_text_content(self, text: str) -> dict[str, any]:
         """Validate extracted text content for question generation"""
@@ -194,10 +388,10 @@ class TextExtractionService:
                 "reason": "Text too short for meaningful question generation (minimum 50 words)"
             }
         
-        if word_count > 10000:
+        if word_count > settings.MAX_SOURCE_WORDS:
             return {
                 "valid": False,
-                "reason": "Text too long for processing (maximum 10,000 words)"
+                "reason": f"Text too long for processing (maximum {settings.MAX_SOURCE_WORDS:,} words)"
             }
         
         return {
@@ -207,4 +401,4 @@ class TextExtractionService:
         }
 
 # Create service instance
-text_extraction_service = TextExtractionService()
\ No newline at end of file
+text_extraction_service = TextExtractionService(extractor_registry)
\ No newline at end of file
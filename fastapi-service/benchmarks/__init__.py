@@ -0,0 +1 @@
+# Benchmarks for the SkillScore FastAPI service
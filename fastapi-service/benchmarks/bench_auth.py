@@ -0,0 +1,82 @@
+"""Measure authenticated-request throughput with local vs. remote JWT verification.
+
+Remote verification runs against a local Supabase Auth stub with simulated latency.
+Run from the fastapi-service directory:
+    python -m benchmarks.bench_auth
+"""
+import argparse
+import asyncio
+import os
+import time
+import jwt
+from benchmarks.common import write_results
+from benchmarks.stubs import run_stub_server, supabase_auth_stub
+
+SECRET = "benchmark-secret-benchmark-secret-0123"
+
+def make_token(subject: int, issuer: str) -> str:
+    return jwt.encode(
+        {
+            "sub": f"user-{subject}",
+            "aud": "authenticated",
+            "iss": issuer,
+            "email": f"user{subject}@example.com",
+            "exp": int(time.time()) + 3600
+        },
+        SECRET,
+        algorithm="HS256"
+    )
+
+async def run_requests(auth, tokens: list[str], requests: int, concurrency: int) -> dict[str, float]:
+    """Verify tokens round-robin with bounded concurrency, returning throughput"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(index: int) -> None:
+        async with semaphore:
+            await auth.verify_jwt_token(tokens[index % len(tokens)])
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - started
+    return {"requests": requests, "seconds": round(elapsed, 4), "requests_per_second": round(requests / elapsed, 1)}
+
+async def benchmark(args: argparse.Namespace, base_url: str) -> list[dict[str, any]]:
+    os.environ.update({
+        "SUPABASE_URL": base_url,
+        "SUPABASE_ANON_KEY": "anon-key",
+        "JWT_SECRET_KEY": SECRET
+    })
+    from app.core import auth
+    from app.core.config import settings
+
+    # Cold runs use a fresh token per request; warm runs reuse a small set of users
+    unique_tokens = [make_token(i, auth.expected_issuer()) for i in range(args.requests)]
+    user_tokens = unique_tokens[:args.users]
+    results = []
+    for mode in ("remote", "local"):
+        settings.JWT_VERIFICATION_MODE = mode
+        for cached in (False, True):
+            auth.verified_tokens.clear()
+            tokens = user_tokens if cached else unique_tokens
+            if cached:
+                # Prime the claims cache so every request is a hit
+                await run_requests(auth, tokens, len(tokens), args.concurrency)
+            result = await run_requests(auth, tokens, args.requests, args.concurrency)
+            results.append({"mode": mode, "claims_cache": "warm" if cached else "cold", **result})
+    return results
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--users", type=int, default=50, help="Distinct tokens in warm runs")
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated Supabase RTT in seconds")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    with run_stub_server(supabase_auth_stub(args.latency)) as base_url:
+        results = asyncio.run(benchmark(args, base_url))
+    write_results("auth", results, args.output)
+
+if __name__ == "__main__":
+    main()
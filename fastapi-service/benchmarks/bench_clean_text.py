@@ -0,0 +1,56 @@
+"""Compare clean_extracted_text against the previous implementation.
+
+Run from the fastapi-service directory:
+    python -m benchmarks.bench_clean_text
+"""
+import argparse
+import random
+from app.core.utils import clean_extracted_text, truncate_text
+from benchmarks.common import measure, write_results
+
+def legacy_clean_extracted_text(text: str) -> str:
+    """The original split/join + generator implementation"""
+    if not text:
+        return ""
+    text = ' '.join(text.split())
+    text = ''.join(char for char in text if ord(char) >= 32 or char in '\n\t')
+    text = truncate_text(text)
+    return text.strip()
+
+def make_document(chars: int, seed: int = 0) -> str:
+    """Generate extractor-like text: wrapped lines, paragraphs and stray control characters"""
+    rng = random.Random(seed)
+    words = ["learning", "photosynthesis", "the", "of", "cell", "energy", "and",
+             "membrane", "protein", "a", "chapter", "x\x0c", "result", "data\x00"]
+    parts = []
+    size = 0
+    while size < chars:
+        line = ' '.join(rng.choice(words) for _ in range(rng.randint(6, 14)))
+        line += rng.choice(["\n", "\n", "  \n", "\n\n", "\r\n", "\t\n"])
+        parts.append(line)
+        size += len(line)
+    return ''.join(parts)[:chars]
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 50_000, 200_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        text = make_document(size)
+        legacy = measure(lambda: legacy_clean_extracted_text(text), repeat=args.repeat)
+        current = measure(lambda: clean_extracted_text(text), repeat=args.repeat)
+        results.append({
+            "chars": size,
+            "legacy": legacy,
+            "current": current,
+            "speedup": round(legacy["median_ms"] / current["median_ms"], 2)
+        })
+
+    write_results("clean_text", results, args.output)
+
+if __name__ == "__main__":
+    main()
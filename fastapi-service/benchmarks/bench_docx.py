@@ -0,0 +1,87 @@
+"""Compare the streaming DOCX extractor against the python-docx object model.
+
+Run from the fastapi-service directory:
+    python -m benchmarks.bench_docx
+"""
+import argparse
+import io
+import random
+from docx import Document
+from app.core.config import settings
+from app.core.utils import clean_extracted_text
+from app.services.extractors import extract_docx_text
+from benchmarks.common import measure, write_results
+from benchmarks.corpus import SIZE_PRESETS, WORDS, make_docx
+
+def legacy_extract_docx_text(content: bytes, max_chars: int) -> str:
+    """The original implementation: every paragraph, then every table row through row.cells"""
+    doc = Document(io.BytesIO(content))
+    text_parts = [paragraph.text for paragraph in doc.paragraphs if paragraph.text.strip()]
+    for table in doc.tables:
+        for row in table.rows:
+            row_text = [cell.text.strip() for cell in row.cells if cell.text.strip()]
+            if row_text:
+                text_parts.append(' | '.join(row_text))
+    return clean_extracted_text('\n\n'.join(text_parts), max_chars)
+
+def streaming_extract_docx_text(content: bytes, max_chars: int) -> str:
+    """The streaming extractor followed by the same cleaning the extraction service applies"""
+    return clean_extracted_text(extract_docx_text(content, max_chars), max_chars)
+
+def make_table_docx(rows: int, columns: int = 6, seed: int = 0) -> bytes:
+    """A syllabus-like schedule: one table per 50 rows, merged header cells and merged week cells"""
+    rng = random.Random(seed)
+    document = Document()
+    for start in range(0, rows, 50):
+        document.add_heading(f"Weeks {start // 4 + 1}+", level=2)
+        table = document.add_table(rows=min(50, rows - start) + 1, cols=columns)
+        grid = [row.cells for row in table.rows]
+        for column in range(0, columns - 1, 2):
+            grid[0][column].merge(grid[0][column + 1]).text = f"{rng.choice(WORDS)} {column}".title()
+        for index in range(1, len(grid)):
+            for column in range(1, columns):
+                grid[index][column].text = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(2, 8)))
+        for index in range(1, len(grid), 4):
+            grid[index][0].merge(grid[min(index + 3, len(grid) - 1)][0]).text = f"Week {(start + index) // 4 + 1}"
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", nargs="+", default=["small", "medium", "large"], choices=list(SIZE_PRESETS))
+    parser.add_argument("--table-rows", type=int, nargs="+", default=[200, 1000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    documents = [("prose", size, make_docx(SIZE_PRESETS[size])) for size in args.sizes]
+    documents += [("tables", f"{rows}-rows", make_table_docx(rows)) for rows in args.table_rows]
+
+    results = []
+    for kind, size, content in documents:
+        # Without a budget both read the whole document
+        unbounded = len(content) * 4
+        legacy_text = legacy_extract_docx_text(content, unbounded)
+        streaming_text = streaming_extract_docx_text(content, unbounded)
+        legacy = measure(lambda: legacy_extract_docx_text(content, unbounded), repeat=args.repeat)
+        streaming = measure(lambda: streaming_extract_docx_text(content, unbounded), repeat=args.repeat)
+        budgeted = measure(lambda: streaming_extract_docx_text(content, settings.MAX_TEXT_LENGTH), repeat=args.repeat)
+        results.append({
+            "kind": kind,
+            "size": size,
+            "bytes": len(content),
+            "legacy_chars": len(legacy_text),
+            # Fewer on tables, where merged cells are no longer repeated
+            "streaming_chars": len(streaming_text),
+            "legacy": legacy,
+            "streaming": streaming,
+            "budgeted": budgeted,
+            "speedup": round(legacy["median_ms"] / streaming["median_ms"], 2),
+            "budgeted_speedup": round(legacy["median_ms"] / budgeted["median_ms"], 2)
+        })
+
+    write_results("docx", results, args.output)
+
+if __name__ == "__main__":
+    main()
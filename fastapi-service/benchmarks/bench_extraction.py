@@ -0,0 +1,111 @@
+"""Micro-benchmark the text extraction hot path on synthetic corpora.
+
+Covers every TextExtractionService method, clean_extracted_text and
+generate_file_hash. The extraction cache is disabled so every call extracts.
+Image formats need the tesseract binary and are skipped without it.
+Run from the fastapi-service directory:
+    python -m benchmarks.bench_extraction
+"""
+import argparse
+import asyncio
+import io
+import os
+from benchmarks.common import measure, write_results
+from benchmarks.corpus import FORMATS, SIZE_PRESETS, build_corpus, make_paragraphs
+
+def tesseract_available() -> bool:
+    import pytesseract
+    try:
+        pytesseract.get_tesseract_version()
+        return True
+    except Exception:
+        return False
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--formats", nargs="+", default=list(FORMATS), choices=FORMATS)
+    parser.add_argument("--sizes", nargs="+", default=list(SIZE_PRESETS), choices=list(SIZE_PRESETS))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    # Settings are read at import time
+    os.environ["EXTRACTION_CACHE_ENABLED"] = "false"
+    from fastapi import UploadFile
+    from app.core.executors import extraction_executor
+    from app.core.ingest import ingest_upload
+    from app.core.utils import clean_extracted_text, generate_file_hash
+    from app.services.extractors import warm_worker
+    from app.services.text_extraction import text_extraction_service
+
+    formats = args.formats
+    if "png" in formats and not tesseract_available():
+        print("tesseract is not available; skipping png")
+        formats = [file_format for file_format in formats if file_format != "png"]
+    corpus = build_corpus(formats, args.sizes, args.seed)
+
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(extraction_executor.warm_up(warm_worker))
+
+    def upload(filename: str, content: bytes) -> UploadFile:
+        return UploadFile(file=io.BytesIO(content), filename=filename)
+
+    async def extract_batch(files: list[tuple[str, bytes]]) -> None:
+        ingested = [(index, await ingest_upload(upload(*file))) for index, file in enumerate(files)]
+        async for _ in text_extraction_service.extract_batch(ingested):
+            pass
+
+    results = []
+    try:
+        for file_format, size, filename, content in corpus:
+            results.append({
+                "method": "extract_text",
+                "format": file_format,
+                "size": size,
+                "bytes": len(content),
+                **measure(
+                    lambda: loop.run_until_complete(text_extraction_service.extract_text(upload(filename, content))),
+                    repeat=args.repeat
+                )
+            })
+
+        for size in args.sizes:
+            files = [(filename, content) for _, file_size, filename, content in corpus if file_size == size]
+            results.append({
+                "method": "extract_batch",
+                "size": size,
+                "files": len(files),
+                **measure(lambda: loop.run_until_complete(extract_batch(files)), repeat=args.repeat)
+            })
+
+        for size in args.sizes:
+            text = '\n\n'.join(make_paragraphs(SIZE_PRESETS[size], args.seed))
+            # Raw extractor output: ragged whitespace and control characters
+            raw = text.replace('. ', '.  \t').replace('\n\n', ' \n \n\x0c')
+            data = raw.encode()
+            results.extend([
+                {
+                    "method": "validate_text_content",
+                    "size": size,
+                    **measure(
+                        lambda: loop.run_until_complete(text_extraction_service.validate_text_content(text)),
+                        repeat=args.repeat
+                    )
+                },
+                {"method": "clean_extracted_text", "size": size, **measure(lambda: clean_extracted_text(raw), repeat=args.repeat)},
+                {"method": "generate_file_hash", "size": size, **measure(lambda: generate_file_hash(data), repeat=args.repeat)},
+            ])
+
+        results.append({
+            "method": "get_supported_formats",
+            **measure(text_extraction_service.get_supported_formats, repeat=args.repeat, number=1000)
+        })
+    finally:
+        extraction_executor.shutdown()
+        loop.close()
+
+    write_results("extraction", results, args.output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""Grade a class's quiz submissions: batched grading vs. one upstream call per short answer.
+
+Requests go through the real answers router and JWT auth over an ASGI
+transport, with Gemini replaced by the local stub, which grades by word
+overlap. The per-answer baseline sends each short answer on its own, one
+after another, as a client calling the model per answer would.
+Run from the fastapi-service directory:
+    python -m benchmarks.bench_grading
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+import httpx
+from benchmarks.bench_auth import SECRET, make_token
+from benchmarks.common import measure, write_results
+from benchmarks.corpus import WORDS
+from benchmarks.stubs import gemini_stub, run_stub_server
+
+# Question mix of the quiz
+QUIZ = {"mcq": 10, "true_false": 5, "fill_blank": 5, "short_answer": 5}
+
+# How students answer short answer questions, with their share of the class
+SHORT_ANSWER_KINDS = (("full", 0.35), ("partial", 0.3), ("vague", 0.15), ("wrong", 0.15), ("blank", 0.05))
+
+def make_quiz(seed: int = 0) -> list[dict[str, any]]:
+    rng = random.Random(seed)
+    questions = []
+    for question_type, count in QUIZ.items():
+        for i in range(count):
+            question = {"type": question_type, "question": f"{question_type} question {i + 1}?", "explanation": "Explanation"}
+            if question_type == "mcq":
+                question.update(options=[' '.join(rng.sample(WORDS, 2)) for _ in range(4)], correctAnswer=rng.randrange(4))
+            elif question_type == "true_false":
+                question["answer"] = rng.random() < 0.5
+            elif question_type == "fill_blank":
+                question.update(answer=rng.choice(WORDS), alternatives=[])
+            else:
+                key_points = [' '.join(rng.sample(WORDS, 3)) for _ in range(3)]
+                question.update(answer=' and '.join(key_points), keyPoints=key_points)
+            questions.append(question)
+    return questions
+
+def make_answer(question: dict[str, any], rng: random.Random) -> any:
+    """A plausible student answer: mostly right for objective questions, of varying quality otherwise"""
+    question_type = question["type"]
+    if question_type == "mcq":
+        return question["correctAnswer"] if rng.random() < 0.7 else rng.randrange(4)
+    if question_type == "true_false":
+        return question["answer"] if rng.random() < 0.8 else not question["answer"]
+    if question_type == "fill_blank":
+        answer = question["answer"]
+        # Some misspell it by swapping the last two letters
+        return answer if rng.random() < 0.7 else answer[:-2] + answer[-1] + answer[-2]
+
+    kind = rng.choices([kind for kind, _ in SHORT_ANSWER_KINDS], [share for _, share in SHORT_ANSWER_KINDS])[0]
+    filler = rng.sample(WORDS, 4)
+    if kind == "full":
+        return ' '.join(question["keyPoints"] + filler[:2])
+    if kind == "partial":
+        return ' '.join(question["keyPoints"][:rng.randint(1, 2)] + filler)
+    if kind == "vague":
+        return ' '.join(question["keyPoints"][0].split()[:2] + filler)
+    if kind == "wrong":
+        return ' '.join(filler)
+    return ""
+
+def make_class(questions: list[dict[str, any]], students: int, seed: int = 0) -> list[dict[str, any]]:
+    rng = random.Random(seed)
+    return [
+        {"student_id": f"student-{student}", "answers": [make_answer(question, rng) for question in questions]}
+        for student in range(students)
+    ]
+
+async def benchmark(args: argparse.Namespace, stub: any, gemini_url: str) -> list[dict[str, any]]:
+    # Settings are read at import time
+    os.environ.update({
+        "JWT_SECRET_KEY": SECRET,
+        "JWT_VERIFICATION_MODE": "local",
+        "GEMINI_BASE_URL": gemini_url,
+        "GEMINI_API_KEY": "stub-key",
+        "ADMISSION_ENABLED": "false",
+    })
+    from fastapi import FastAPI
+    from app.core.clients import close_clients
+    from app.routes import answers
+    from app.services.grading import answer_grading_service
+
+    app = FastAPI()
+    app.include_router(answers.router, prefix="/api/v1/answers")
+    headers = {"Authorization": f"Bearer {make_token(0)}"}
+    questions = make_quiz()
+    references = [answer_grading_service.reference(question) for question in questions]
+
+    results = []
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://service", timeout=None) as client:
+            for students in args.students:
+                submissions = make_class(questions, students, seed=students)
+                answer_sets = [submission["answers"] for submission in submissions]
+
+                # The baseline: every non-empty short answer graded by its own upstream call, in turn
+                calls_before = stub.state.calls
+                started = time.perf_counter()
+                for answer_set in answer_sets:
+                    for reference, answer in zip(references, answer_set):
+                        if reference["type"] == "short_answer" and answer:
+                            await answer_grading_service._grade_batch([(0, reference, answer)])
+                per_answer_ms = (time.perf_counter() - started) * 1000
+                results.append({
+                    "students": students,
+                    "approach": "per_answer",
+                    "elapsed_ms": {"total": round(per_answer_ms, 1)},
+                    "upstream": {"calls": stub.state.calls - calls_before}
+                })
+
+                # Cold verdict cache, then a regrade of the same class served from it
+                answer_grading_service.verdicts.clear()
+                for approach in ("batched", "batched_cached"):
+                    calls_before = stub.state.calls
+                    graded_before = stub.state.graded
+                    started = time.perf_counter()
+                    response = await client.post(
+                        "/api/v1/answers/evaluate",
+                        json={"questions": questions, "submissions": submissions},
+                        headers=headers
+                    )
+                    elapsed_ms = (time.perf_counter() - started) * 1000
+                    response.raise_for_status()
+                    summary = response.json()["data"]["summary"]
+                    results.append({
+                        "students": students,
+                        "approach": approach,
+                        "elapsed_ms": {"total": round(elapsed_ms, 1)},
+                        "upstream": {
+                            "calls": stub.state.calls - calls_before,
+                            "answers_sent": stub.state.graded - graded_before
+                        },
+                        "answers": {
+                            "total": summary["answers"],
+                            "graded_locally": summary["graded_locally"],
+                            "graded_by_model": summary["graded_by_model"],
+                            "model_cache_hits": summary["model_cache_hits"]
+                        },
+                        "speedup": round(per_answer_ms / elapsed_ms, 1)
+                    })
+
+                # Scoring without the model, the part that runs for every answer
+                results[-1]["local_scoring"] = measure(
+                    lambda: answer_grading_service._grade_locally(references, answer_sets), repeat=args.repeat
+                )
+    finally:
+        await close_clients()
+    return results
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--students", type=int, nargs="+", default=[1, 30, 100])
+    parser.add_argument("--gemini-latency", type=float, default=0.05, help="Simulated grading time in seconds")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    stub = gemini_stub(args.gemini_latency)
+    with run_stub_server(stub) as gemini_url:
+        results = asyncio.run(benchmark(args, stub, gemini_url))
+    write_results("grading", results, args.output)
+
+if __name__ == "__main__":
+    main()
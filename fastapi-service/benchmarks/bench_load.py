@@ -0,0 +1,158 @@
+"""In-process ASGI load test of the upload (or question generation) endpoint.
+
+Requests go through the real routers, middleware and JWT auth over an ASGI
+transport, so no sockets are involved on the service side. Supabase Auth and
+Gemini are local stubs with simulated latency. The extraction cache is off
+unless --cache is given, so every upload is extracted, and admission control
+is off unless --admission is given.
+Run from the fastapi-service directory:
+    python -m benchmarks.bench_load
+    python -m benchmarks.bench_load --endpoint questions --auth remote
+"""
+import argparse
+import asyncio
+import collections
+import itertools
+import os
+import statistics
+import time
+import httpx
+from benchmarks.bench_auth import SECRET, make_token
+from benchmarks.common import write_results
+from benchmarks.corpus import SIZE_PRESETS, make_file, make_paragraphs
+from benchmarks.stubs import gemini_stub, run_stub_server, supabase_auth_stub
+
+def build_app() -> any:
+    """The upload and question routers behind the middleware main.py installs"""
+    from fastapi import FastAPI
+    from app.core.metrics import RequestContextMiddleware
+    from app.routes import questions, upload
+
+    app = FastAPI()
+    app.add_middleware(RequestContextMiddleware)
+    app.include_router(upload.router, prefix="/api/v1/upload")
+    app.include_router(questions.router, prefix="/api/v1/questions")
+    return app
+
+def stage_totals() -> dict[str, tuple[float, int]]:
+    """Total seconds and count per stage recorded so far, across file types and sizes"""
+    from app.core.metrics import STAGE_SECONDS
+    totals = collections.defaultdict(lambda: (0.0, 0))
+    for (stage, _, _), child in STAGE_SECONDS.children().items():
+        seconds, count = totals[stage]
+        totals[stage] = (seconds + child.sum, count + child.count)
+    return totals
+
+async def run_level(send, requests: int, concurrency: int) -> dict[str, any]:
+    """Send requests from concurrency closed-loop clients, returning latency percentiles"""
+    latencies = []
+    statuses = collections.Counter()
+    indexes = iter(range(requests))
+
+    async def client() -> None:
+        for index in indexes:
+            started = time.perf_counter()
+            status = await send(index)
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses[str(status)] += 1
+
+    before = stage_totals()
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    after = stage_totals()
+
+    # Mean time per stage in this level, from the service's own metrics
+    stages_ms = {}
+    for stage, (seconds, count) in after.items():
+        seconds_before, count_before = before.get(stage, (0.0, 0))
+        if count > count_before:
+            stages_ms[stage] = round((seconds - seconds_before) / (count - count_before) * 1000, 3)
+
+    percentiles = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else latencies * 99
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "statuses": dict(statuses),
+        "error_rate": round(1 - statuses.get("200", 0) / requests, 4),
+        "requests_per_second": round(requests / elapsed, 1),
+        "p50_ms": round(percentiles[49], 2),
+        "p95_ms": round(percentiles[94], 2),
+        "p99_ms": round(percentiles[98], 2),
+        "max_ms": round(max(latencies), 2),
+        "stages_ms": stages_ms
+    }
+
+async def benchmark(args: argparse.Namespace, supabase_url: str, gemini_url: str) -> list[dict[str, any]]:
+    # Settings are read at import time
+    os.environ.update({
+        "SUPABASE_URL": supabase_url,
+        "SUPABASE_ANON_KEY": "anon-key",
+        "JWT_SECRET_KEY": SECRET,
+        "JWT_VERIFICATION_MODE": args.auth,
+        "GEMINI_BASE_URL": gemini_url,
+        "GEMINI_API_KEY": "stub-key",
+        "EXTRACTION_CACHE_ENABLED": "true" if args.cache else "false",
+        # Measure the service itself, not the per-user rate limits
+        "ADMISSION_ENABLED": "true" if args.admission else "false",
+    })
+    from app.core.clients import close_clients
+    from app.core.executors import extraction_executor
+    from app.services.extractors import warm_worker
+
+    await extraction_executor.warm_up(warm_worker)
+    tokens = [make_token(user) for user in range(args.users)]
+    files = [make_file(file_format, args.size) for file_format in args.formats]
+    source = '\n\n'.join(make_paragraphs(SIZE_PRESETS[args.size]))
+    sequence = itertools.count()
+
+    transport = httpx.ASGITransport(app=build_app())
+    results = []
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://service", timeout=None) as client:
+            async def send(index: int) -> int:
+                headers = {"Authorization": f"Bearer {tokens[index % len(tokens)]}"}
+                if args.endpoint == "upload":
+                    filename, content = files[index % len(files)]
+                    response = await client.post("/api/v1/upload/file", files={"file": (filename, content)}, headers=headers)
+                else:
+                    # Distinct texts, across levels too, so requests are neither cached nor coalesced
+                    response = await client.post(
+                        "/api/v1/questions/generate",
+                        json={"text": f"{source}\n\nRequest {next(sequence)}.", "count": 3},
+                        headers=headers
+                    )
+                return response.status_code
+
+            await run_level(send, len(files), 1)  # Warm up lazy imports and connections
+            for concurrency in args.concurrency:
+                level = await run_level(send, args.requests, concurrency)
+                results.append({"endpoint": args.endpoint, "size": args.size, "auth": args.auth, **level})
+    finally:
+        await close_clients()
+        extraction_executor.shutdown()
+    return results
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--endpoint", choices=["upload", "questions"], default="upload")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--requests", type=int, default=200, help="Requests per concurrency level")
+    parser.add_argument("--formats", nargs="+", default=["txt", "docx", "pdf"], help="Upload mix")
+    parser.add_argument("--size", choices=list(SIZE_PRESETS), default="small")
+    parser.add_argument("--auth", choices=["local", "remote"], default="local")
+    parser.add_argument("--users", type=int, default=50, help="Distinct tokens sending requests")
+    parser.add_argument("--cache", action="store_true", help="Keep the extraction cache on")
+    parser.add_argument("--admission", action="store_true", help="Keep rate limits and concurrency limits on")
+    parser.add_argument("--supabase-latency", type=float, default=0.05, help="Simulated Supabase RTT in seconds")
+    parser.add_argument("--gemini-latency", type=float, default=0.5, help="Simulated generation time in seconds")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    with run_stub_server(supabase_auth_stub(args.supabase_latency)) as supabase_url, \
+            run_stub_server(gemini_stub(args.gemini_latency)) as gemini_url:
+        results = asyncio.run(benchmark(args, supabase_url, gemini_url))
+    write_results(f"load_{args.endpoint}", results, args.output)
+
+if __name__ == "__main__":
+    main()
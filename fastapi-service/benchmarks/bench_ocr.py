@@ -0,0 +1,94 @@
+"""Compare the OCR engine against the previous full-resolution pytesseract call.
+
+Needs the tesseract binary. Run from the fastapi-service directory:
+    python -m benchmarks.bench_ocr
+"""
+import argparse
+import asyncio
+import io
+import re
+import sys
+from PIL import Image, ImageDraw, ImageFont
+import pytesseract
+from app.core.executors import extraction_executor
+from app.services.extractors import warm_worker
+from app.services.ocr import ocr_engine
+from benchmarks.common import measure, write_results
+
+SENTENCE = "The mitochondria produce most of the chemical energy needed to power the cell"
+
+def legacy_extract_image_text(content: bytes) -> str:
+    """The original implementation: RGB conversion and one tesseract call at full resolution"""
+    image = Image.open(io.BytesIO(content))
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    return pytesseract.image_to_string(image, lang='eng')
+
+def make_photo(width: int, height: int, dpi: int) -> tuple[bytes, list[str]]:
+    """Render lines of text on a slightly uneven background, like a phone photo of a page"""
+    image = Image.new("RGB", (width, height), (236, 232, 220))
+    draw = ImageDraw.Draw(image)
+    font_size = max(12, height // 70)
+    font = ImageFont.load_default(size=font_size)
+    lines = []
+    y = font_size * 2
+    while y < height - font_size * 2:
+        line = f"{len(lines) + 1}. {SENTENCE}"
+        draw.text((width // 20, y), line, fill=(30, 30, 40), font=font)
+        lines.append(line)
+        y += int(font_size * 1.8)
+    # Simulate lighting falling off across the page
+    shade = Image.linear_gradient("L").resize((width, height)).point(lambda value: value // 6)
+    image = Image.composite(Image.new("RGB", image.size, (200, 195, 185)), image, shade)
+
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=90, dpi=(dpi, dpi))
+    return buffer.getvalue(), lines
+
+def word_recall(text: str, lines: list[str]) -> float:
+    """Share of expected words found in the OCR output"""
+    expected = re.findall(r'\w+', ' '.join(lines).lower())
+    found = set(re.findall(r'\w+', text.lower()))
+    return round(sum(word in found for word in expected) / len(expected), 4)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", nargs="+", default=["1600x1200", "3024x4032", "4000x3000"])
+    parser.add_argument("--dpi", type=int, default=600)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    try:
+        pytesseract.get_tesseract_version()
+    except Exception as e:
+        sys.exit(f"tesseract is not available: {str(e)}")
+
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(extraction_executor.warm_up(warm_worker))
+
+    results = []
+    try:
+        for size in args.sizes:
+            width, height = (int(value) for value in size.split("x"))
+            content, lines = make_photo(width, height, args.dpi)
+            legacy_text = legacy_extract_image_text(content)
+            engine_text = loop.run_until_complete(ocr_engine.extract(content))["text"]
+            results.append({
+                "size": size,
+                "legacy": measure(lambda: legacy_extract_image_text(content), repeat=args.repeat),
+                "engine": measure(lambda: loop.run_until_complete(ocr_engine.extract(content)), repeat=args.repeat),
+                "legacy_recall": word_recall(legacy_text, lines),
+                "engine_recall": word_recall(engine_text, lines)
+            })
+            results[-1]["speedup"] = round(
+                results[-1]["legacy"]["median_ms"] / results[-1]["engine"]["median_ms"], 2
+            )
+    finally:
+        extraction_executor.shutdown()
+        loop.close()
+
+    write_results("ocr", results, args.output)
+
+if __name__ == "__main__":
+    main()
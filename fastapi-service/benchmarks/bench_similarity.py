@@ -0,0 +1,107 @@
+"""Near-duplicate index: signature time, lookup latency, memory use and match quality.
+
+Fills an in-memory index with synthetic documents, then queries it with
+noisy copies of indexed documents (as OCR or a format conversion would
+produce) and with unrelated documents. Run from the fastapi-service directory:
+    python -m benchmarks.bench_similarity
+"""
+import argparse
+import random
+import statistics
+import time
+import tracemalloc
+from app.core.config import settings
+from app.services.similarity import SimilarityIndex
+from benchmarks.common import measure, write_results
+from benchmarks.corpus import make_paragraphs
+
+def make_noisy(text: str, rate: float, seed: int = 0) -> str:
+    """Misspell or drop about rate of the words"""
+    rng = random.Random(seed)
+    words = []
+    for word in text.split():
+        roll = rng.random()
+        if roll < rate / 2:
+            continue
+        words.append(word[:-1] + 'x' if roll < rate else word)
+    return ' '.join(words)
+
+def create_index() -> SimilarityIndex:
+    return SimilarityIndex(
+        path=None,
+        threshold=settings.SIMILARITY_THRESHOLD,
+        shingle_size=settings.SIMILARITY_SHINGLE_SIZE,
+        num_perm=settings.SIMILARITY_PERMUTATIONS,
+        bands=settings.SIMILARITY_BANDS,
+        min_words=settings.SIMILARITY_MIN_WORDS,
+        max_entries=settings.SIMILARITY_MAX_ENTRIES
+    )
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--entries", type=int, nargs="+", default=[1_000, 5_000, 20_000])
+    parser.add_argument("--chars", type=int, default=5_000, help="Text per indexed document")
+    parser.add_argument("--noise", type=float, nargs="+", default=[0.02, 0.05, 0.1])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    text = '\n\n'.join(make_paragraphs(50_000, seed=0))
+    signature_time = measure(lambda: create_index().signature(text), repeat=5)
+
+    results = []
+    for entries in args.entries:
+        index = create_index()
+        # Signatures of distinct documents, built outside the memory measurement
+        documents = {}
+        signatures = []
+        for seed in range(entries):
+            document = '\n\n'.join(make_paragraphs(args.chars, seed=seed))
+            signatures.append((f"doc-{seed}", index.signature(document)))
+            if seed < args.queries:
+                documents[f"doc-{seed}"] = document
+
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        for key, signature in signatures:
+            index.add(key, signature)
+        memory = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+        del signatures
+
+        row = {
+            "entries": entries,
+            # Nested, since top-level integers identify the row in benchmarks.compare
+            "memory": {
+                "bytes": memory,
+                "estimated_bytes": index.stats()["memory_bytes"],
+                "bytes_per_entry": round(memory / entries)
+            }
+        }
+        for noise in args.noise:
+            queries = [(key, index.signature(make_noisy(document, noise, seed=1))) for key, document in documents.items()]
+            latencies = []
+            found = 0
+            for key, signature in queries:
+                started = time.perf_counter()
+                matches = index.query(signature)
+                latencies.append((time.perf_counter() - started) * 1000)
+                found += any(match["key"] == key for match in matches)
+            row[f"noise_{noise}"] = {
+                "recall": round(found / len(queries), 3),
+                "p50_ms": round(statistics.median(latencies), 4),
+                "p95_ms": round(statistics.quantiles(latencies, n=20)[-1], 4)
+            }
+
+        # Documents never indexed should not match anything
+        unrelated = [index.signature('\n\n'.join(make_paragraphs(args.chars, seed=entries + seed))) for seed in range(args.queries)]
+        false_matches = sum(bool(index.query(signature)) for signature in unrelated)
+        row["false_match_rate"] = round(false_matches / len(unrelated), 4)
+        results.append(row)
+
+    for row in results:
+        row["signature_50k_chars"] = signature_time
+    write_results("similarity", results, args.output)
+
+if __name__ == "__main__":
+    main()
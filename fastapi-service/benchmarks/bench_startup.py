@@ -0,0 +1,89 @@
+"""Report cold import time per application module, each measured in a fresh interpreter.
+
+Run from the fastapi-service directory:
+    python -m benchmarks.bench_startup
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from benchmarks.common import write_results
+
+SERVICE_DIR = Path(__file__).resolve().parent.parent
+
+DEFAULT_MODULES = [
+    "app.core.config",
+    "app.core.auth",
+    "app.core.clients",
+    "app.core.metrics",
+    "app.services.text_extraction",
+    "app.services.gemini",
+    "app.services.jobs",
+    "app.routes.upload",
+    "app.routes.questions",
+    "app.routes.jobs",
+    "main",
+]
+
+# Libraries that should only be imported when they are actually needed
+HEAVY_LIBRARIES = ["supabase", "PyPDF2", "docx", "PIL", "pytesseract", "chardet", "structlog"]
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = (time.perf_counter() - started) * 1000
+print(json.dumps({{"elapsed_ms": elapsed, "heavy": [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+def parse_importtime(stderr: str, top: int) -> list[dict[str, any]]:
+    """Get the slowest packages imported along the way from -X importtime output"""
+    packages = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        # A package's own line includes everything it imported; nested packages overlap
+        if '.' not in name and name not in ("app", "main"):
+            packages[name] = max(packages.get(name, 0), int(cumulative))
+    slowest = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+    return [{"package": package, "cumulative_ms": round(us / 1000, 2)} for package, us in slowest]
+
+def measure_import(module: str, repeat: int, top: int) -> dict[str, any]:
+    """Import module in fresh interpreters, returning timings and which heavy libraries it pulled in"""
+    samples = []
+    for _ in range(repeat):
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", PROBE.format(module=module, heavy=HEAVY_LIBRARIES)],
+            cwd=SERVICE_DIR, capture_output=True, text=True
+        )
+        if completed.returncode != 0:
+            error = completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "import failed"
+            return {"module": module, "error": error}
+        samples.append((json.loads(completed.stdout.strip().splitlines()[-1]), completed.stderr))
+
+    elapsed = [probe["elapsed_ms"] for probe, _ in samples]
+    probe, stderr = samples[-1]
+    return {
+        "module": module,
+        "median_ms": round(statistics.median(elapsed), 2),
+        "min_ms": round(min(elapsed), 2),
+        "heavy_libraries": probe["heavy"],
+        "slowest_packages": parse_importtime(stderr, top)
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--modules", nargs="+", default=DEFAULT_MODULES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=5, help="Slowest packages listed per module")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    results = [measure_import(module, args.repeat, args.top) for module in args.modules]
+    write_results("startup", results, args.output)
+
+if __name__ == "__main__":
+    main()
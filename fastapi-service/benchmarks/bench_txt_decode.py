@@ -0,0 +1,83 @@
+"""Compare the tiered TXT decoder against whole-file chardet detection.
+
+Run from the fastapi-service directory:
+    python -m benchmarks.bench_txt_decode
+"""
+import argparse
+import random
+import chardet
+from app.core.utils import clean_extracted_text
+from app.services.extractors import extract_txt_text
+from benchmarks.common import measure, write_results
+
+def legacy_extract_txt_text(content: bytes) -> str:
+    """The original implementation: chardet over the whole file, a decode chain, then cleaning"""
+    return clean_extracted_text(legacy_decode(content))
+
+def tiered_extract_txt_text(content: bytes) -> str:
+    """The tiered decoder followed by the same cleaning the extraction service applies"""
+    return clean_extracted_text(extract_txt_text(content)["text"])
+
+def legacy_decode(content: bytes) -> str:
+    """Detect with chardet over the whole file and try each candidate encoding"""
+    detected = chardet.detect(content)
+    encoding = detected.get('encoding', 'utf-8')
+    for enc in [encoding, 'utf-8', 'latin-1', 'cp1252']:
+        try:
+            if enc:
+                return content.decode(enc)
+        except (UnicodeDecodeError, LookupError):
+            continue
+    return content.decode('utf-8', errors='replace')
+
+# Words encodable in every corpus encoding; cp1252 adds its typographic punctuation
+WORDS = ["the", "cell", "energy", "café", "résumé", "naïve", "über", "façade", "année", "señor",
+         "membrane", "protein", "chapter", "data", "learning", "théorie"]
+CP1252_WORDS = ["“quoted”", "it’s", "—", "…", "€5"]
+
+def make_corpus(size: int, encoding: str, seed: int = 0) -> bytes:
+    """Generate prose-like text of about size bytes in the given encoding"""
+    rng = random.Random(seed)
+    words = WORDS + (CP1252_WORDS if encoding in ("cp1252", "utf-8") else [])
+    parts = []
+    length = 0
+    while length < size:
+        sentence = ' '.join(rng.choice(words) for _ in range(rng.randint(6, 16))).capitalize() + ". "
+        if rng.random() < 0.1:
+            sentence += "\n\n"
+        parts.append(sentence)
+        length += len(sentence)
+    return ''.join(parts).encode(encoding)[:size]
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000, 4_000_000])
+    parser.add_argument("--encodings", nargs="+", default=["utf-8", "latin-1", "cp1252"])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    results = []
+    for encoding in args.encodings:
+        for size in args.sizes:
+            content = make_corpus(size, encoding)
+            expected = content.decode(encoding, errors="ignore")
+            decoded = extract_txt_text(content, max_chars=len(expected) + 1)
+            legacy = measure(lambda: legacy_extract_txt_text(content), repeat=args.repeat)
+            tiered = measure(lambda: tiered_extract_txt_text(content), repeat=args.repeat)
+            results.append({
+                "encoding": encoding,
+                "bytes": size,
+                "legacy_detected": (chardet.detect(content).get("encoding") or "").lower(),
+                "decoded_as": decoded["encoding"],
+                # Whether decoding the whole file gives the same text as the true encoding
+                "correct": decoded["text"] == expected,
+                "legacy": legacy,
+                "tiered": tiered,
+                "speedup": round(legacy["median_ms"] / tiered["median_ms"], 2)
+            })
+
+    write_results("txt_decode", results, args.output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import json
+import platform
+import statistics
+import subprocess
+import time
+from pathlib import Path
+from typing import Callable
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+def measure(func: Callable[[], any], repeat: int = 5, number: int = 1) -> dict[str, float]:
+    """Time func, returning per-call statistics in milliseconds"""
+    func()  # Warm up caches and lazy imports
+
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - started) * 1000 / number)
+
+    return {
+        "min_ms": round(min(samples), 4),
+        "median_ms": round(statistics.median(samples), 4),
+        "max_ms": round(max(samples), 4)
+    }
+
+def git_revision() -> str | None:
+    """Get the current commit so results can be compared between commits"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def write_results(name: str, results: list[dict[str, any]], output: str | None = None) -> Path:
+    """Write benchmark results to JSON and print a summary"""
+    path = Path(output) if output else RESULTS_DIR / f"{name}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    report = {
+        "benchmark": name,
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results
+    }
+    path.write_text(json.dumps(report, indent=2))
+
+    for result in results:
+        print(json.dumps(result))
+    print(f"Results written to {path}")
+    return path
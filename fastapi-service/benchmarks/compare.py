@@ -0,0 +1,117 @@
+"""Compare two benchmark runs and flag regressions.
+
+Takes two result files, or two directories of result files (e.g. two
+run_suite outputs). Rows are matched on their string, integer and boolean
+fields. Medians, percentiles, per-stage means and throughput are compared.
+Exits with status 1 when any of them regressed by more than --threshold.
+Run from the fastapi-service directory:
+    python -m benchmarks.compare benchmarks/results/abc1234 benchmarks/results/def5678
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+# Latency fields compared; min/max are too noisy to gate on
+LATENCY_FIELDS = ("median_ms", "p50_ms", "p95_ms", "p99_ms")
+# Containers of per-stage latencies, e.g. {"extract": 12.5}
+LATENCY_GROUPS = ("stages_ms",)
+
+def row_key(row: dict[str, any]) -> tuple:
+    """Identify a row by its configuration rather than its measurements"""
+    return tuple(sorted(
+        (name, value) for name, value in row.items()
+        if isinstance(value, (str, int, bool))
+    ))
+
+def measurements(row: dict[str, any], prefix: str = "") -> dict[str, tuple[float, bool]]:
+    """Flatten a row to {path: (value, higher_is_better)}"""
+    found = {}
+    for name, value in row.items():
+        path = f"{prefix}{name}"
+        if isinstance(value, dict):
+            if name in LATENCY_GROUPS:
+                found.update({
+                    f"{path}.{stage}": (stage_value, False)
+                    for stage, stage_value in value.items() if isinstance(stage_value, (int, float))
+                })
+            else:
+                found.update(measurements(value, f"{path}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            if name in LATENCY_FIELDS:
+                found[path] = (value, False)
+            elif name.endswith("per_second"):
+                found[path] = (value, True)
+    return found
+
+def load_reports(path: Path) -> dict[str, dict[str, any]]:
+    """Reports by benchmark name from a file or a directory of files"""
+    files = sorted(path.glob("*.json")) if path.is_dir() else [path]
+    reports = {}
+    for file in files:
+        report = json.loads(file.read_text())
+        reports[report.get("benchmark", file.stem)] = report
+    return reports
+
+def compare(old: dict[str, any], new: dict[str, any], threshold: float, min_ms: float) -> list[dict[str, any]]:
+    """Changes between matching rows of two reports of the same benchmark"""
+    old_rows = {row_key(row): row for row in old["results"]}
+    changes = []
+    for row in new["results"]:
+        previous = old_rows.get(row_key(row))
+        if previous is None:
+            continue
+        before = measurements(previous)
+        for path, (value, higher_is_better) in measurements(row).items():
+            if path not in before:
+                continue
+            old_value = before[path][0]
+            if old_value <= 0:
+                continue
+            # Latencies below min_ms are dominated by timer and scheduling noise
+            if not higher_is_better and max(old_value, value) < min_ms:
+                continue
+            change = (value - old_value) / old_value
+            regression = -change if higher_is_better else change
+            changes.append({
+                "row": dict(row_key(row)),
+                "metric": path,
+                "old": old_value,
+                "new": value,
+                "change": round(change, 4),
+                "regressed": regression > threshold,
+                "improved": regression < -threshold
+            })
+    return changes
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("old", type=Path)
+    parser.add_argument("new", type=Path)
+    parser.add_argument("--threshold", type=float, default=0.1, help="Relative change treated as significant")
+    parser.add_argument("--min-ms", type=float, default=1.0, help="Ignore latencies below this")
+    parser.add_argument("--all", action="store_true", help="Also list changes within the threshold")
+    args = parser.parse_args()
+
+    old_reports = load_reports(args.old)
+    new_reports = load_reports(args.new)
+    regressions = 0
+    for name, new in new_reports.items():
+        old = old_reports.get(name)
+        if old is None:
+            print(f"{name}: no baseline")
+            continue
+        print(f"{name}: {old.get('revision')} -> {new.get('revision')}")
+        for change in compare(old, new, args.threshold, args.min_ms):
+            if not (args.all or change["regressed"] or change["improved"]):
+                continue
+            label = "REGRESSED" if change["regressed"] else "improved" if change["improved"] else "unchanged"
+            row = ' '.join(f"{key}={value}" for key, value in change["row"].items())
+            print(f"  {label:9} {change['metric']:<28} {change['old']:>12} -> {change['new']:<12} {change['change']:+.1%}  {row}")
+            regressions += change["regressed"]
+
+    print(f"{regressions} regression(s) above {args.threshold:.0%}")
+    sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""Synthetic upload corpora of controlled sizes, generated deterministically from a seed."""
+import io
+import random
+from PIL import Image, ImageDraw, ImageFont
+
+WORDS = (
+    "cell membrane protein energy mitochondria enzyme reaction gradient transport molecule "
+    "theory evidence analysis model variable function equation derivative integral limit "
+    "history empire trade revolution economy policy treaty population migration culture "
+    "the of and to in is that for as with by on are from this which be an at or"
+).split()
+
+# Approximate amount of text per preset; binary formats are sized to carry about as much
+SIZE_PRESETS = {
+    "small": 10 * 1024,
+    "medium": 200 * 1024,
+    "large": 2 * 1024 * 1024,
+}
+
+# Image dimensions per preset, like a screenshot, a phone photo and a high-res scan
+IMAGE_PRESETS = {
+    "small": (800, 600),
+    "medium": (1600, 1200),
+    "large": (3024, 4032),
+}
+
+FORMATS = ("txt", "docx", "pdf", "png")
+
+def make_paragraphs(chars: int, seed: int = 0) -> list[str]:
+    """Prose-like paragraphs totalling about chars characters"""
+    rng = random.Random(seed)
+    paragraphs = []
+    total = 0
+    while total < chars:
+        sentences = []
+        for _ in range(rng.randint(3, 7)):
+            words = [rng.choice(WORDS) for _ in range(rng.randint(8, 20))]
+            sentences.append(' '.join(words).capitalize() + '.')
+        paragraph = ' '.join(sentences)
+        paragraphs.append(paragraph)
+        total += len(paragraph) + 2
+    return paragraphs
+
+def make_txt(chars: int, encoding: str = "utf-8", seed: int = 0) -> bytes:
+    return '\n\n'.join(make_paragraphs(chars, seed)).encode(encoding)
+
+def make_docx(chars: int, seed: int = 0) -> bytes:
+    """DOCX with headings every few paragraphs and a small table"""
+    from docx import Document
+    document = Document()
+    for index, paragraph in enumerate(make_paragraphs(chars, seed)):
+        if index % 8 == 0:
+            document.add_heading(f"Section {index // 8 + 1}", level=2)
+        document.add_paragraph(paragraph)
+    table = document.add_table(rows=3, cols=3)
+    for row_index, row in enumerate(table.rows):
+        for column_index, cell in enumerate(row.cells):
+            cell.text = f"{WORDS[row_index * 3 + column_index]} {row_index}.{column_index}"
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+def _pdf_escape(text: str) -> str:
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+def make_pdf(chars: int, seed: int = 0, lines_per_page: int = 50, line_length: int = 90) -> bytes:
+    """PDF with a text layer, written by hand so no PDF writer library is needed"""
+    words = ' '.join(make_paragraphs(chars, seed)).split()
+    lines = []
+    current = []
+    for word in words:
+        if current and sum(len(w) + 1 for w in current) + len(word) > line_length:
+            lines.append(' '.join(current))
+            current = []
+        current.append(word)
+    if current:
+        lines.append(' '.join(current))
+    return write_pdf([lines[start:start + lines_per_page] for start in range(0, len(lines), lines_per_page)] or [[]])
+
+def write_pdf(pages: list[list[str]]) -> bytes:
+    """PDF with one page per list of lines; pages without lines have no text layer"""
+    font_number = 3 + 2 * len(pages)
+    objects = [
+        (1, b"<< /Type /Catalog /Pages 2 0 R >>"),
+        (2, ("<< /Type /Pages /Kids [%s] /Count %d >>" % (
+            ' '.join(f"{3 + 2 * i} 0 R" for i in range(len(pages))), len(pages)
+        )).encode()),
+    ]
+    for index, page_lines in enumerate(pages):
+        number = 3 + 2 * index
+        stream = ("BT /F1 10 Tf 40 760 Td 14 TL " + ' '.join(
+            f"({_pdf_escape(line)}) '" for line in page_lines
+        ) + " ET").encode("latin-1")
+        objects.append((number, (
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents %d 0 R "
+            "/Resources << /Font << /F1 %d 0 R >> >> >>" % (number + 1, font_number)
+        ).encode()))
+        objects.append((number + 1, b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream"))
+    objects.append((font_number, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for number, body in objects:
+        offsets[number] = len(out)
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (font_number + 1)
+    for number in range(1, font_number + 1):
+        out += b"%010d 00000 n \n" % offsets[number]
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (font_number + 1, xref)
+    return bytes(out)
+
+def make_png(width: int, height: int, seed: int = 0) -> bytes:
+    """Dark text lines on a light page"""
+    image = Image.new("L", (width, height), 245)
+    draw = ImageDraw.Draw(image)
+    font_size = max(12, height // 60)
+    font = ImageFont.load_default(size=font_size)
+    paragraphs = make_paragraphs(width * height // 2000, seed)
+    words = ' '.join(paragraphs).split()
+    y = font_size * 2
+    index = 0
+    while y < height - font_size * 2 and index < len(words):
+        line = ' '.join(words[index:index + max(4, width // (font_size * 6))])
+        index += max(4, width // (font_size * 6))
+        draw.text((width // 20, y), line, fill=20, font=font)
+        y += int(font_size * 1.6)
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", dpi=(300, 300))
+    return buffer.getvalue()
+
+def make_file(file_format: str, size: str, seed: int = 0) -> tuple[str, bytes]:
+    """Build one upload of a format and size preset, returning (filename, content)"""
+    if file_format == "png":
+        content = make_png(*IMAGE_PRESETS[size], seed=seed)
+    else:
+        builder = {"txt": make_txt, "docx": make_docx, "pdf": make_pdf}[file_format]
+        content = builder(SIZE_PRESETS[size], seed=seed)
+    return f"{size}-{seed}.{file_format}", content
+
+def build_corpus(formats: list[str], sizes: list[str], seed: int = 0) -> list[tuple[str, str, str, bytes]]:
+    """Every format and size combination as (format, size, filename, content)"""
+    return [
+        (file_format, size, *make_file(file_format, size, seed))
+        for file_format in formats
+        for size in sizes
+    ]
@@ -0,0 +1,53 @@
+"""Run the benchmark suite into one directory per commit, for benchmarks.compare.
+
+Each benchmark runs in its own interpreter so imports and settings do not leak
+between them. Run from the fastapi-service directory:
+    python -m benchmarks.run_suite
+    python -m benchmarks.compare benchmarks/results/<old> benchmarks/results/<new>
+"""
+import argparse
+import subprocess
+import sys
+from pathlib import Path
+from benchmarks.common import RESULTS_DIR, git_revision
+
+SERVICE_DIR = Path(__file__).resolve().parent.parent
+
+# name -> module and arguments; "quick" arguments keep a full run to a few minutes
+SUITE = {
+    "extraction": ("benchmarks.bench_extraction", ["--sizes", "small", "medium"], []),
+    "load_upload": ("benchmarks.bench_load", ["--requests", "100"], []),
+    "load_questions": ("benchmarks.bench_load", ["--endpoint", "questions", "--requests", "50", "--concurrency", "1", "16"], ["--endpoint", "questions"]),
+    "clean_text": ("benchmarks.bench_clean_text", [], []),
+    "txt_decode": ("benchmarks.bench_txt_decode", ["--sizes", "100000", "1000000"], []),
+    "docx": ("benchmarks.bench_docx", ["--sizes", "small", "medium", "--table-rows", "200"], []),
+    "similarity": ("benchmarks.bench_similarity", ["--entries", "1000", "5000", "--queries", "100"], []),
+    "grading": ("benchmarks.bench_grading", ["--students", "1", "30"], []),
+    "auth": ("benchmarks.bench_auth", [], []),
+    "startup": ("benchmarks.bench_startup", [], []),
+}
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--only", nargs="+", choices=list(SUITE), help="Benchmarks to run (default: all)")
+    parser.add_argument("--full", action="store_true", help="Use each benchmark's full default workload")
+    parser.add_argument("--output-dir", type=Path, help="Defaults to benchmarks/results/<revision>")
+    args = parser.parse_args()
+
+    output_dir = args.output_dir or RESULTS_DIR / (git_revision() or "working-tree")
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    failed = []
+    for name in args.only or list(SUITE):
+        module, quick_args, full_args = SUITE[name]
+        command = [sys.executable, "-m", module, *(full_args if args.full else quick_args), "--output", str(output_dir / f"{name}.json")]
+        print(f"== {name}: {' '.join(command[1:])}", flush=True)
+        if subprocess.run(command, cwd=SERVICE_DIR).returncode != 0:
+            failed.append(name)
+
+    print(f"Results in {output_dir}")
+    if failed:
+        sys.exit(f"Failed: {', '.join(failed)}")
+
+if __name__ == "__main__":
+    main()
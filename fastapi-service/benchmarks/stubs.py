@@ -0,0 +1,163 @@
+import asyncio
+import hashlib
+import json
+import re
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from typing import AsyncIterator, Iterator
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+@contextmanager
+def run_stub_server(app: Starlette) -> Iterator[str]:
+    """Serve a stub upstream on localhost in a background thread, yielding its base URL"""
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        thread.join()
+
+def supabase_auth_stub(latency: float = 0.05) -> Starlette:
+    """Stub of the Supabase Auth endpoints used by the service"""
+
+    async def get_user(request: Request) -> JSONResponse:
+        await asyncio.sleep(latency)
+        return JSONResponse({
+            "id": "00000000-0000-0000-0000-000000000001",
+            "aud": "authenticated",
+            "email": "student@example.com",
+            "created_at": "2024-01-01T00:00:00Z",
+            "app_metadata": {},
+            "user_metadata": {}
+        })
+
+    async def health(request: Request) -> JSONResponse:
+        return JSONResponse({"name": "GoTrue", "version": "stub"})
+
+    return Starlette(routes=[
+        Route("/auth/v1/user", get_user),
+        Route("/auth/v1/health", health),
+    ])
+
+def gemini_stub(latency: float = 0.2, chunk_size: int = 64) -> Starlette:
+    """Stub of the Gemini generateContent and streamGenerateContent endpoints returning canned questions.
+
+    Grading prompts get a verdict per answer, scored by the share of the model
+    answer's longer words it contains. The number of upstream calls is
+    recorded in app.state.calls, and the answers graded in app.state.graded.
+    Tests can change app.state.latency, make every call fail with
+    app.state.status_code, or replace the model's text with app.state.response_text.
+    """
+
+    def make_question(question_type: str, i: int, source: str) -> dict[str, any]:
+        question = {
+            "type": question_type,
+            "question": f"Stub {question_type} question {i + 1} about {source}?",
+            "explanation": "Stub explanation",
+            "topic": "Stub topic",
+            "difficulty": "medium"
+        }
+        if question_type == "mcq":
+            question.update(options=["Option A", "Option B", "Option C", "Option D"], correctAnswer=i % 4)
+        elif question_type == "true_false":
+            question["answer"] = i % 2 == 0
+        else:
+            question["answer"] = "stub answer"
+        return question
+
+    def make_questions(prompt: str) -> list[dict[str, any]]:
+        # Multi-type prompts list one "- N <label> questions (type "x")" line per type
+        mix = [(t, int(n)) for n, t in re.findall(r'^- (\d+) .+ questions \(type "(\w+)"\)$', prompt, re.MULTILINE)]
+        if not mix:
+            match = re.search(r"Generate (\d+) ", prompt)
+            count = int(match.group(1)) if match else 3
+            if "true/false" in prompt:
+                question_type = "true_false"
+            elif "fill-in-the-blank" in prompt:
+                question_type = "fill_blank"
+            elif "short answer" in prompt:
+                question_type = "short_answer"
+            else:
+                question_type = "mcq"
+            mix = [(question_type, count)]
+        # Tag questions with the source text so different sections get different questions
+        source = hashlib.sha256(prompt.encode()).hexdigest()[:8]
+        return [make_question(question_type, i, source) for question_type, count in mix for i in range(count)]
+
+    def grade_answers(prompt: str) -> list[dict[str, any]]:
+        verdicts = []
+        for question in json.loads(prompt.split("Questions:\n", 1)[1]):
+            expected = {word for word in re.findall(r'\w+', question["model_answer"].lower()) if len(word) > 3}
+            for answer in question["answers"]:
+                words = set(re.findall(r'\w+', answer["answer"].lower()))
+                score = round(len(expected & words) / len(expected), 2) if expected else 0.0
+                verdicts.append({"id": answer["id"], "score": score, "correct": score >= 0.5, "feedback": "Stub feedback"})
+        app.state.graded += len(verdicts)
+        return verdicts
+
+    async def read_prompt(request: Request) -> str:
+        app.state.calls += 1
+        body = await request.json()
+        return body["contents"][0]["parts"][0]["text"]
+
+    def candidate(text: str) -> dict[str, any]:
+        return {"candidates": [{"content": {"parts": [{"text": text}]}}]}
+
+    def failure() -> JSONResponse | None:
+        if app.state.status_code == 200:
+            return None
+        return JSONResponse({"error": {"code": app.state.status_code}}, status_code=app.state.status_code)
+
+    async def generate_content(request: Request) -> JSONResponse:
+        prompt = await read_prompt(request)
+        await asyncio.sleep(app.state.latency)
+        if failed := failure():
+            return failed
+        if app.state.response_text is not None:
+            return JSONResponse(candidate(app.state.response_text))
+        if prompt.startswith("Grade the following student answers"):
+            return JSONResponse(candidate(json.dumps(grade_answers(prompt))))
+        return JSONResponse(candidate(json.dumps(make_questions(prompt))))
+
+    async def stream_generate_content(request: Request) -> StreamingResponse:
+        prompt = await read_prompt(request)
+        if failed := failure():
+            return failed
+        text = app.state.response_text if app.state.response_text is not None else json.dumps(make_questions(prompt))
+        chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+        latency = app.state.latency
+
+        async def events() -> AsyncIterator[str]:
+            # Spread the latency over the chunks, like tokens arriving from the model
+            for chunk in chunks:
+                await asyncio.sleep(latency / len(chunks))
+                yield f"data: {json.dumps(candidate(chunk))}\r\n\r\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    app = Starlette(routes=[
+        Route("/v1beta/models/{model}:generateContent", generate_content, methods=["POST"]),
+        Route("/v1beta/models/{model}:streamGenerateContent", stream_generate_content, methods=["POST"]),
+    ])
+    app.state.calls = 0
+    app.state.graded = 0
+    app.state.latency = latency
+    app.state.status_code = 200
+    app.state.response_text = None
+    return app
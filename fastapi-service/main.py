@@ -1,9 +1,41 @@
-from fastapi import FastAPI, HTTPException
+import logging
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-import uvicorn
-from app.routes import upload, questions, answers
+from fastapi.responses import JSONResponse, PlainTextResponse
+from app.routes import upload, questions, answers, jobs, documents
+from app.core.auth import metrics_auth, validate_supabase_connection
+from app.core.clients import close_clients, warm_up_clients
 from app.core.config import settings
+from app.core.executors import extraction_executor
+from app.core.metrics import RequestContextMiddleware, get_span_logger, metrics_registry
+from app.services.extractors import warm_worker
+from app.services.jobs import extraction_job_queue
+from app.services.registry import extractor_registry
+
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Start extraction workers up front so the first upload does not pay for spawning them
+    if settings.EXTRACTION_WARM_UP:
+        await extraction_executor.warm_up(warm_worker)
+        # Extractors are imported on first use otherwise
+        for plugin in extractor_registry.plugins():
+            try:
+                plugin.load()
+            except Exception as e:
+                logger.warning(f"Failed to load extractor {plugin.name}: {str(e)}")
+    if settings.HTTP_WARM_UP:
+        await warm_up_clients()
+    extraction_job_queue.start()
+    if settings.TRACE_SPANS:
+        get_span_logger()
+    yield
+    # Uvicorn has already drained in-flight requests; give running jobs the same time
+    await extraction_job_queue.shutdown(drain_timeout=settings.SERVER_DRAIN_TIMEOUT)
+    await close_clients()
+    extraction_executor.shutdown()
 
 # Create FastAPI instance
 app = FastAPI(
@@ -11,7 +43,8 @@ app = FastAPI(
     description="Helper service for text extraction, AI orchestration, and Gemini communication",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -21,18 +54,37 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID"],
 )
 
+# Request ids and HTTP metrics, outermost so they cover every other middleware
+app.add_middleware(RequestContextMiddleware)
+
 # Include routers
 app.include_router(upload.router, prefix="/api/v1/upload", tags=["upload"])
 app.include_router(questions.router, prefix="/api/v1/questions", tags=["questions"])
 app.include_router(answers.router, prefix="/api/v1/answers", tags=["answers"])
+app.include_router(jobs.router, prefix="/api/v1/jobs", tags=["jobs"])
+app.include_router(documents.router, prefix="/api/v1/documents", tags=["documents"])
 
 # Health check endpoint
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "service": "SkillScore API"}
 
+# Readiness check endpoint
+@app.get("/ready")
+async def readiness_check():
+    if not await validate_supabase_connection():
+        return JSONResponse(status_code=503, content={"status": "unavailable", "supabase": False})
+    return {"status": "ready", "supabase": True}
+
+# Prometheus metrics endpoint
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False, dependencies=[Depends(metrics_auth)])
+    async def metrics():
+        return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
 # Root endpoint
 @app.get("/")
 async def root():
@@ -54,10 +106,5 @@ async def global_exception_handler(request, exc):
     )
 
 if __name__ == "__main__":
-    uvicorn.run(
-        "main:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True,
-        log_level="info"
-    )
\ No newline at end of file
+    from app.server import main
+    main()
\ No newline at end of file
@@ -0,0 +1,92 @@
+import os
+from typing import AsyncIterator, Iterator
+
+# Settings are read at import time, so configure them before the app is imported
+os.environ.update({
+    "JWT_SECRET_KEY": "test-secret-test-secret-test-secret-0123",
+    "JWT_VERIFICATION_MODE": "local",
+    "JWT_REMOTE_FALLBACK": "false",
+    "GEMINI_API_KEY": "stub-key",
+    "ADMISSION_ENABLED": "false",
+    "EXTRACTION_WARM_UP": "false",
+    "HTTP_WARM_UP": "false",
+    "SIMILARITY_INDEX_PATH": "",
+    "METRICS_ENABLED": "true",
+})
+
+import mimetypes
+import time
+import uuid
+from typing import Callable
+import httpx
+import jwt
+import pytest
+from starlette.applications import Starlette
+from app.core.clients import close_clients
+from app.core.config import settings
+from app.core.ingest import IngestedFile, UploadSpool
+from app.core.utils import generate_file_hash, get_file_extension
+from app.services.gemini import gemini_client
+from benchmarks.stubs import gemini_stub, run_stub_server
+
+def make_token(user: str = "user-1") -> str:
+    return jwt.encode(
+        {"sub": user, "aud": "authenticated", "email": f"{user}@example.com", "exp": int(time.time()) + 3600},
+        settings.JWT_SECRET_KEY,
+        algorithm="HS256"
+    )
+
+@pytest.fixture(scope="session")
+def gemini_server() -> Iterator[tuple[Starlette, str]]:
+    stub = gemini_stub(latency=0.05, chunk_size=64)
+    with run_stub_server(stub) as url:
+        stub.state.url = url
+        yield stub, url
+
+@pytest.fixture
+def gemini(gemini_server: tuple[Starlette, str], monkeypatch: pytest.MonkeyPatch) -> Starlette:
+    """The Gemini stub with fresh counters, which the service's shared client talks to"""
+    stub, url = gemini_server
+    stub.state.calls = 0
+    stub.state.graded = 0
+    stub.state.latency = 0.05
+    stub.state.status_code = 200
+    stub.state.response_text = None
+    monkeypatch.setattr(gemini_client, "base_url", url)
+    return stub
+
+@pytest.fixture(autouse=True)
+async def http_clients() -> AsyncIterator[None]:
+    # The pooled client belongs to the test's event loop
+    yield
+    await close_clients()
+
+@pytest.fixture
+async def client() -> AsyncIterator[httpx.AsyncClient]:
+    """The app over an ASGI transport, authenticated as one user"""
+    from main import app
+    transport = httpx.ASGITransport(app=app)
+    headers = {"Authorization": f"Bearer {make_token()}"}
+    async with httpx.AsyncClient(transport=transport, base_url="http://service", headers=headers) as client:
+        yield client
+
+@pytest.fixture
+def make_ingested() -> Iterator[Callable[..., IngestedFile]]:
+    """Build spooled uploads as ingest_upload would, deleting their spools afterwards"""
+    made = []
+
+    def make(content: bytes | None = None, filename: str = "notes.txt", max_memory: int = 1024) -> IngestedFile:
+        # Random content by default, so no cache has seen it
+        content = uuid.uuid4().bytes if content is None else content
+        spool = UploadSpool(max_memory=max_memory)
+        spool.write(content)
+        spool.finish()
+        ingested = IngestedFile(
+            filename, mimetypes.guess_type(filename)[0], get_file_extension(filename), generate_file_hash(content), spool
+        )
+        made.append(ingested)
+        return ingested
+
+    yield make
+    for ingested in made:
+        ingested.close()
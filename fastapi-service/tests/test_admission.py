@@ -0,0 +1,130 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from app.core.admission import AdmissionController, MemoryAdmissionBackend, SqliteAdmissionBackend
+
+def make_controller(backend=None, burst: float = 3, refill_per_second: float = 10, **limits) -> AdmissionController:
+    return AdmissionController(
+        backend=backend or MemoryAdmissionBackend(),
+        burst=burst,
+        refill_per_second=refill_per_second,
+        costs={"io": 1, "ocr": 5},
+        concurrency={"ocr": 1},
+        max_waiting=limits.get("max_waiting", 4),
+        max_wait=limits.get("max_wait", 1.0),
+        lease_ttl=limits.get("lease_ttl", 60)
+    )
+
+async def hold(controller: AdmissionController, started: asyncio.Event, release: asyncio.Event) -> None:
+    async with controller.slot("ocr"):
+        started.set()
+        await release.wait()
+
+async def test_exhausted_bucket_is_rate_limited_until_it_refills():
+    controller = make_controller()
+
+    for _ in range(3):
+        await controller.charge("user-1", ["io"])
+    with pytest.raises(HTTPException) as rejected:
+        await controller.charge("user-1", ["io"])
+    assert rejected.value.status_code == 429
+    assert rejected.value.headers["Retry-After"] == "1"
+
+    # Other users have their own buckets
+    await controller.charge("user-2", ["io"])
+
+    await asyncio.sleep(0.15)
+    await controller.charge("user-1", ["io"])
+
+async def test_costs_above_the_burst_are_admitted_from_a_full_bucket():
+    controller = make_controller()
+
+    await controller.charge("user-1", ["ocr"])
+    with pytest.raises(HTTPException) as rejected:
+        await controller.charge("user-1", ["io"])
+    # The debt of 2 tokens plus the one needed take 0.3s at 10 tokens per second
+    assert rejected.value.status_code == 429
+
+async def test_slot_is_released_when_the_work_fails():
+    controller = make_controller()
+
+    with pytest.raises(ValueError):
+        async with controller.slot("ocr"):
+            raise ValueError("extractor failed")
+
+    assert controller.stats()["held"] == {"ocr": 0}
+    async with controller.slot("ocr"):
+        assert controller.stats()["held"] == {"ocr": 1}
+
+async def test_waiters_get_the_slot_as_it_is_released():
+    controller = make_controller()
+    started, release = asyncio.Event(), asyncio.Event()
+    holder = asyncio.create_task(hold(controller, started, release))
+    await started.wait()
+
+    waiter = asyncio.create_task(hold(controller, asyncio.Event(), asyncio.Event()))
+    await asyncio.sleep(0.05)
+    assert controller.stats()["waiting"] == {"ocr": 1}
+
+    release.set()
+    await holder
+    await asyncio.sleep(0.05)
+    assert controller.stats()["waiting"] == {"ocr": 0}
+    assert controller.stats()["held"] == {"ocr": 1}
+    waiter.cancel()
+
+async def test_full_queue_and_long_waits_are_shed():
+    controller = make_controller(max_waiting=1, max_wait=0.2)
+    started, release = asyncio.Event(), asyncio.Event()
+    holder = asyncio.create_task(hold(controller, started, release))
+    await started.wait()
+
+    waiter = asyncio.create_task(hold(controller, asyncio.Event(), asyncio.Event()))
+    await asyncio.sleep(0.05)
+    with pytest.raises(HTTPException) as queue_full:
+        async with controller.slot("ocr"):
+            pass
+    with pytest.raises(HTTPException) as timed_out:
+        await waiter
+
+    assert queue_full.value.status_code == timed_out.value.status_code == 503
+    assert "Retry-After" in timed_out.value.headers
+    assert controller.stats()["held"] == {"ocr": 1}
+    release.set()
+    await holder
+    assert controller.stats()["held"] == {"ocr": 0}
+
+async def test_controllers_sharing_a_sqlite_file_share_buckets_and_slots(tmp_path):
+    path = str(tmp_path / "admission.sqlite3")
+    # As two worker processes on one host would
+    first = make_controller(SqliteAdmissionBackend(path, poll_interval=0.02))
+    second = make_controller(SqliteAdmissionBackend(path, poll_interval=0.02))
+
+    await first.charge("user-1", ["io"])
+    await second.charge("user-1", ["io"])
+    await first.charge("user-1", ["io"])
+    with pytest.raises(HTTPException) as rejected:
+        await second.charge("user-1", ["io"])
+    assert rejected.value.status_code == 429
+
+    started, release = asyncio.Event(), asyncio.Event()
+    holder = asyncio.create_task(hold(first, started, release))
+    await started.wait()
+    waiter_started = asyncio.Event()
+    waiter = asyncio.create_task(hold(second, waiter_started, asyncio.Event()))
+    await asyncio.sleep(0.1)
+    assert not waiter_started.is_set()
+
+    # The second controller is not notified, it finds the released lease by polling
+    release.set()
+    await holder
+    await asyncio.wait_for(waiter_started.wait(), timeout=0.5)
+    waiter.cancel()
+
+async def test_leases_of_a_crashed_worker_expire(tmp_path):
+    backend = SqliteAdmissionBackend(str(tmp_path / "admission.sqlite3"), poll_interval=0.02)
+
+    assert await backend.try_acquire("ocr", 1, "crashed", ttl=0.1)
+    assert not await backend.try_acquire("ocr", 1, "next", ttl=60)
+    await asyncio.sleep(0.15)
+    assert await backend.try_acquire("ocr", 1, "next", ttl=60)
@@ -0,0 +1,111 @@
+import uuid
+import httpx
+
+def make_questions() -> list[dict[str, any]]:
+    """One question of each type, unique so no reference or verdict cache has seen them"""
+    tag = uuid.uuid4().hex
+    return [
+        {"type": "mcq", "question": f"Which organelle makes ATP? ({tag})", "options": ["Nucleus", "Mitochondria", "Ribosome", "Golgi body"], "correctAnswer": 1},
+        {"type": "true_false", "question": f"Plant cells have a cell wall. ({tag})", "answer": True},
+        {"type": "fill_blank", "question": f"The ____ is the powerhouse of the cell. ({tag})", "answer": "mitochondria", "alternatives": ["mitochondrion"]},
+        {
+            "type": "short_answer",
+            "question": f"Describe photosynthesis. ({tag})",
+            "answer": "Chlorophyll absorbs light energy, glucose is produced and oxygen is released.",
+            "keyPoints": ["chlorophyll absorbs light", "glucose is produced", "oxygen is released"]
+        }
+    ]
+
+# Short answers covering some key points, which the lexical pre-filter leaves to the model
+UNDECIDED = ["Chlorophyll absorbs the light", "Glucose is produced from light"]
+
+async def evaluate(client: httpx.AsyncClient, questions: list[dict[str, any]], submissions: list[list[any]]) -> dict[str, any]:
+    response = await client.post(
+        "/api/v1/answers/evaluate",
+        json={"questions": questions, "submissions": [{"student_id": f"s{i}", "answers": answers} for i, answers in enumerate(submissions)]}
+    )
+    assert response.status_code == 200, response.text
+    return response.json()["data"]
+
+def correctness(submission: dict[str, any]) -> list[bool]:
+    return [result["correct"] for result in submission["results"]]
+
+async def test_objective_answers_are_scored_locally(gemini, client):
+    questions = make_questions()[:3]
+
+    result = await evaluate(client, questions, [
+        ["B", "true", "mitochondria"],
+        [1, True, "Mitochondrion"],
+        ["mitochondria", "no", "mitochondira"],
+        ["c", None, "nucleus"],
+        [3, "False"]
+    ])
+
+    assert [correctness(submission) for submission in result["submissions"]] == [
+        [True, True, True],
+        [True, True, True],
+        [True, False, True],
+        [False, False, False],
+        [False, False, False]
+    ]
+    assert result["submissions"][2]["results"][2]["method"] == "fuzzy"
+    assert result["submissions"][3]["results"][1]["method"] == "unanswered"
+    assert result["submissions"][0]["student_id"] == "s0"
+    assert result["summary"]["graded_locally"] == 15
+    assert gemini.state.calls == 0
+
+async def test_short_answers_clearly_right_or_wrong_skip_the_model(gemini, client):
+    questions = make_questions()[3:]
+
+    result = await evaluate(client, questions, [
+        ["Light is absorbed by chlorophyll, glucose gets produced and oxygen is released"],
+        ["Plants grow in soil"]
+    ])
+
+    accepted, rejected = (submission["results"][0] for submission in result["submissions"])
+    assert (accepted["method"], accepted["correct"], accepted["score"]) == ("lexical", True, 1.0)
+    assert (rejected["method"], rejected["correct"], rejected["score"]) == ("lexical", False, 0.0)
+    assert result["summary"]["distinct_model_answers"] == 0
+    assert gemini.state.calls == 0
+
+async def test_a_class_is_graded_in_one_upstream_call(gemini, client):
+    questions = make_questions()
+    submissions = [["B", True, "mitochondria", UNDECIDED[i % 2]] for i in range(30)]
+
+    result = await evaluate(client, questions, submissions)
+
+    assert gemini.state.calls == 1
+    # Students giving the same answer share one verdict
+    assert gemini.state.graded == 2
+    assert result["summary"]["distinct_model_answers"] == 2
+    assert result["summary"]["graded_by_model"] == 30
+    assert {submission["results"][3]["method"] for submission in result["submissions"]} == {"model"}
+
+async def test_repeated_answers_reuse_cached_verdicts(gemini, client):
+    questions = make_questions()
+    submissions = [[None, None, None, answer] for answer in UNDECIDED]
+
+    first = await evaluate(client, questions, submissions)
+    second = await evaluate(client, questions, submissions)
+
+    assert gemini.state.calls == 1
+    assert first["summary"]["upstream_calls"] == 1
+    assert second["summary"]["upstream_calls"] == 0
+    assert second["summary"]["model_cache_hits"] == 2
+    assert [submission["results"][3] for submission in second["submissions"]] == [
+        submission["results"][3] for submission in first["submissions"]
+    ]
+
+async def test_invalid_model_response_falls_back_to_the_lexical_grade(gemini, client):
+    gemini.state.response_text = "not json"
+    questions = make_questions()[3:]
+
+    result = await evaluate(client, questions, [[answer] for answer in UNDECIDED])
+
+    assert gemini.state.calls == 1
+    assert result["summary"]["model_fallbacks"] == 2
+    assert result["summary"]["graded_by_model"] == 0
+    for submission in result["submissions"]:
+        graded = submission["results"][0]
+        assert graded["method"] == "lexical"
+        assert 0.2 < graded["coverage"] < 0.8
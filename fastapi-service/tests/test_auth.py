@@ -0,0 +1,207 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import time
+from types import SimpleNamespace
+import jwt
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from app.core import auth
+from app.core.auth import PLACEHOLDER_SECRET, AuthenticationError, metrics_auth, verify_jwt_token
+from app.core.config import settings
+
+PRIVATE_KEY = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+PUBLIC_PEM = PRIVATE_KEY.public_key().public_bytes(
+    serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+)
+
+def make_claims(user: str = "user-1", expires_in: float = 3600, **claims) -> dict[str, any]:
+    return {"sub": user, "aud": "authenticated", "email": f"{user}@example.com", "exp": int(time.time() + expires_in), **claims}
+
+def hs_token(secret: str | None = None, **claims) -> str:
+    return jwt.encode(make_claims(**claims), secret or settings.JWT_SECRET_KEY, algorithm="HS256")
+
+def forged_token(secret: bytes, **claims) -> str:
+    """An HS256 token signed with any key, which PyJWT itself refuses to do with a public key"""
+    def encode(data: bytes) -> str:
+        return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+    signing_input = '.'.join(
+        encode(json.dumps(part).encode()) for part in ({"alg": "HS256", "typ": "JWT"}, make_claims(**claims))
+    )
+    return f"{signing_input}.{encode(hmac.new(secret, signing_input.encode(), hashlib.sha256).digest())}"
+
+def rs_token(**claims) -> str:
+    return jwt.encode(make_claims(**claims), PRIVATE_KEY, algorithm="RS256", headers={"kid": "key-1"})
+
+class RemoteAuth:
+    """Stands in for Supabase Auth, counting the tokens it is asked about"""
+
+    def __init__(self):
+        self.calls = 0
+        self.auth = self
+
+    async def get_user(self, token: str) -> SimpleNamespace:
+        self.calls += 1
+        user = SimpleNamespace(id="remote-user", email="remote@example.com", user_metadata={}, app_metadata={})
+        return SimpleNamespace(user=user)
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    auth.verified_tokens.clear()
+    yield
+    auth.verified_tokens.clear()
+
+@pytest.fixture
+def remote(monkeypatch) -> RemoteAuth:
+    remote = RemoteAuth()
+
+    async def get_supabase() -> RemoteAuth:
+        return remote
+
+    monkeypatch.setattr(auth, "get_supabase", get_supabase)
+    return remote
+
+@pytest.fixture
+def jwks(monkeypatch):
+    """Serve the test RSA key as the only JWKS signing key"""
+    client = SimpleNamespace(get_signing_key_from_jwt=lambda token: SimpleNamespace(key=PRIVATE_KEY.public_key()))
+    monkeypatch.setattr(auth, "get_jwks_client", lambda: client)
+
+async def test_valid_token_is_verified_locally(remote):
+    user = await verify_jwt_token(hs_token())
+
+    assert user == {"user_id": "user-1", "email": "user-1@example.com", "user_metadata": {}, "app_metadata": {}}
+    assert remote.calls == 0
+
+@pytest.mark.parametrize("claims", [
+    {"expires_in": -60},
+    {"aud": "anon"},
+    {"iss": "https://attacker.example.com/auth/v1"},
+])
+async def test_expired_or_misaddressed_tokens_are_refused(remote, monkeypatch, claims):
+    monkeypatch.setattr(settings, "JWT_ISSUER", "https://project.supabase.co/auth/v1")
+
+    with pytest.raises(AuthenticationError):
+        await verify_jwt_token(hs_token(**{"iss": settings.JWT_ISSUER, **claims}))
+    # A token that fails verification is not sent to Supabase for a second opinion
+    assert remote.calls == 0
+
+async def test_issuer_defaults_to_the_supabase_auth_url(monkeypatch):
+    monkeypatch.setattr(settings, "SUPABASE_URL", "https://project.supabase.co/")
+
+    assert (await verify_jwt_token(hs_token(iss="https://project.supabase.co/auth/v1")))["user_id"] == "user-1"
+    with pytest.raises(AuthenticationError):
+        await verify_jwt_token(hs_token(iss="https://other.supabase.co/auth/v1"))
+
+async def test_asymmetric_tokens_are_verified_with_the_jwks_key(jwks, monkeypatch):
+    monkeypatch.setattr(settings, "JWT_JWKS_URL", "https://project.supabase.co/auth/v1/.well-known/jwks.json")
+
+    assert (await verify_jwt_token(rs_token()))["user_id"] == "user-1"
+
+@pytest.mark.parametrize("secret", [None, PUBLIC_PEM])
+async def test_hs_tokens_are_refused_once_jwks_is_configured(jwks, remote, monkeypatch, secret):
+    monkeypatch.setattr(settings, "JWT_JWKS_URL", "https://project.supabase.co/auth/v1/.well-known/jwks.json")
+    # Including one signed with the public key, as an algorithm confusion attack would
+    token = hs_token() if secret is None else forged_token(secret)
+
+    with pytest.raises(AuthenticationError, match="unexpected algorithm"):
+        await verify_jwt_token(token)
+    assert remote.calls == 0
+
+async def test_public_key_is_never_an_hmac_secret(jwks, remote):
+    with pytest.raises(AuthenticationError, match="Signature verification failed"):
+        await verify_jwt_token(forged_token(PUBLIC_PEM))
+    assert remote.calls == 0
+
+@pytest.mark.parametrize("token", [
+    jwt.encode(make_claims(), None, algorithm="none"),
+    jwt.encode(make_claims(), "x" * 64, algorithm="HS512"),
+])
+async def test_unexpected_algorithms_are_refused_without_asking_supabase(remote, token):
+    with pytest.raises(AuthenticationError):
+        await verify_jwt_token(token)
+    assert remote.calls == 0
+
+@pytest.mark.filterwarnings("ignore::jwt.warnings.InsecureKeyLengthWarning")
+@pytest.mark.parametrize("fallback", [False, True])
+async def test_placeholder_secret_is_never_used(remote, monkeypatch, fallback):
+    monkeypatch.setattr(settings, "JWT_SECRET_KEY", PLACEHOLDER_SECRET)
+    monkeypatch.setattr(settings, "JWT_REMOTE_FALLBACK", fallback)
+    token = hs_token(secret=PLACEHOLDER_SECRET)
+
+    if fallback:
+        # Only Supabase can vouch for the token now
+        assert (await verify_jwt_token(token))["user_id"] == "remote-user"
+        assert remote.calls == 1
+    else:
+        with pytest.raises(AuthenticationError, match="not configured"):
+            await verify_jwt_token(token)
+        assert remote.calls == 0
+
+async def test_verified_users_are_cached_by_token_hash():
+    token = hs_token()
+    first = await verify_jwt_token(token)
+
+    assert auth.verified_tokens.get(token) is None
+    assert auth.verified_tokens.get(hashlib.sha256(token.encode()).hexdigest()) == first
+    assert await verify_jwt_token(token) == first
+
+async def test_cached_users_expire_with_their_token(monkeypatch):
+    monkeypatch.setattr(settings, "JWT_LEEWAY", 0)
+    token = hs_token(expires_in=1.5)
+    await verify_jwt_token(token)
+
+    # exp is whole seconds, so this is past it
+    await asyncio.sleep(1.6)
+    with pytest.raises(AuthenticationError, match="expired"):
+        await verify_jwt_token(token)
+
+async def test_remote_verifications_are_trusted_for_the_remote_ttl(remote, monkeypatch):
+    monkeypatch.setattr(settings, "JWT_VERIFICATION_MODE", "remote")
+    monkeypatch.setattr(settings, "JWT_REMOTE_CACHE_TTL", 0.2)
+    token = hs_token()
+
+    await verify_jwt_token(token)
+    await verify_jwt_token(token)
+    assert remote.calls == 1
+
+    # Long before the token expires, so revocations take effect
+    await asyncio.sleep(0.3)
+    await verify_jwt_token(token)
+    assert remote.calls == 2
+
+async def test_remote_verifications_never_outlive_the_token(remote, monkeypatch):
+    monkeypatch.setattr(settings, "JWT_VERIFICATION_MODE", "remote")
+    token = hs_token(expires_in=-1)
+
+    await verify_jwt_token(token)
+    await verify_jwt_token(token)
+    assert remote.calls == 2
+
+@pytest.mark.parametrize("header, allowed", [
+    (None, False),
+    ("wrong-token", False),
+    ("scrape-token-but-longer", False),
+    ("scrape-tokén", False),
+    ("scrape-token", True),
+])
+async def test_metrics_token_comparison(monkeypatch, header, allowed):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "scrape-token")
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=header) if header else None
+
+    if allowed:
+        await metrics_auth(credentials)
+    else:
+        with pytest.raises(HTTPException) as rejected:
+            await metrics_auth(credentials)
+        assert rejected.value.status_code == 401
+
+async def test_metrics_are_open_without_a_token(monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "")
+
+    await metrics_auth(None)
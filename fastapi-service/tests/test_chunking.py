@@ -0,0 +1,185 @@
+import asyncio
+import uuid
+from typing import AsyncIterator
+import pytest
+from app.core.cache import TTLCache
+from app.services.chunking import CHARS_PER_TOKEN, DocumentChunker, QuestionDeduplicator, estimate_tokens
+from app.services.gemini import GeminiClient, GeminiError, QuestionGenerationService
+
+TOPICS = ["osmosis", "photosynthesis", "glaciation", "inflation", "feudalism", "calculus", "volcanism", "genetics"]
+
+def make_paragraphs(count: int, topic: str = "membrane") -> list[str]:
+    return [
+        f"Paragraph {i} on {topic}: the {topic} process shapes how the system behaves over time. "
+        f"Observations of {topic} support model {i}."
+        for i in range(count)
+    ]
+
+def make_topics_text() -> str:
+    """Eight paragraphs of a few sentences each, one distinct topic per paragraph"""
+    return '\n\n'.join(' '.join(make_paragraphs(3, topic)) for topic in TOPICS)
+
+class SectionService(QuestionGenerationService):
+    """Generation with the upstream call replaced, recording how many sections run at once"""
+
+    def __init__(self, section_concurrency: int, failing: set[str] = frozenset(), repeated: bool = False):
+        super().__init__(
+            client=GeminiClient(api_key="stub-key", model="stub-model", base_url="http://unused", timeout=5),
+            cache=TTLCache(max_entries=10),
+            chunker=DocumentChunker(token_budget=60, overlap_tokens=0, max_sections=8),
+            section_concurrency=section_concurrency
+        )
+        self.failing = failing
+        self.repeated = repeated
+        self.running = 0
+        self.max_running = 0
+
+    async def stream_questions(self, text: str, question_types: dict[str, int], difficulty: str = "medium") -> AsyncIterator[dict[str, any]]:
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(0.05)
+            if any(topic in text for topic in self.failing):
+                raise GeminiError("Network request failed")
+            for question_type, count in question_types.items():
+                for i in range(count):
+                    # Repeated questions read the same whichever section asks them
+                    about = "membrane" if self.repeated else text.split(':')[0].split()[-1]
+                    yield {"type": question_type, "question": f"Question {i} on {about}?"}
+        finally:
+            self.running -= 1
+
+def test_sections_stay_within_the_token_budget_and_keep_paragraphs_whole():
+    paragraphs = make_paragraphs(40)
+    chunker = DocumentChunker(token_budget=100, overlap_tokens=0, max_sections=4)
+
+    sections = chunker.split('\n\n'.join(paragraphs))
+
+    assert len(sections) > 1
+    assert [section["index"] for section in sections] == list(range(len(sections)))
+    assert all(section["tokens"] <= 100 for section in sections)
+    # Without overlap the sections are the paragraphs, in order, each exactly once
+    assert [part for section in sections for part in section["text"].split('\n\n')] == paragraphs
+
+def test_oversized_paragraphs_split_at_sentences_then_words():
+    sentences = [f"Sentence {i} explains the gradient across the membrane in detail." for i in range(30)]
+    unbroken = "q" * 1000
+    chunker = DocumentChunker(token_budget=50, overlap_tokens=0, max_sections=4)
+
+    sections = chunker.split(' '.join(sentences) + "\n\n" + unbroken)
+
+    assert all(len(section["text"]) <= 50 * CHARS_PER_TOKEN for section in sections)
+    text = ' '.join(section["text"] for section in sections)
+    assert all(sentence in text for sentence in sentences)
+    assert text.replace(' ', '').count("q") == 1000
+
+def test_neighbouring_sections_overlap():
+    paragraphs = make_paragraphs(40)
+    chunker = DocumentChunker(token_budget=150, overlap_tokens=50, max_sections=4)
+
+    sections = [section["text"].split('\n\n') for section in chunker.split('\n\n'.join(paragraphs))]
+
+    for previous, current in zip(sections, sections[1:]):
+        carried = [part for part in current if part in previous]
+        assert carried and carried == previous[-len(carried):] == current[:len(carried)]
+        assert sum(len(part) + 2 for part in carried) <= 50 * CHARS_PER_TOKEN + 2
+    # Every paragraph is still covered, and only carried ones repeat
+    assert {part for section in sections for part in section} == set(paragraphs)
+
+def test_overlap_is_capped_at_half_the_budget():
+    assert DocumentChunker(token_budget=100, overlap_tokens=80, max_sections=4).overlap_tokens == 50
+
+def test_ranking_prefers_sections_covering_new_terms_and_keeps_document_order():
+    distinct = ['\n\n'.join(make_paragraphs(2, topic)) for topic in TOPICS[:3]]
+    repeated = '\n\n'.join(make_paragraphs(2, TOPICS[0]))
+    sections = [
+        {"index": index, "text": text, "tokens": estimate_tokens(text)}
+        for index, text in enumerate([distinct[0], repeated, distinct[1], repeated, distinct[2]])
+    ]
+    chunker = DocumentChunker(token_budget=1000, overlap_tokens=0, max_sections=4)
+
+    chosen = chunker.rank(sections, 3)
+
+    assert [section["index"] for section in chosen] == [0, 2, 4]
+    assert chunker.rank(sections[:2], 3) == sections[:2]
+
+def test_plan_spreads_the_question_mix_over_ranked_sections():
+    chunker = DocumentChunker(token_budget=60, overlap_tokens=0, max_sections=3)
+
+    plan = chunker.plan(make_topics_text(), {"mcq": 5, "true_false": 2})
+
+    assert len(plan) == 3
+    assert sum(sum(mix.values()) for _, mix in plan) == 7
+    assert sorted(sum(mix.values()) for _, mix in plan) == [2, 2, 3]
+    assert sum(mix.get("true_false", 0) for _, mix in plan) == 2
+    assert [section["index"] for section, _ in plan] == sorted(section["index"] for section, _ in plan)
+
+def test_short_plans_use_as_many_sections_as_questions():
+    chunker = DocumentChunker(token_budget=60, overlap_tokens=0, max_sections=8)
+
+    plan = chunker.plan(make_topics_text(), {"mcq": 2})
+
+    assert [mix for _, mix in plan] == [{"mcq": 1}, {"mcq": 1}]
+
+async def test_sections_are_generated_concurrently_up_to_the_limit():
+    service = SectionService(section_concurrency=3)
+    text = make_topics_text()
+
+    started = asyncio.get_running_loop().time()
+    result = await service.generate_document_questions(text, {"mcq": 8})
+
+    assert result["sections"] == {"used": 8, "duplicates_dropped": 0}
+    assert service.max_running == 3
+    assert len(result["questions"]) == 8
+    assert len({question["section"] for question in result["questions"]}) == 8
+    # Three waves of 0.05s rather than eight
+    assert asyncio.get_running_loop().time() - started < 0.3
+
+async def test_merged_questions_drop_near_duplicates():
+    service = SectionService(section_concurrency=4, repeated=True)
+
+    result = await service.generate_document_questions(make_topics_text(), {"mcq": 16})
+
+    # Each section asks question 0 (and question 1) about the same thing
+    assert result["sections"]["used"] == 8
+    assert len(result["questions"]) == 2
+    assert result["sections"]["duplicates_dropped"] == 14
+
+async def test_failed_sections_are_skipped_unless_every_section_fails():
+    service = SectionService(section_concurrency=4, failing={"osmosis", "glaciation"})
+
+    result = await service.generate_document_questions(make_topics_text(), {"mcq": 8})
+    assert len(result["questions"]) == 6
+
+    service = SectionService(section_concurrency=4, failing=set(TOPICS))
+    with pytest.raises(GeminiError):
+        await service.generate_document_questions(make_topics_text(), {"mcq": 8})
+
+def test_deduplicator_threshold():
+    deduplicator = QuestionDeduplicator(threshold=0.8)
+
+    assert deduplicator.add({"question": "What moves water across the cell membrane?"})
+    assert not deduplicator.add({"question": "What moves water across the cell membrane"})
+    assert deduplicator.add({"question": "What powers active transport across the membrane?"})
+    assert deduplicator.dropped == 1
+
+async def test_generation_uploads_keep_text_past_the_extraction_limit(client, monkeypatch):
+    from app.core.config import settings
+    from app.services.chunking import document_chunker
+    monkeypatch.setattr(settings, "MAX_TEXT_LENGTH", 2000)
+    monkeypatch.setattr(settings, "GENERATION_MAX_TEXT_LENGTH", 100_000)
+    paragraphs = [f"{uuid.uuid4().hex} {paragraph}" for paragraph in make_paragraphs(200)]
+    files = {"file": ("notes.txt", '\n\n'.join(paragraphs).encode(), "text/plain")}
+
+    extracted = (await client.post("/api/v1/upload/file", files=files)).json()["data"]
+    for_generation = (await client.post("/api/v1/upload/file?purpose=generation", files=files)).json()["data"]
+
+    assert extracted["text"].endswith("...")
+    assert len(extracted["text"]) <= 2003
+    # Not served from the cached, shorter extraction of the same content
+    assert for_generation["cached"] is False
+    assert for_generation["text"].split('\n\n') == paragraphs
+    # Sections are cut at the paragraph breaks extraction kept
+    sections = document_chunker.split(for_generation["text"])
+    assert len(sections) > 1
+    assert all(part in paragraphs for section in sections for part in section["text"].split('\n\n'))
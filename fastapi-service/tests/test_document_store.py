@@ -0,0 +1,40 @@
+import pytest
+from app.services.document_store import DocumentStore, LocalDocumentStore
+
+def blobs(store: LocalDocumentStore) -> list[str]:
+    return sorted(path.name for path in (store.directory / "contents").rglob("*") if path.is_file())
+
+def test_document_store_is_abstract():
+    with pytest.raises(TypeError):
+        DocumentStore()
+
+@pytest.mark.parametrize("max_memory", [1024, 0])
+async def test_content_is_stored_once_and_removed_with_its_last_reference(tmp_path, make_ingested, max_memory):
+    store = LocalDocumentStore(str(tmp_path))
+    ingested = make_ingested(b"cell membrane notes", max_memory=max_memory)
+
+    first = await store.add_document("user-1", ingested)
+    second = await store.add_document("user-2", ingested)
+    assert (first["deduplicated"], second["deduplicated"]) == (False, True)
+    assert blobs(store) == [f"{ingested.hash}.txt"]
+
+    assert await store.delete_document(first["id"], "user-1")
+    assert blobs(store) == [f"{ingested.hash}.txt"]
+    assert await store.delete_document(second["id"], "user-2")
+    assert blobs(store) == []
+
+    again = await store.add_document("user-1", ingested)
+    assert again["deduplicated"] is False
+    assert blobs(store) == [f"{ingested.hash}.txt"]
+
+async def test_failed_insert_leaves_no_blob(tmp_path, make_ingested):
+    store = LocalDocumentStore(str(tmp_path))
+    ingested = make_ingested(b"notes")
+    with store._connect() as connection:
+        connection.execute("CREATE TRIGGER reject BEFORE INSERT ON documents BEGIN SELECT RAISE(ABORT, 'rejected'); END")
+
+    with pytest.raises(Exception):
+        await store.add_document("user-1", ingested)
+
+    assert blobs(store) == []
+    assert store.stats()["contents"] == 0
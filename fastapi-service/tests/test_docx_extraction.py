@@ -0,0 +1,96 @@
+import io
+import zipfile
+from app.services.extractors import extract_docx_text, iter_docx_blocks, stream_docx_text
+
+NAMESPACES = (
+    'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main" '
+    'xmlns:mc="http://schemas.openxmlformats.org/markup-compatibility/2006" '
+    'xmlns:wps="http://schemas.microsoft.com/office/word/2010/wordprocessingShape"'
+)
+
+def make_docx(body: str, main_part: str = "word/document.xml") -> bytes:
+    """A minimal DOCX package holding the given w:body content"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("_rels/.rels", (
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Target="/' + main_part + '" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+            '</Relationships>'
+        ))
+        archive.writestr(main_part, f'<w:document {NAMESPACES}><w:body>{body}</w:body></w:document>')
+    return buffer.getvalue()
+
+def paragraph(*runs: str) -> str:
+    return '<w:p>' + ''.join(f'<w:r><w:t xml:space="preserve">{run}</w:t></w:r>' for run in runs) + '</w:p>'
+
+def cell(content: str, merge: str | None = None) -> str:
+    properties = '' if merge is None else (
+        '<w:tcPr><w:vMerge/></w:tcPr>' if merge == 'continue' else f'<w:tcPr><w:vMerge w:val="{merge}"/></w:tcPr>'
+    )
+    return f'<w:tc>{properties}{content}</w:tc>'
+
+def table(*rows: list[str]) -> str:
+    return '<w:tbl>' + ''.join('<w:tr>' + ''.join(row) + '</w:tr>' for row in rows) + '</w:tbl>'
+
+def test_blocks_come_out_in_document_order():
+    body = (
+        paragraph("Osmosis ", "moves water.")
+        + table([cell(paragraph("Term")), cell(paragraph("Meaning"))], [cell(paragraph("Solute")), cell(paragraph("Dissolved"))])
+        + '<w:p/>'
+        + '<w:p><w:r><w:t>Line one</w:t><w:br/><w:t>line two</w:t><w:tab/><w:t>tabbed</w:t></w:r></w:p>'
+    )
+
+    blocks = list(iter_docx_blocks(make_docx(body)))
+
+    assert blocks == ["Osmosis moves water.", "Term | Meaning", "Solute | Dissolved", "Line one\nline two\ttabbed"]
+
+def test_vertically_merged_cells_are_read_once():
+    body = table(
+        [cell(paragraph("Membranes"), merge="restart"), cell(paragraph("Lipid bilayer"))],
+        [cell(paragraph(), merge="continue"), cell(paragraph("Transport proteins"))],
+        [cell(paragraph("Stale copy"), merge="continue"), cell(paragraph("Channels"))],
+    )
+
+    blocks = list(iter_docx_blocks(make_docx(body)))
+
+    assert blocks == ["Membranes | Lipid bilayer", "Transport proteins", "Channels"]
+
+def test_nested_tables_become_lines_of_their_cell():
+    inner = table([cell(paragraph("a")), cell(paragraph("b"))], [cell(paragraph("c")), cell(paragraph("d"))])
+    body = table([cell(paragraph("Outer") + inner), cell(paragraph("Right"))])
+
+    assert list(iter_docx_blocks(make_docx(body))) == ["Outer\na | b\nc | d | Right"]
+
+def test_alternate_content_fallback_is_skipped():
+    text_box = (
+        '<mc:AlternateContent>'
+        '<mc:Choice Requires="wps"><wps:txbx><w:txbxContent>' + paragraph("Text box") + '</w:txbxContent></wps:txbx></mc:Choice>'
+        '<mc:Fallback><w:pict><w:txbxContent>' + paragraph("Text box") + '</w:txbxContent></w:pict></mc:Fallback>'
+        '</mc:AlternateContent>'
+    )
+    body = '<w:p><w:r><w:t>Anchor</w:t></w:r><w:r>' + text_box + '</w:r></w:p>' + paragraph("After")
+
+    # Text box paragraphs come out before the paragraph anchoring them
+    assert list(iter_docx_blocks(make_docx(body))) == ["Text box", "Anchor", "After"]
+
+def test_reading_stops_once_max_chars_is_filled():
+    body = ''.join(paragraph(f"Paragraph {index} about diffusion.") for index in range(1000))
+
+    blocks = list(iter_docx_blocks(make_docx(body), max_chars=200))
+
+    assert blocks == [f"Paragraph {index} about diffusion." for index in range(len(blocks))]
+    assert 200 < sum(len(block) + 2 for block in blocks) < 260
+
+def test_main_part_is_found_through_the_package_relationships():
+    docx = make_docx(paragraph("Moved"), main_part="word/document2.xml")
+
+    assert extract_docx_text(docx) == "Moved"
+
+def test_stream_groups_whole_paragraphs():
+    body = ''.join(paragraph(f"Paragraph {index}.") for index in range(10))
+
+    chunks = [chunk["text"] for chunk in stream_docx_text(make_docx(body), chunk_chars=30)]
+
+    assert len(chunks) > 1
+    assert '\n\n'.join(chunks) == '\n\n'.join(f"Paragraph {index}." for index in range(10))
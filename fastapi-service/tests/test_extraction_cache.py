@@ -0,0 +1,119 @@
+import asyncio
+import os
+import sqlite3
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from app.services.extraction_cache import (
+    DiskExtractionCache,
+    ExtractionCache,
+    MemoryExtractionCache,
+    SqliteExtractionCache,
+    make_cache_key
+)
+
+def make_result(text: str = "Osmosis moves water across a membrane.") -> dict[str, any]:
+    return {"text": text, "word_count": len(text.split()), "char_count": len(text), "file_type": "txt", "success": True}
+
+def make_key() -> str:
+    return make_cache_key(uuid.uuid4().hex, "txt", "test")
+
+def make_cache(tmp_path, ttl: float | None = None) -> ExtractionCache:
+    return ExtractionCache([
+        MemoryExtractionCache(max_bytes=1024 * 1024, ttl=ttl),
+        SqliteExtractionCache(str(tmp_path / "cache.sqlite3"), max_bytes=1024 * 1024, ttl=ttl),
+        DiskExtractionCache(str(tmp_path / "cache"), max_bytes=1024 * 1024, ttl=ttl)
+    ])
+
+async def test_results_are_stored_in_every_tier_and_served_by_the_fastest(tmp_path):
+    cache = make_cache(tmp_path)
+    memory, shared, disk = cache.tiers
+    key = make_key()
+
+    await cache.set(key, make_result())
+    value = await cache.get(key)
+
+    assert value == {field: make_result()[field] for field in ("text", "word_count", "char_count", "file_type")}
+    for tier in cache.tiers:
+        assert await tier.get(key) == value
+    # The lookups above each count a hit; the tiered lookup only reached memory
+    assert (shared.hits, disk.hits) == (1, 1)
+    assert cache.stats()["hits"] == 1
+
+async def test_hits_in_slower_tiers_are_promoted(tmp_path):
+    cache = make_cache(tmp_path)
+    memory, shared, disk = cache.tiers
+    key = make_key()
+    await disk.set(key, make_result())
+
+    assert await cache.get(key) is not None
+    assert (shared.misses, disk.hits) == (1, 1)
+    assert await memory.get(key) is not None
+    assert await shared.get(key) is not None
+
+    assert await cache.get(make_key()) is None
+    assert cache.stats()["misses"] == 1
+
+async def test_entries_expire_in_every_tier(tmp_path):
+    cache = make_cache(tmp_path, ttl=0.2)
+    key = make_key()
+    await cache.set(key, make_result())
+
+    await asyncio.sleep(0.3)
+
+    for tier in cache.tiers:
+        assert await tier.get(key) is None
+    assert not list((tmp_path / "cache").glob("*/*.json"))
+
+async def test_disk_tier_evicts_the_oldest_files_over_budget(tmp_path):
+    disk = DiskExtractionCache(str(tmp_path), max_bytes=2000, ttl=None)
+    keys = [make_key() for _ in range(10)]
+    for age, key in enumerate(keys):
+        await disk.set(key, make_result("x" * 300))
+        # Files written in one tick would otherwise tie on mtime
+        path = disk._path(key)
+        os.utime(path, (time.time() - 100 + age, time.time() - 100 + age))
+
+    stored = [key for key in keys if disk._path(key).exists()]
+    assert sum(disk._path(key).stat().st_size for key in stored) <= 2000
+    assert stored == keys[-len(stored):]
+    assert disk.stats()["evictions"] == len(keys) - len(stored)
+
+async def test_sqlite_tier_evicts_the_oldest_entries_over_budget(tmp_path):
+    shared = SqliteExtractionCache(str(tmp_path / "cache.sqlite3"), max_bytes=500, ttl=None, prune_every=1)
+    keys = [make_key() for _ in range(10)]
+    for key in keys:
+        await shared.set(key, make_result(uuid.uuid4().hex * 4))
+
+    present = [key for key in keys if await shared.get(key) is not None]
+    assert 0 < len(present) < len(keys)
+    assert present == keys[-len(present):]
+
+async def test_corrupt_entries_are_misses_and_can_be_rewritten(tmp_path):
+    cache = make_cache(tmp_path)
+    memory, shared, disk = cache.tiers
+    key = make_key()
+    await disk.set(key, make_result())
+    disk._path(key).write_text("{not json")
+    with sqlite3.connect(shared.path) as connection:
+        connection.execute(
+            "INSERT INTO entries (key, value, size, stored_at) VALUES (?, ?, 9, ?)", (key, b"not zlib", time.time())
+        )
+
+    assert await cache.get(key) is None
+    assert not disk._path(key).exists()
+
+    await cache.set(key, make_result())
+    memory._cache.clear()
+    assert await shared.get(key) == await disk.get(key) == await cache.get(key)
+
+def test_concurrent_writes_of_one_key_do_not_collide(tmp_path):
+    disk = DiskExtractionCache(str(tmp_path), max_bytes=1024 * 1024 * 1024, ttl=None)
+    key = make_key()
+
+    # Called directly, since set() only logs write failures
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda i: disk._write(key, make_result(f"Version {i} " + "notes " * 50000)), range(32)))
+
+    assert disk._read(key)["text"].startswith("Version")
+    assert [path.name for path in disk._path(key).parent.iterdir()] == [f"{key}.json"]
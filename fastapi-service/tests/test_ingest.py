@@ -0,0 +1,92 @@
+import io
+import os
+import pytest
+from fastapi import HTTPException, UploadFile
+from app.core import ingest
+from app.core.ingest import ingest_upload
+from app.core.utils import generate_file_hash, validate_upload_file
+
+class CountingFile(io.BytesIO):
+    """An upload body that records how much of it was read, optionally failing partway"""
+
+    def __init__(self, content: bytes, fail_after: int | None = None):
+        super().__init__(content)
+        self.fail_after = fail_after
+
+    def read(self, size: int = -1) -> bytes:
+        if self.fail_after is not None and self.tell() >= self.fail_after:
+            raise ConnectionResetError("client went away")
+        return super().read(size)
+
+@pytest.fixture
+def spool_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(ingest.settings, "INGEST_SPOOL_MAX_MEMORY", 1000)
+    monkeypatch.setattr(ingest.settings, "INGEST_SPOOL_DIR", str(tmp_path))
+    return tmp_path
+
+def upload(body: io.BytesIO, filename: str = "notes.txt") -> UploadFile:
+    return UploadFile(body, filename=filename)
+
+@pytest.mark.parametrize("size, on_disk", [(999, False), (1000, False), (1001, True), (5000, True)])
+async def test_upload_spools_to_disk_past_the_memory_threshold(spool_dir, size, on_disk):
+    content = os.urandom(size)
+
+    with await ingest_upload(upload(io.BytesIO(content)), chunk_size=300) as ingested:
+        assert ingested.spool.on_disk == on_disk
+        assert len(os.listdir(spool_dir)) == on_disk
+        assert ingested.size == size
+        assert ingested.spool.read_bytes() == content
+        assert ingested.source == (ingested.spool.path if on_disk else content)
+        assert ingested.hash == generate_file_hash(content)
+
+    assert os.listdir(spool_dir) == []
+
+async def test_oversized_upload_is_rejected_without_reading_the_rest(spool_dir):
+    body = CountingFile(os.urandom(100_000))
+
+    with pytest.raises(HTTPException) as raised:
+        await ingest_upload(upload(body), max_size=4000, chunk_size=1000)
+
+    assert raised.value.status_code == 400
+    assert "File too large" in raised.value.detail
+    assert body.tell() == 5000
+    assert os.listdir(spool_dir) == []
+
+async def test_spool_file_is_removed_when_reading_fails(spool_dir):
+    body = CountingFile(os.urandom(10_000), fail_after=3000)
+
+    with pytest.raises(ConnectionResetError):
+        await ingest_upload(upload(body), chunk_size=1000)
+
+    assert os.listdir(spool_dir) == []
+
+async def test_disallowed_file_type_is_rejected_before_reading(spool_dir):
+    body = CountingFile(b"MZ")
+
+    with pytest.raises(HTTPException) as raised:
+        await ingest_upload(upload(body, filename="setup.exe"))
+
+    assert raised.value.status_code == 400
+    assert body.tell() == 0
+
+async def test_validate_upload_file_hashes_and_rewinds(monkeypatch):
+    monkeypatch.setattr(ingest.settings, "INGEST_CHUNK_SIZE", 100)
+    content = os.urandom(1234)
+    file = upload(io.BytesIO(content))
+
+    info = await validate_upload_file(file)
+
+    assert info["hash"] == generate_file_hash(content)
+    assert info["size"] == 1234
+    assert await file.read() == content
+
+async def test_validate_upload_file_rejects_oversized_files_mid_stream(monkeypatch):
+    monkeypatch.setattr(ingest.settings, "INGEST_CHUNK_SIZE", 100)
+    monkeypatch.setattr(ingest.settings, "MAX_FILE_SIZE", 500)
+    body = CountingFile(os.urandom(10_000))
+
+    with pytest.raises(HTTPException) as raised:
+        await validate_upload_file(upload(body))
+
+    assert raised.value.status_code == 400
+    assert body.tell() == 600
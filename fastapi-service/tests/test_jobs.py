@@ -0,0 +1,39 @@
+import asyncio
+import time
+import pytest
+from app.core.ingest import IngestedFile
+from app.services import jobs
+from app.services.jobs import SUCCEEDED, ExtractionJobQueue, JobStore, MemoryJobStore
+
+def test_job_store_is_abstract():
+    with pytest.raises(TypeError):
+        JobStore()
+
+async def test_slow_webhook_does_not_hold_up_the_next_job(monkeypatch, make_ingested):
+    async def extract_text(ingested: IngestedFile) -> dict[str, any]:
+        return {"text": "notes", "word_count": 1}
+
+    async def slow_notify(job: dict[str, any]) -> None:
+        await asyncio.sleep(1)
+        delivered.append(job["id"])
+
+    delivered = []
+    queue = ExtractionJobQueue(
+        MemoryJobStore(), workers=1, max_queued=10, job_timeout=5, max_retries=0, result_ttl=60, poll_interval=0.05
+    )
+    monkeypatch.setattr(jobs.text_extraction_service, "extract_text", extract_text)
+    monkeypatch.setattr(queue, "_notify", slow_notify)
+
+    started = time.monotonic()
+    first = await queue.submit(make_ingested(), "user-1", callback_url="https://hooks.example.com/done")
+    second = await queue.submit(make_ingested(), "user-1")
+    async for job in queue.watch(second["id"], "user-1"):
+        if job["status"] == SUCCEEDED:
+            break
+
+    assert time.monotonic() - started < 0.5
+    assert queue.stats()["webhooks_pending"] == 1
+
+    # Shutdown lets the pending delivery finish
+    await queue.shutdown()
+    assert delivered == [first["id"]]
@@ -0,0 +1,17 @@
+import pytest
+from app.core.config import settings
+from app.core.metrics import Metric
+
+async def test_metrics_require_the_configured_token(client, monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "scrape-token")
+
+    assert (await client.get("/metrics")).status_code == 401
+    assert (await client.get("/metrics", headers={"Authorization": "Bearer wrong"})).status_code == 401
+
+    response = await client.get("/metrics", headers={"Authorization": "Bearer scrape-token"})
+    assert response.status_code == 200
+    assert "skillscore_http_requests_total" in response.text
+
+def test_metric_families_must_say_how_to_create_children():
+    with pytest.raises(TypeError):
+        Metric("skillscore_test_total", "Test metric")
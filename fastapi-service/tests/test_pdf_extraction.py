@@ -0,0 +1,117 @@
+import asyncio
+import os
+import pytest
+from benchmarks.corpus import write_pdf
+from app.services import extractors, pdf_extraction
+from app.services.extractors import extract_pdf_pages
+from app.services.pdf_extraction import PdfExtractionEngine
+
+def page_lines(page: int) -> list[str]:
+    return [f"Page {page} explains osmosis across the cell membrane.", f"Diffusion follows the gradient on page {page}."]
+
+class InlineExecutor:
+    """Runs extraction jobs on threads, recording what each job was sent"""
+
+    def __init__(self):
+        self.calls = []
+
+    async def run(self, kind: str, func, *args) -> any:
+        self.calls.append((func.__name__, args))
+        return await asyncio.to_thread(func, *args)
+
+class StubOcr:
+    def __init__(self):
+        self.images = []
+
+    async def extract(self, image: bytes) -> dict[str, any]:
+        self.images.append(image)
+        return {"text": f"Scanned {image.decode()}", "ocr": {}}
+
+@pytest.fixture
+def spool_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(pdf_extraction.settings, "INGEST_SPOOL_DIR", str(tmp_path))
+    return tmp_path
+
+@pytest.fixture
+def pdf() -> bytes:
+    return write_pdf([page_lines(page) for page in range(1, 11)])
+
+def batches(executor: InlineExecutor) -> list[tuple]:
+    return [args for name, args in executor.calls if name == "extract_pdf_pages"]
+
+async def test_pages_are_extracted_in_order_from_one_spooled_copy(spool_dir, pdf):
+    executor = InlineExecutor()
+    engine = PdfExtractionEngine(executor, batch_size=3, max_parallel_batches=2, char_budget=100_000)
+
+    result = await engine.extract(pdf)
+
+    assert result["page_count"] == 10
+    assert not result["stopped_early"]
+    assert [page["page"] for page in result["pages"]] == list(range(1, 11))
+    assert result["text"].split("\n\n")[3].split() == ' '.join(page_lines(4)).split()
+    # Each batch was sent the same path rather than the bytes
+    sources = {args[0] for args in batches(executor)}
+    assert len(batches(executor)) == 4
+    assert len(sources) == 1 and isinstance(sources.pop(), str)
+    assert os.listdir(spool_dir) == []
+
+async def test_single_batch_documents_are_not_spooled(spool_dir, pdf):
+    executor = InlineExecutor()
+    engine = PdfExtractionEngine(executor, batch_size=20, max_parallel_batches=2, char_budget=100_000)
+
+    result = await engine.extract(pdf)
+
+    assert result["pages_processed"] == 10
+    assert [args[0] for args in batches(executor)] == [pdf]
+
+async def test_extraction_stops_once_the_char_budget_is_met(spool_dir, pdf):
+    executor = InlineExecutor()
+    engine = PdfExtractionEngine(executor, batch_size=1, max_parallel_batches=2, char_budget=250)
+
+    result = await engine.extract(pdf)
+
+    # About 100 characters a page
+    assert result["stopped_early"]
+    assert result["pages_processed"] == 3
+    assert len(batches(executor)) <= 5
+    assert os.listdir(spool_dir) == []
+
+async def test_only_pages_without_text_are_ocrd(monkeypatch, spool_dir):
+    def page_images(page, page_num: int) -> list[bytes]:
+        return [f"page {page_num + 1}".encode()]
+
+    monkeypatch.setattr(extractors, "_extract_page_images", page_images)
+    ocr = StubOcr()
+    engine = PdfExtractionEngine(InlineExecutor(), batch_size=2, max_parallel_batches=2, char_budget=100_000, ocr=ocr)
+
+    result = await engine.extract(write_pdf([page_lines(1), [], page_lines(3), [], page_lines(5)]))
+
+    assert sorted(ocr.images) == [b"page 2", b"page 4"]
+    assert result["ocr_pages"] == [2, 4]
+    assert result["cacheable"]
+    assert result["text"].split("\n\n")[1] == "Scanned page 2"
+    assert all("images" not in page for page in result["pages"])
+
+def test_workers_reuse_the_open_document_between_batches(monkeypatch, tmp_path, pdf):
+    opened = []
+    read_pdf = extractors._read_pdf
+
+    def counting_read_pdf(stream):
+        opened.append(stream)
+        return read_pdf(stream)
+
+    monkeypatch.setattr(extractors, "_read_pdf", counting_read_pdf)
+    path = tmp_path / "upload.pdf"
+    path.write_bytes(pdf)
+
+    first = extract_pdf_pages(str(path), 0, 3)
+    second = extract_pdf_pages(str(path), 3, 6)
+    assert [page["page"] for page in first + second] == [1, 2, 3, 4, 5, 6]
+    assert len(opened) == 1
+
+    # Another document at the same path is parsed afresh, and the old one closed
+    path.unlink()
+    path.write_bytes(write_pdf([["Replacement page."]]))
+    assert extract_pdf_pages(str(path), 0, 1)[0]["text"].strip() == "Replacement page."
+    assert len(opened) == 2
+    assert opened[0].closed
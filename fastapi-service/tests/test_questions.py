@@ -0,0 +1,100 @@
+import asyncio
+import json
+import uuid
+import pytest
+from app.core.cache import TTLCache
+from app.services.chunking import document_chunker
+from app.services.gemini import GeminiClient, QuestionGenerationService, gemini_client
+from app.services.json_stream import JsonArrayStreamParser
+
+def make_text() -> str:
+    """Source text long enough to generate from, unique so no cache or index has seen it"""
+    return f"Notes {uuid.uuid4().hex}. " + ' '.join(
+        f"The cell membrane regulates transport of molecule {i} across the gradient." for i in range(12)
+    )
+
+def make_service(url: str, ttl: float | None = None) -> QuestionGenerationService:
+    return QuestionGenerationService(
+        client=GeminiClient(api_key="stub-key", model="stub-model", base_url=url, timeout=5),
+        cache=TTLCache(max_entries=100, ttl=ttl),
+        chunker=document_chunker,
+        section_concurrency=4
+    )
+
+async def test_concurrent_identical_requests_share_one_upstream_call(gemini):
+    service = make_service(gemini.state.url)
+    text = make_text()
+
+    results = await asyncio.gather(*(service.generate_question_set(text, {"mcq": 3}) for _ in range(10)))
+
+    assert gemini.state.calls == 1
+    assert service.stats()["coalesced"] == 9
+    assert all(result["questions"] == results[0]["questions"] for result in results)
+    assert len(results[0]["questions"]) == 3
+
+async def test_cached_questions_until_the_ttl_expires(gemini):
+    service = make_service(gemini.state.url, ttl=0.5)
+    text = make_text()
+
+    first = await service.generate_question_set(text, {"mcq": 2, "true_false": 1})
+    second = await service.generate_question_set(text, {"true_false": 1, "mcq": 2})
+    assert (first["cached"], second["cached"]) == (False, True)
+    assert second["questions"] == first["questions"]
+    assert gemini.state.calls == 1
+
+    await asyncio.sleep(0.6)
+    third = await service.generate_question_set(text, {"mcq": 2, "true_false": 1})
+    assert third["cached"] is False
+    assert gemini.state.calls == 2
+
+def test_json_array_parser_on_every_chunk_boundary():
+    questions = [
+        {"question": "Which bracket closes [this] {one}?", "options": ["]", "}", "\"]\"", "\\"], "correctAnswer": 2},
+        {"question": "Escaped \"quotes\", commas, and unicode é", "answer": True, "nested": {"a": [1, {"b": []}]}},
+        {"question": "Last", "answer": "x"}
+    ]
+    text = "```json\n" + json.dumps(questions) + "\n```"
+
+    for size in range(1, len(text) + 1):
+        parser = JsonArrayStreamParser()
+        parsed = [element for i in range(0, len(text), size) for element in parser.feed(text[i:i + size])]
+        assert parsed == questions, f"chunk size {size}"
+        assert parser.finished
+
+async def test_streamed_questions_arrive_across_chunk_boundaries(gemini):
+    service = make_service(gemini.state.url)
+    questions = [question async for question in service.stream_questions(make_text(), {"mcq": 4, "short_answer": 2})]
+
+    assert [question["type"] for question in questions] == ["mcq"] * 4 + ["short_answer"] * 2
+    assert gemini.state.calls == 1
+
+@pytest.mark.parametrize("stream", [False, True])
+async def test_upstream_error_is_a_bad_gateway(gemini, client, stream):
+    gemini.state.status_code = 500
+
+    response = await client.post("/api/v1/questions/generate", json={"text": make_text(), "count": 2, "stream": stream})
+
+    if stream:
+        records = [json.loads(line) for line in response.text.splitlines()]
+        assert records[0] == {"type": "error", "status_code": 502, "message": records[0]["message"]}
+    else:
+        assert response.status_code == 502
+
+async def test_upstream_timeout_is_a_gateway_timeout(gemini, client, monkeypatch):
+    # Chunks arrive about every 0.25s, far apart for a 50ms read timeout
+    gemini.state.latency = 5.0
+    monkeypatch.setattr(gemini_client, "timeout", 0.05)
+
+    response = await client.post("/api/v1/questions/generate", json={"text": make_text(), "count": 2})
+
+    assert response.status_code == 504
+
+@pytest.mark.parametrize("stream", [False, True])
+async def test_unknown_question_type_is_rejected_before_generating(gemini, client, stream):
+    response = await client.post(
+        "/api/v1/questions/generate",
+        json={"text": make_text(), "question_type": "essay", "stream": stream}
+    )
+
+    assert response.status_code == 400
+    assert gemini.state.calls == 0
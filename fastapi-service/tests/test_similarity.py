@@ -0,0 +1,92 @@
+import sqlite3
+from app.core.config import settings
+from app.services.similarity import SimilarityIndex
+from benchmarks.bench_similarity import make_noisy
+from benchmarks.corpus import make_paragraphs
+
+def make_index(path: str, max_entries: int = 5) -> SimilarityIndex:
+    return SimilarityIndex(
+        path=path, threshold=0.8, shingle_size=3, num_perm=32, bands=8, min_words=5,
+        max_entries=max_entries, prune_every=4
+    )
+
+def make_default_index(path: str | None = None, sync_interval: float = 1.0) -> SimilarityIndex:
+    """An index with the service's signature and banding settings"""
+    return SimilarityIndex(
+        path=path,
+        threshold=settings.SIMILARITY_THRESHOLD,
+        shingle_size=settings.SIMILARITY_SHINGLE_SIZE,
+        num_perm=settings.SIMILARITY_PERMUTATIONS,
+        bands=settings.SIMILARITY_BANDS,
+        min_words=settings.SIMILARITY_MIN_WORDS,
+        max_entries=settings.SIMILARITY_MAX_ENTRIES,
+        sync_interval=sync_interval
+    )
+
+def make_document(seed: int) -> str:
+    return ' '.join(make_paragraphs(5000, seed=seed))
+
+def make_text(i: int) -> str:
+    return ' '.join(f"topic{i} word{j} lesson{i * j}" for j in range(20))
+
+def rows(path: str) -> int:
+    with sqlite3.connect(path) as connection:
+        return connection.execute("SELECT COUNT(*) FROM signatures").fetchone()[0]
+
+def test_signatures_are_trimmed_as_they_are_added(tmp_path):
+    path = str(tmp_path / "similarity.sqlite3")
+    index = make_index(path)
+
+    for i in range(12):
+        index.add(f"text-{i}", index.signature(make_text(i)))
+        assert rows(path) <= index.max_entries + index.prune_every - 1
+    assert rows(path) == 5
+
+def test_opening_an_index_touches_the_file_only_on_first_use(tmp_path):
+    path = str(tmp_path / "similarity.sqlite3")
+    writer = make_index(path, max_entries=100)
+    for i in range(10):
+        writer.add(f"text-{i}", writer.signature(make_text(i)))
+
+    reader = make_index(path, max_entries=3)
+    assert rows(path) == 10
+
+    matches = reader.query(reader.signature(make_text(9)))
+    assert [match["key"] for match in matches] == ["text-9"]
+    assert rows(path) == 3
+
+def test_reworded_copies_share_a_bucket_and_match_above_the_threshold():
+    index = make_default_index()
+    original = make_document(seed=1)
+    # As OCR of a printout or a format conversion would change it
+    first, second = make_noisy(original, 0.03, seed=2), make_noisy(original, 0.03, seed=3)
+    assert first != second
+    first_signature, second_signature = index.signature(first), index.signature(second)
+
+    assert set(index._band_keys(first_signature)) & set(index._band_keys(second_signature))
+    index.add("first", first_signature, {"file_type": "pdf"})
+    matches = index.query(second_signature)
+    assert [match["key"] for match in matches] == ["first"]
+    assert matches[0]["similarity"] >= index.threshold
+    assert matches[0]["file_type"] == "pdf"
+
+def test_unrelated_texts_do_not_match():
+    index = make_default_index()
+    first, unrelated = index.signature(make_document(seed=1)), index.signature(make_document(seed=4))
+
+    assert not set(index._band_keys(first)) & set(index._band_keys(unrelated))
+    index.add("first", first)
+    assert index.query(unrelated) == []
+    assert index.query(first, exclude="first") == []
+
+def test_signatures_added_by_another_worker_are_picked_up(tmp_path):
+    path = str(tmp_path / "similarity.sqlite3")
+    worker, other_worker = make_default_index(path, sync_interval=0), make_default_index(path, sync_interval=0)
+    text = make_document(seed=5)
+    signature = worker.signature(text)
+
+    assert worker.query(signature) == []
+    other_worker.add("from-other-worker", signature)
+
+    assert [match["key"] for match in worker.query(signature)] == ["from-other-worker"]
+    assert "from-other-worker" in worker
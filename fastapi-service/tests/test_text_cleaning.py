@@ -0,0 +1,78 @@
+import random
+import pytest
+from app.core.utils import TextCleaner, clean_extracted_text, truncate_text
+from benchmarks.bench_clean_text import make_document
+
+def feed_all(cleaner: TextCleaner, chunks: list[str]) -> list[str]:
+    return [cleaner.feed(chunk) for chunk in chunks]
+
+def split_randomly(text: str, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    cuts = sorted(rng.sample(range(1, len(text)), min(len(text) - 1, 40)))
+    return [text[start:end] for start, end in zip([0, *cuts], [*cuts, len(text)])]
+
+def test_whitespace_runs_collapse_and_control_characters_are_dropped():
+    assert clean_extracted_text("  The\tcell \x00membrane\x0c  is   selective.  ") == "The cell membrane is selective."
+
+def test_paragraphs_are_kept_and_line_wraps_joined():
+    text = "First paragraph\nwrapped over\r\nlines.\n  \n\n\nSecond   paragraph.\n"
+
+    assert clean_extracted_text(text) == "First paragraph wrapped over lines.\n\nSecond paragraph."
+
+@pytest.mark.parametrize("chunks, expected", [
+    (["alpha  ", "   ", " beta"], "alpha beta"),
+    (["alpha \n", " ", "\n beta"], "alpha\n\nbeta"),
+    (["alpha", "\n", "\n", "beta"], "alpha\n\nbeta"),
+    (["  ", "alpha", "\n\n\n\n", "beta  "], "alpha\n\nbeta"),
+])
+def test_whitespace_runs_split_across_chunks(chunks, expected):
+    cleaner = TextCleaner()
+
+    assert ''.join(feed_all(cleaner, chunks)) == cleaner.finish() == expected
+
+@pytest.mark.parametrize("seed", range(5))
+def test_chunked_cleaning_matches_cleaning_in_one_piece(seed):
+    text = make_document(3000, seed=seed)
+    cleaner = TextCleaner()
+
+    pieces = feed_all(cleaner, split_randomly(text, seed))
+
+    assert ''.join(pieces) == cleaner.finish() == clean_extracted_text(text)
+
+def test_text_is_cut_at_a_word_boundary_near_the_budget():
+    text = ' '.join(["membrane"] * 100)
+
+    cleaned = clean_extracted_text(text, max_length=100)
+
+    assert cleaned == truncate_text(text, 100)
+    assert cleaned.endswith("membrane...")
+    assert len(cleaned) <= 103
+
+def test_cleaner_stops_once_full():
+    cleaner = TextCleaner(max_length=20)
+    cleaner.feed("one two three four five six")
+
+    assert cleaner.full
+    assert cleaner.feed("seven") == ""
+    assert cleaner.finish() == "one two three four..."
+
+@pytest.mark.parametrize("seed", range(10))
+def test_streamed_pieces_always_concatenate_to_the_final_text(seed):
+    text = make_document(2000, seed=seed)
+    cleaner = TextCleaner(max_length=500)
+
+    pieces = feed_all(cleaner, split_randomly(text, seed))
+
+    assert cleaner.full
+    assert ''.join(pieces) == cleaner.finish()
+    assert len(cleaner.finish()) <= 503
+
+def test_budget_is_never_cut_inside_text_already_returned():
+    # The last space before the budget is in the first piece, past 80% of it
+    cleaner = TextCleaner(max_length=100)
+    first = cleaner.feed("a" * 82 + " " + "b" * 12)
+    cleaner.feed("\n\n")
+    second = cleaner.feed("c" * 50)
+
+    assert second == "\n\nccc..."
+    assert cleaner.finish() == first + second
@@ -0,0 +1,87 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+from app.services import text_extraction
+from app.services.text_extraction import TextExtractionService
+
+class PagedPlugin:
+    """An extractor streaming one page per chunk"""
+
+    name = "paged"
+    version = "1"
+    cost = "ocr"
+
+    def __init__(self, pages: int):
+        self.pages = pages
+        self.extracted = 0
+
+    async def stream(self, content: bytes | str) -> AsyncIterator[dict[str, any]]:
+        for page in range(self.pages):
+            await asyncio.sleep(0.01)
+            self.extracted += 1
+            yield {"text": f"Page {page} covers osmosis and diffusion.", "page": page, "elapsed_ms": 10.0}
+
+class Registry:
+    def __init__(self, plugin: PagedPlugin):
+        self.plugin = plugin
+
+    def get(self, extension: str) -> PagedPlugin:
+        return self.plugin
+
+async def test_stalled_stream_releases_its_slot_once_extraction_finishes(monkeypatch, make_ingested):
+    held = []
+
+    @asynccontextmanager
+    async def slot(cost_class: str) -> AsyncIterator[None]:
+        held.append(cost_class)
+        try:
+            yield
+        finally:
+            held.remove(cost_class)
+
+    monkeypatch.setattr(text_extraction.admission_controller, "slot", slot)
+    plugin = PagedPlugin(pages=20)
+    service = TextExtractionService(Registry(plugin))
+
+    records = service.extract_stream(make_ingested(filename="notes.pdf"))
+    assert (await anext(records))["type"] == "start"
+    assert (await anext(records))["type"] == "chunk"
+    assert held == ["ocr"]
+
+    # The client stops reading; extraction carries on and gives the slot back
+    await asyncio.sleep(0.5)
+    assert plugin.extracted == 20
+    assert held == []
+
+    rest = [record async for record in records]
+    assert [record["type"] for record in rest] == ["chunk"] * 19 + ["summary"]
+    assert rest[-1]["chunks"] == 20
+
+async def test_closed_stream_stops_extracting(monkeypatch, make_ingested):
+    plugin = PagedPlugin(pages=1000)
+    service = TextExtractionService(Registry(plugin))
+
+    records = service.extract_stream(make_ingested(filename="notes.pdf"))
+    await anext(records)
+    await anext(records)
+    await records.aclose()
+
+    extracted = plugin.extracted
+    await asyncio.sleep(0.1)
+    assert plugin.extracted <= extracted + 1
+
+async def test_streamed_chunks_match_the_text_kept_once_the_budget_is_hit(monkeypatch, make_ingested):
+    async def remember(ingested, cache_key: str, extractor: str, result: dict[str, any]) -> None:
+        kept.append(result["text"])
+
+    kept = []
+    monkeypatch.setattr(text_extraction.settings, "MAX_TEXT_LENGTH", 100)
+    service = TextExtractionService(Registry(PagedPlugin(pages=20)))
+    monkeypatch.setattr(service, "_remember", remember)
+
+    records = [record async for record in service.extract_stream(make_ingested(filename="notes.pdf"))]
+
+    streamed = ''.join(record["text"] for record in records if record["type"] == "chunk")
+    assert streamed.endswith("...")
+    assert kept == [streamed]
+    assert records[-1]["char_count"] == len(streamed)
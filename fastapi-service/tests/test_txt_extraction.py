@@ -0,0 +1,65 @@
+import codecs
+import io
+import pytest
+from app.core.utils import clean_extracted_text
+from app.services.extractors import decode_text_stream, extract_txt_text
+
+TEXT = "Café au lait, naïve résumé: the cell membrane is selectively permeable.\n"
+
+def decode(data: bytes, max_chars: int = 10_000, chunk_size: int = 64, sample_size: int = 256) -> dict[str, any]:
+    return decode_text_stream(io.BytesIO(data), max_chars, chunk_size, sample_size)
+
+@pytest.mark.parametrize("bom, encoding, expected", [
+    (codecs.BOM_UTF8, "utf-8", "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16-le", "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16-be", "utf-16"),
+    (codecs.BOM_UTF32_LE, "utf-32-le", "utf-32"),
+])
+def test_byte_order_marks_pick_the_encoding(bom, encoding, expected):
+    result = decode(bom + (TEXT * 5).encode(encoding))
+
+    assert result == {"text": TEXT * 5, "encoding": expected, "truncated": False}
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5, 7])
+def test_multibyte_characters_split_across_chunks(chunk_size):
+    text = "Ωmega ✓ naïve 😀 " * 20
+
+    # The detection sample also ends mid-character
+    result = decode(text.encode("utf-8"), chunk_size=chunk_size, sample_size=17)
+
+    assert result == {"text": text, "encoding": "utf-8", "truncated": False}
+
+def test_legacy_single_byte_text_decodes_as_cp1252():
+    text = "Crème brûlée – “quoted” for €5\n" * 10
+
+    result = decode(text.encode("cp1252"))
+
+    assert result["encoding"] == "cp1252"
+    assert result["text"] == text
+
+def test_latin1_after_a_long_ascii_prefix_falls_back():
+    text = "plain ascii notes\n" * 100 + "façade déjà vu\n"
+
+    # The sample alone is valid UTF-8; the invalid byte turns up while decoding
+    result = decode(text.encode("latin-1"), sample_size=64)
+
+    assert result["encoding"] == "cp1252"
+    assert result["text"] == text
+
+def test_decoding_stops_once_the_budget_is_filled():
+    text = TEXT * 200
+
+    result = decode(text.encode("utf-8"), max_chars=200, chunk_size=32)
+
+    assert result["truncated"]
+    assert len(result["text"]) < 300
+    assert clean_extracted_text(result["text"], 200) == clean_extracted_text(text, 200)
+
+def test_extracts_from_a_spooled_file(tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_bytes(codecs.BOM_UTF16_LE + TEXT.encode("utf-16-le"))
+
+    result = extract_txt_text(str(path), chunk_size=3)
+
+    assert result["text"] == TEXT
+    assert result["encoding"] == "utf-16"